@@ -0,0 +1,167 @@
+"""
+Dashboard Statistics
+The admin dashboard's widgets: every count and donation total from one SQL
+statement (a scalar subquery per table, with conditional sums for the
+filtered counts) and the recent-activity lists, each cached briefly in the
+shared cache under a version token that is bumped after commits touching the
+tables they read. The dashboard renders whatever is cached and loads the
+rest per widget from ``/admin/api/dashboard/<widget>``
+"""
+
+import os
+import uuid
+
+from sqlalchemy import case, desc, event, func, select
+from sqlalchemy.orm import Session
+
+from database import db
+from models import (ContactSubmission, Donation, DonationProject, DonationStats, NewsletterSubscriber,
+                    Project, ProjectCategory, Skill, Testimonial)
+
+VERSION_KEY = 'dashboard_stats:version'
+PENDING_KEY = 'dashboard_stats_changed'
+RECENT_LIMIT = 5
+
+TRACKED_MODELS = (ContactSubmission, Donation, DonationProject, DonationStats, NewsletterSubscriber,
+                  Project, ProjectCategory, Skill, Testimonial)
+
+
+def _count(model, condition=None):
+    """COUNT(*) of ``model``, or SUM(CASE) of the rows matching ``condition``, as a scalar subquery"""
+    if condition is None:
+        aggregate = func.count()
+    else:
+        aggregate = func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+    return select(aggregate).select_from(model.__table__).scalar_subquery()
+
+
+def _verified_total(currency):
+    """Received amount of completed donations in ``currency``, from the donation_stats rows"""
+    row = (DonationStats.scope == 'currency') & (DonationStats.stat_key == currency)
+    return select(func.coalesce(func.sum(case((row, DonationStats.verified_amount), else_=0.0)), 0.0)) \
+        .select_from(DonationStats.__table__).scalar_subquery()
+
+
+class DashboardStats:
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.cache = None
+        self._local_version = 0
+        self.widgets = {
+            'counts': self._counts,
+            'recent_contacts': self._recent_contacts,
+            'recent_subscribers': self._recent_subscribers,
+        }
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def init_app(self, app, cache=None):
+        self.cache = cache
+        self.ttl = int(os.getenv('DASHBOARD_STATS_TTL', self.ttl))
+        if not event.contains(Session, 'after_flush', self._after_flush):
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+        app.extensions['dashboard_stats'] = self
+
+    # Invalidation: any ORM write to a table the dashboard reads; Core writes wait out the TTL
+
+    def _after_flush(self, session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, TRACKED_MODELS):
+                session.info[PENDING_KEY] = True
+                return
+
+    def _after_commit(self, session):
+        if session.info.pop(PENDING_KEY, False):
+            self.invalidate()
+
+    @staticmethod
+    def _after_rollback(session, previous_transaction):
+        session.info.pop(PENDING_KEY, None)
+
+    def invalidate(self):
+        self._local_version += 1
+        try:
+            if self.cache is not None:
+                self.cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=0)
+        except Exception as e:
+            print(f"Dashboard stats version error: {e}")
+
+    def version(self):
+        try:
+            if self.cache is not None:
+                version = self.cache.get(VERSION_KEY)
+                if version is None:
+                    version = uuid.uuid4().hex
+                    self.cache.set(VERSION_KEY, version, timeout=0)
+                return version
+        except Exception as e:
+            print(f"Dashboard stats version error: {e}")
+        return self._local_version
+
+    # Widgets
+
+    def _counts(self):
+        row = db.session.execute(select(
+            _count(Project).label('projects'),
+            _count(ProjectCategory).label('categories'),
+            _count(ContactSubmission).label('contact_submissions'),
+            _count(NewsletterSubscriber, NewsletterSubscriber.is_active.is_(True)).label('newsletter_subscribers'),
+            _count(Skill).label('skills'),
+            _count(Testimonial).label('testimonials'),
+            _count(DonationProject).label('donation_projects'),
+            _count(Donation).label('donations'),
+            _verified_total('USD').label('total_donations_usd'),
+            _verified_total('NPR').label('total_donations_npr'),
+        )).mappings().one()
+        return dict(row)
+
+    def _recent_contacts(self):
+        rows = db.session.query(ContactSubmission.name, ContactSubmission.subject,
+                                ContactSubmission.submitted_at, ContactSubmission.is_replied) \
+            .filter(ContactSubmission.is_spam.is_(False)) \
+            .order_by(desc(ContactSubmission.submitted_at)).limit(RECENT_LIMIT).all()
+        return [{'name': row.name, 'subject': row.subject,
+                 'submitted_at': row.submitted_at.strftime('%m/%d %H:%M') if row.submitted_at else '',
+                 'is_replied': bool(row.is_replied)} for row in rows]
+
+    def _recent_subscribers(self):
+        rows = db.session.query(NewsletterSubscriber.name, NewsletterSubscriber.email,
+                                NewsletterSubscriber.subscribed_at) \
+            .order_by(desc(NewsletterSubscriber.subscribed_at)).limit(RECENT_LIMIT).all()
+        return [{'name': row.name or row.email.split('@')[0], 'email': row.email,
+                 'subscribed_at': row.subscribed_at.strftime('%m/%d') if row.subscribed_at else ''}
+                for row in rows]
+
+    def _key(self, widget):
+        return f'dashboard_stats:{self.version()}:{widget}'
+
+    def peek(self, widget):
+        """The cached value of ``widget``, or None without querying"""
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(self._key(widget))
+        except Exception as e:
+            print(f"Dashboard stats cache error: {e}")
+            return None
+
+    def get(self, widget):
+        """The value of ``widget``, computed and cached on a miss; KeyError for unknown widgets"""
+        build = self.widgets[widget]
+        value = self.peek(widget)
+        if value is not None:
+            self.stats['hits'] += 1
+            return value
+        self.stats['misses'] += 1
+        value = build()
+        if self.cache is not None:
+            try:
+                self.cache.set(self._key(widget), value, timeout=self.ttl)
+            except Exception as e:
+                print(f"Dashboard stats cache error: {e}")
+        return value
+
+
+# Global instance
+dashboard_stats = DashboardStats()
@@ -0,0 +1,165 @@
+"""
+Admin Identity
+Verifies the admin behind a request from a signed claim in the session (user
+id and session generation) and a per-worker cache of the users it has
+checked, so an authorized admin request costs a signature check, a dict
+lookup and a read of the user's version token in the shared cache instead of
+a User query. Bumping a user's session generation (password change, logout)
+revokes every session issued before it, and changing the token makes every
+worker sharing the cache drop its entry on the next request
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+from flask import session
+from itsdangerous import BadData, URLSafeSerializer
+from sqlalchemy import event, func, inspect, update
+from sqlalchemy.orm import Session
+
+from database import db
+from models import User
+
+CLAIM_KEY = 'admin_claim'
+VERSION_KEY = 'admin_identity:version:{user_id}'
+PENDING_KEY = 'admin_principals_changed'
+# Columns whose change must end cached sessions
+REVOKING_ATTRIBUTES = ('session_generation', 'password_hash', 'is_admin')
+
+Principal = namedtuple('Principal', 'user_id username generation')
+
+
+class AdminIdentity:
+    def __init__(self, ttl=30):
+        # Entries are also re-checked after ``ttl`` seconds. With a shared cache
+        # this only bounds how long a lost token update can go unnoticed;
+        # without one (or while it is failing) it is how long other workers
+        # keep accepting a revoked session
+        self.ttl = ttl
+        self.cache = None
+        self.serializer = None
+        self._principals = {}  # user id -> (Principal, version token, checked at)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'rejected': 0, 'revoked': 0}
+
+    def init_app(self, app, cache=None):
+        self.cache = cache
+        self.ttl = int(os.getenv('ADMIN_PRINCIPAL_TTL', self.ttl))
+        self.serializer = URLSafeSerializer(app.secret_key or 'admin-identity', salt='admin-principal')
+        if not event.contains(Session, 'after_flush', self._after_flush):
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+        app.extensions['admin_identity'] = self
+
+    # Invalidation: ORM writes to a user's credentials or rights drop its cached principal
+
+    def _after_flush(self, session, flush_context):
+        for obj in (*session.dirty, *session.deleted):
+            if isinstance(obj, User):
+                state = inspect(obj)
+                if obj in session.deleted or any(state.attrs[name].history.has_changes()
+                                                 for name in REVOKING_ATTRIBUTES):
+                    session.info.setdefault(PENDING_KEY, set()).add(obj.id)
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop(PENDING_KEY, ()):
+            self.forget(user_id)
+
+    @staticmethod
+    def _after_rollback(session, previous_transaction):
+        session.info.pop(PENDING_KEY, None)
+
+    def forget(self, user_id):
+        """Drop ``user_id`` from the cache of every worker sharing the cache, and from this one's"""
+        with self._lock:
+            self._principals.pop(user_id, None)
+        try:
+            if self.cache is not None:
+                self.cache.set(VERSION_KEY.format(user_id=user_id), uuid.uuid4().hex, timeout=0)
+        except Exception as e:
+            print(f"Admin identity version error: {e}")
+
+    def version(self, user_id):
+        """Shared token that changes whenever the user's sessions or rights do; None without a shared cache"""
+        if self.cache is None:
+            return None
+        key = VERSION_KEY.format(user_id=user_id)
+        try:
+            version = self.cache.get(key)
+            if version is None:
+                version = uuid.uuid4().hex
+                self.cache.set(key, version, timeout=0)
+            return version
+        except Exception as e:
+            print(f"Admin identity version error: {e}")
+            return None
+
+    def _remember(self, principal, version):
+        with self._lock:
+            self._principals[principal.user_id] = (principal, version, time.monotonic())
+
+    # Sessions
+
+    def login(self, user):
+        """Start an admin session for ``user``, bound to its current session generation"""
+        generation = user.session_generation or 0
+        session['user_id'] = user.id
+        session['username'] = user.username
+        session['login_time'] = datetime.utcnow().isoformat()
+        session[CLAIM_KEY] = self.serializer.dumps([user.id, generation])
+        self._remember(Principal(user.id, user.username, generation), self.version(user.id))
+
+    def revoke(self, user_id):
+        """End every session of ``user_id`` by moving it to a new session generation"""
+        db.session.execute(
+            update(User).where(User.id == user_id)
+            .values(session_generation=func.coalesce(User.session_generation, 0) + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        self.forget(user_id)
+        self.stats['revoked'] += 1
+
+    def current(self):
+        """The verified admin principal of this request, or None"""
+        claim = session.get(CLAIM_KEY)
+        if not claim:
+            return None
+        try:
+            user_id, generation = self.serializer.loads(claim)
+        except (BadData, TypeError, ValueError):
+            return None
+        if user_id != session.get('user_id'):
+            return None
+
+        # Read before the User row, so a change committed in between leaves a stale token behind
+        version = self.version(user_id)
+        entry = self._principals.get(user_id)
+        if entry is not None and entry[1] == version and time.monotonic() - entry[2] < self.ttl:
+            self.stats['hits'] += 1
+            principal = entry[0]
+        else:
+            self.stats['misses'] += 1
+            row = db.session.query(User.id, User.username, User.is_admin, User.session_generation) \
+                .filter(User.id == user_id).first()
+            if row is None or not row.is_admin:
+                self.forget(user_id)
+                self.stats['rejected'] += 1
+                return None
+            principal = Principal(row.id, row.username, row.session_generation or 0)
+            self._remember(principal, version)
+
+        # Claims from an older generation were revoked
+        if principal.generation != generation:
+            self.stats['rejected'] += 1
+            return None
+        return principal
+
+
+# Global instance
+admin_identity = AdminIdentity()
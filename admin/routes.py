@@ -1,10 +1,12 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session, current_app, send_file, make_response
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, current_app, send_file, make_response, g, get_template_attribute
 from functools import wraps
 from models import (User, Project, ProjectCategory, ContactSubmission, NewsletterSubscriber, 
                    SeoSettings, PersonalInfo, SocialLink, Skill, Experience, Education, Testimonial,
                    DonationProject, Donation, PaymentMethod, ThanksgivingSettings, DonationSettings,
                    WikiArticle, WikiCategory)
 from . import admin_bp
+from .dashboard_stats import dashboard_stats
+from .identity import admin_identity
 from database import db
 from datetime import datetime, timedelta
 from sqlalchemy import desc
@@ -86,50 +88,120 @@ def admin_required(f):
             flash('Invalid session. Please log in again.', 'warning')
             return redirect(url_for('admin.login'))
         
-        # Verify user still exists and is admin
-        user = User.query.get(user_id)
-        if not user or not user.is_admin:
+        # Verify the signed principal: still an admin and not revoked (cached per worker)
+        principal = admin_identity.current()
+        if principal is None:
             session.clear()
             flash('Admin access required.', 'error')
             return redirect(url_for('admin.login'))
         
+        g.admin = principal
         return f(*args, **kwargs)
     return decorated_function
 
 @admin_bp.route('/')
 @admin_required
 def dashboard():
-    """Admin dashboard with overview statistics"""
-    stats = {
-        'projects': Project.query.count(),
-        'categories': ProjectCategory.query.count(),
-        'contact_submissions': ContactSubmission.query.count(),
-        'newsletter_subscribers': NewsletterSubscriber.query.filter_by(is_active=True).count(),
-        'skills': Skill.query.count(),
-        'testimonials': Testimonial.query.count(),
-        'donation_projects': DonationProject.query.count(),
-        'donations': Donation.query.count(),
-        'total_donations_usd': sum((d.verified_amount or d.amount) for d in Donation.query.filter_by(status='completed', currency='USD').all()),
-        'total_donations_npr': sum((d.verified_amount or d.amount) for d in Donation.query.filter_by(status='completed', currency='NPR').all()),
-        'recent_contacts': ContactSubmission.query.filter_by(is_spam=False).order_by(desc(ContactSubmission.submitted_at)).limit(5).all(),
-        'recent_subscribers': NewsletterSubscriber.query.order_by(desc(NewsletterSubscriber.subscribed_at)).limit(5).all(),
-        'recent_donations': Donation.query.order_by(desc(Donation.created_at)).limit(5).all()
-    }
+    """Admin dashboard with overview statistics; widgets not cached yet load from the API"""
+    stats = {widget: dashboard_stats.peek(widget) for widget in dashboard_stats.widgets}
     # Add newsletter send page URL for dashboard quick link
     newsletter_send_url = url_for('admin.newsletter_send')
     return render_template('admin/dashboard.html', stats=stats, newsletter_send_url=newsletter_send_url)
 
+# ============ PAGE CACHE ============
+def _prewarm_homepage():
+    """Render the homepage through the normal view so it lands in the page cache"""
+    client = current_app.test_client()
+    response = client.get('/', base_url=request.host_url)
+    # Time a second request, which should be served from the cache
+    start = time.perf_counter()
+    client.get('/', base_url=request.host_url)
+    hit_ms = (time.perf_counter() - start) * 1000
+    return response.status_code, hit_ms
+
+@admin_bp.route('/cache/homepage/purge', methods=['POST'])
+@admin_required
+def page_cache_purge():
+    """Drop every cached homepage render"""
+    from page_cache import page_cache
+    try:
+        page_cache.purge()
+        if request.args.get('prewarm') or request.form.get('prewarm'):
+            _prewarm_homepage()
+        if request.is_json:
+            return jsonify({'status': 'success', 'stats': page_cache.get_stats()})
+        flash('Homepage cache purged.', 'success')
+    except Exception as e:
+        logger.error(f"Page cache purge failed: {e}")
+        if request.is_json:
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+        flash(f'Error purging homepage cache: {str(e)}', 'danger')
+    return redirect(url_for('admin.dashboard'))
+
+@admin_bp.route('/cache/homepage/prewarm', methods=['POST'])
+@admin_required
+def page_cache_prewarm():
+    """Render the homepage into the cache ahead of visitors"""
+    from page_cache import page_cache
+    try:
+        status_code, hit_ms = _prewarm_homepage()
+        if status_code != 200:
+            raise RuntimeError(f'homepage returned HTTP {status_code}')
+        if request.is_json:
+            return jsonify({'status': 'success', 'hit_ms': round(hit_ms, 3), 'stats': page_cache.get_stats()})
+        flash(f'Homepage cache prewarmed (cached request served in {hit_ms:.2f} ms).', 'success')
+    except Exception as e:
+        logger.error(f"Page cache prewarm failed: {e}")
+        if request.is_json:
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+        flash(f'Error prewarming homepage cache: {str(e)}', 'danger')
+    return redirect(url_for('admin.dashboard'))
+
+@admin_bp.route('/api/cache/homepage/stats')
+@admin_required
+def page_cache_stats():
+    """Homepage cache statistics"""
+    from page_cache import page_cache
+    return jsonify({'status': 'success', 'stats': page_cache.get_stats()})
+
+@admin_bp.route('/api/http/stats')
+@admin_required
+def http_client_stats():
+    """Outbound HTTP request counts and latency per host (this worker only)"""
+    from http_client import http_client
+    return jsonify({'status': 'success', 'stats': http_client.get_stats()})
+
+@admin_bp.route('/api/tasks/stats')
+@admin_required
+def task_queue_stats():
+    """Background task counts by status, plus the most recent dead tasks"""
+    from task_queue import task_queue
+    from models import QueuedTask
+    dead = QueuedTask.query.filter_by(status='dead').order_by(QueuedTask.finished_at.desc()).limit(20).all()
+    return jsonify({'status': 'success', 'stats': task_queue.get_stats(),
+                    'dead': [task.to_dict() for task in dead]})
+
+@admin_bp.route('/api/tasks/<int:task_id>/requeue', methods=['POST'])
+@admin_required
+def task_queue_requeue(task_id):
+    """Retry a dead background task"""
+    from task_queue import task_queue
+    if not task_queue.requeue_dead(task_id):
+        return jsonify({'status': 'error', 'message': 'No dead task with that id'}), 404
+    return jsonify({'status': 'success', 'message': f'Task {task_id} requeued'})
+
 # ============ NEWSLETTER SENDING (ADMIN) ============
 @admin_bp.route('/newsletter/send', methods=['GET', 'POST'])
 @admin_required
 def newsletter_send():
-    """Send a newsletter to selected subscribers from the admin panel"""
-    from email_service import EmailService
-    from models import NewsletterSubscriber
+    """Queue a newsletter to selected subscribers; delivery runs in the background"""
+    from models import NewsletterSubscriber, NewsletterJob
+    from newsletter_delivery import newsletter_delivery
 
     active_subscribers = NewsletterSubscriber.query.filter_by(is_active=True).order_by(
         NewsletterSubscriber.subscribed_at.desc()
     ).all()
+    recent_jobs = NewsletterJob.query.order_by(desc(NewsletterJob.created_at)).limit(5).all()
 
     if request.method == 'POST':
         subject = request.form.get('subject', '').strip()
@@ -138,40 +210,86 @@ def newsletter_send():
 
         if not subject or not content:
             flash('Subject and content are required.', 'danger')
-            return render_template('admin/newsletter/send.html',
-                                   subscribers=active_subscribers, subject=subject, content=content)
+            return render_template('admin/newsletter/send.html', subscribers=active_subscribers,
+                                   subject=subject, content=content, recent_jobs=recent_jobs)
 
         if not selected_ids:
             flash('Please select at least one subscriber.', 'warning')
-            return render_template('admin/newsletter/send.html',
-                                   subscribers=active_subscribers, subject=subject, content=content)
+            return render_template('admin/newsletter/send.html', subscribers=active_subscribers,
+                                   subject=subject, content=content, recent_jobs=recent_jobs)
 
-        # Get emails for selected subscriber IDs (only active ones)
+        # Selected subscribers (only active ones)
         selected = NewsletterSubscriber.query.filter(
             NewsletterSubscriber.id.in_(selected_ids),
             NewsletterSubscriber.is_active == True
         ).all()
-        subscriber_emails = [s.email for s in selected]
 
-        if not subscriber_emails:
+        if not selected:
             flash('No valid active subscribers selected.', 'warning')
-            return render_template('admin/newsletter/send.html',
-                                   subscribers=active_subscribers, subject=subject, content=content)
-
-        email_service = EmailService()
-        success = email_service.send_newsletter(subscriber_emails, subject, content)
-        if success:
-            flash(f'Newsletter sent to {len(subscriber_emails)} subscriber(s)!', 'success')
-            return redirect(url_for('admin.newsletter'))
-        else:
-            flash('Failed to send newsletter. Check logs for details.', 'danger')
-            return render_template('admin/newsletter/send.html',
-                                   subscribers=active_subscribers, subject=subject, content=content)
+            return render_template('admin/newsletter/send.html', subscribers=active_subscribers,
+                                   subject=subject, content=content, recent_jobs=recent_jobs)
 
-    return render_template('admin/newsletter/send.html', subscribers=active_subscribers)
+        try:
+            job = newsletter_delivery.create_job(subject, content, selected, created_by=session.get('username'))
+            newsletter_delivery.start(job.id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to queue newsletter: {e}")
+            flash('Failed to queue newsletter. Check logs for details.', 'danger')
+            return render_template('admin/newsletter/send.html', subscribers=active_subscribers,
+                                   subject=subject, content=content, recent_jobs=recent_jobs)
+
+        flash(f'Newsletter queued for {job.total} subscriber(s).', 'success')
+        return redirect(url_for('admin.newsletter_job', id=job.id))
+
+    return render_template('admin/newsletter/send.html', subscribers=active_subscribers, recent_jobs=recent_jobs)
+
+@admin_bp.route('/newsletter/jobs/<int:id>')
+@admin_required
+def newsletter_job(id):
+    """Live progress of one newsletter send"""
+    from models import NewsletterJob
+    from newsletter_delivery import newsletter_delivery
+    job = NewsletterJob.query.get_or_404(id)
+    failures = job.deliveries.filter_by(status='failed').limit(50).all()
+    return render_template('admin/newsletter/job.html', job=job,
+                           progress=newsletter_delivery.progress(id), failures=failures)
+
+@admin_bp.route('/api/newsletter/jobs/<int:id>')
+@admin_required
+def newsletter_job_progress(id):
+    """Progress counters polled by the job page"""
+    from newsletter_delivery import newsletter_delivery
+    progress = newsletter_delivery.progress(id)
+    if progress is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify({'status': 'success', 'job': progress})
+
+@admin_bp.route('/newsletter/jobs/<int:id>/resume', methods=['POST'])
+@admin_required
+def newsletter_job_resume(id):
+    """Restart a newsletter send whose sender stopped (e.g. the worker was recycled)"""
+    from newsletter_delivery import newsletter_delivery
+    progress = newsletter_delivery.progress(id)
+    if progress is None:
+        flash('Newsletter job not found.', 'danger')
+    elif progress['status'] == 'queued' or progress['stalled']:
+        newsletter_delivery.start(id)
+        flash('Newsletter delivery resumed.', 'success')
+    else:
+        flash(f"Newsletter job is {progress['status']}; nothing to resume.", 'info')
+    return redirect(url_for('admin.newsletter_job', id=id))
 
 
 # ============ PROJECTS MANAGEMENT ============
+def _queue_image_variants(image_url):
+    """Generate responsive variants in the background for a project image served from /static"""
+    from images import images, SOURCE_EXTENSIONS
+    from task_queue import task_queue
+    path = images.static_path(image_url)
+    if path and os.path.splitext(path)[1].lower() in SOURCE_EXTENSIONS:
+        task_queue.enqueue('image_variants', path=path)
+
 @admin_bp.route('/projects')
 @admin_required
 def projects():
@@ -230,12 +348,10 @@ def projects_create():
         )
         
         db.session.add(project)
+        _queue_image_variants(project.image_url)
         db.session.commit()
         
-        # Try to fetch GitHub data if URL provided
-        if project.github_url:
-            project.fetch_github_data()
-            db.session.commit()
+        # GitHub stats are fetched by the background refresher; new projects are due immediately
         
         if request.is_json:
             return jsonify({'status': 'success', 'message': 'Project created successfully!'})
@@ -266,8 +382,14 @@ def projects_edit(id):
         
         project.title = data.get('title', project.title)
         project.description = data.get('description', project.description)
+        if data.get('image_url', project.image_url) != project.image_url:
+            _queue_image_variants(data.get('image_url'))
         project.image_url = data.get('image_url', project.image_url)
-        project.github_url = data.get('github_url', project.github_url)
+        github_url = data.get('github_url', project.github_url)
+        if github_url != project.github_url:
+            # Queue the new repository for the background refresher
+            project.github_data_updated = None
+        project.github_url = github_url
         project.live_url = data.get('live_url', project.live_url)
         project.commercial_url = data.get('commercial_url', project.commercial_url)
         project.technologies = data.get('technologies', project.technologies)
@@ -730,11 +852,8 @@ def login():
     """Admin login with enhanced security"""
     if request.method == 'GET':
         # Check if already logged in
-        user_id = session.get('user_id')
-        if user_id:
-            user = User.query.get(user_id)
-            if user and user.is_admin:
-                return redirect(url_for('admin.dashboard'))
+        if admin_identity.current() is not None:
+            return redirect(url_for('admin.dashboard'))
         return render_template('admin/login.html')
     
     try:
@@ -759,25 +878,20 @@ def login():
         # Check credentials and admin status
         if user and user.check_password(password) and user.is_admin:
             # Successful login
-            session['user_id'] = user.id
-            session['username'] = user.username
-            session['login_time'] = datetime.utcnow().isoformat()
+            admin_identity.login(user)
             
             # Log successful login
             current_app.logger.info(f'Admin login successful: {username} from IP: {get_remote_address()}')
             
-            # Send admin login notification email
+            # Admin login notification email is sent by the task worker
             try:
-                from email_service import email_service
-                login_time = datetime.utcnow()
-                email_service.send_admin_login_notification(
-                    username=username,
-                    ip_address=get_remote_address(),
-                    timestamp=login_time
-                )
-                current_app.logger.info(f'Admin login notification sent for: {username}')
+                from task_queue import task_queue
+                task_queue.enqueue('admin_login_notification', username=username,
+                                   ip_address=get_remote_address(), timestamp=datetime.utcnow().isoformat())
+                db.session.commit()
             except Exception as e:
-                current_app.logger.error(f'Failed to send admin login notification: {e}')
+                db.session.rollback()
+                current_app.logger.error(f'Failed to queue admin login notification: {e}')
             
             flash('Welcome to admin dashboard!', 'success')
             
@@ -807,11 +921,59 @@ def logout():
     # Log logout
     current_app.logger.info(f'Admin logout: {username} from IP: {get_remote_address()}')
     
+    # Revoke this user's sessions everywhere, not just this cookie
+    principal = admin_identity.current()
+    if principal is not None:
+        try:
+            admin_identity.revoke(principal.user_id)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'Failed to revoke admin sessions for {username}: {e}')
+    
     # Clear session
     session.clear()
     flash('You have been logged out successfully.', 'info')
     return redirect(url_for('admin.login'))
 
+@admin_bp.route('/change-password', methods=['GET', 'POST'])
+@admin_required
+def change_password():
+    """Change the admin password; ends every session of this user"""
+    if request.method == 'GET':
+        return render_template('admin/change_password.html')
+    
+    current_password = request.form.get('current_password', '')
+    new_password = request.form.get('new_password', '')
+    confirm_password = request.form.get('confirm_password', '')
+    
+    user = db.session.get(User, g.admin.user_id)
+    if not user or not user.check_password(current_password):
+        flash('Current password is incorrect.', 'error')
+        time.sleep(1)
+        return render_template('admin/change_password.html')
+    if new_password != confirm_password:
+        flash('New passwords do not match.', 'error')
+        return render_template('admin/change_password.html')
+    is_valid, message = validate_strong_password(new_password)
+    if not is_valid:
+        flash(message, 'error')
+        return render_template('admin/change_password.html')
+    
+    try:
+        # set_password moves the user to a new session generation
+        user.set_password(new_password)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Admin password change failed for {user.username}: {e}')
+        flash('Error changing password. Please try again.', 'error')
+        return render_template('admin/change_password.html')
+    
+    current_app.logger.info(f'Admin password changed: {user.username} from IP: {get_remote_address()}')
+    session.clear()
+    flash('Password changed. Please log in with your new password.', 'success')
+    return redirect(url_for('admin.login'))
+
 # ============ API ROUTES FOR AJAX ============
 @admin_bp.route('/api/projects/<int:id>/toggle-featured', methods=['POST'])
 @admin_required
@@ -1625,6 +1787,7 @@ def donation_project_create():
         )
         
         db.session.add(project)
+        _queue_image_variants(project.image_url)
         db.session.commit()
         
         if request.is_json:
@@ -1658,6 +1821,8 @@ def donation_project_update(project_id):
         project.description = request.form['description']
         project.short_description = request.form.get('short_description', '')
         project.goal_amount = float(request.form.get('goal_amount', 0))
+        if request.form.get('image_url', '') != project.image_url:
+            _queue_image_variants(request.form.get('image_url', ''))
         project.image_url = request.form.get('image_url', '')
         project.github_url = request.form.get('github_url', '')
         project.demo_url = request.form.get('demo_url', '')
@@ -1733,15 +1898,18 @@ def donations():
     elif anonymous == 'false':
         query = query.filter_by(is_anonymous=False)
     
-    # Execute query with pagination
-    page = request.args.get('page', 1, type=int)
-    donations_paginated = query.order_by(desc(Donation.created_at)).paginate(
-        page=page, per_page=25, error_out=False)
+    # Execute query with keyset pagination (newest first, id breaks ties)
+    from pagination import keyset_pagination
+    donations_paginated = keyset_pagination.paginate(
+        query, (Donation.created_at, Donation.id), descending=True,
+        cursor=request.args.get('cursor'), per_page=25,
+        filters={'status': status, 'currency': currency, 'anonymous': anonymous})
     
-    # Calculate totals by currency
-    completed_donations = Donation.query.filter_by(status='completed').all()
-    total_usd = sum((d.verified_amount or d.amount) for d in completed_donations if d.currency == 'USD')
-    total_npr = sum((d.verified_amount or d.amount) for d in completed_donations if d.currency == 'NPR')
+    # Totals by currency from the maintained aggregate
+    from donation_stats import donation_stats
+    donation_totals = donation_stats.get_totals()
+    total_usd = donation_totals['verified_usd']
+    total_npr = donation_totals['verified_npr']
     
     return render_template('admin/donations/list.html', 
                          donations=donations_paginated,
@@ -1789,26 +1957,18 @@ def donations_edit(id):
             if old_verified != new_verified:
                 donation.project.current_amount += (new_verified - old_verified)
         
+        # Send confirmation email if status changed to completed and checkbox is checked
+        queue_confirmation = old_status != 'completed' and donation.status == 'completed' and send_confirmation
+        if queue_confirmation:
+            from task_queue import task_queue
+            # Use custom email amount if provided, otherwise use verified amount
+            display_amount = float(email_amount) if email_amount else donation.verified_amount
+            task_queue.enqueue('donation_confirmation', donation_id=donation.id, amount=display_amount)
+        
         db.session.commit()
         
-        # Send confirmation email if status changed to completed and checkbox is checked
-        if old_status != 'completed' and donation.status == 'completed' and send_confirmation:
-            try:
-                from email_service import email_service
-                if email_service:
-                    # Use custom email amount if provided, otherwise use verified amount
-                    display_amount = float(email_amount) if email_amount else donation.verified_amount
-                    email_service.send_donation_confirmation(
-                        donation,
-                        donation.project.title,
-                        display_amount
-                    )
-                    flash('Donation updated and confirmation email sent!', 'success')
-                else:
-                    flash('Donation updated but email service not available.', 'warning')
-            except Exception as e:
-                logger.error(f"Failed to send donation confirmation email: {e}")
-                flash('Donation updated but failed to send confirmation email.', 'warning')
+        if queue_confirmation:
+            flash('Donation updated and confirmation email queued!', 'success')
         else:
             flash('Donation updated successfully!', 'success')
         
@@ -1867,20 +2027,13 @@ def donations_update_status(id):
             verified_amount = donation.verified_amount or donation.amount
             donation.project.current_amount -= verified_amount
         
-        db.session.commit()
-        
         # Send confirmation email if status changed to completed
         if old_status != 'completed' and new_status == 'completed':
-            try:
-                from email_service import email_service
-                if email_service:
-                    email_service.send_donation_confirmation(
-                        donation,
-                        donation.project.title,
-                        donation.verified_amount or donation.amount
-                    )
-            except Exception as e:
-                logger.error(f"Failed to send donation confirmation email: {e}")
+            from task_queue import task_queue
+            task_queue.enqueue('donation_confirmation', donation_id=donation.id,
+                               amount=donation.verified_amount or donation.amount)
+        
+        db.session.commit()
         
         flash(f'Donation status updated to {new_status.title()}!', 'success')
         return redirect(url_for('admin.donations'))
@@ -2129,6 +2282,23 @@ def donation_settings_update():
         flash(f'Error updating settings: {str(e)}', 'danger')
         return redirect(url_for('admin.donation_settings'))
 
+# ============ DASHBOARD API ============
+@admin_bp.route('/api/dashboard/<widget>')
+@admin_required
+def api_dashboard_widget(widget):
+    """One dashboard widget as JSON, with its rendered HTML for list widgets"""
+    if widget not in dashboard_stats.widgets:
+        return jsonify({'status': 'error', 'message': 'Unknown widget'}), 404
+    try:
+        data = dashboard_stats.get(widget)
+        payload = {'status': 'success', 'widget': widget, 'data': data}
+        if widget != 'counts':
+            payload['html'] = str(get_template_attribute('admin/dashboard_widgets.html', widget)(data))
+        return jsonify(payload)
+    except Exception as e:
+        current_app.logger.error(f'Dashboard widget {widget} failed: {e}')
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 # ============ SESSION API ENDPOINTS ============
 @admin_bp.route('/api/session-status')
 @admin_required
@@ -1,5 +1,5 @@
 import os
-from flask import Flask, render_template, jsonify, abort, request
+from flask import render_template, jsonify, abort, request
 from dotenv import load_dotenv
 from database import db
 import commands
@@ -12,13 +12,15 @@ from flask_limiter.util import get_remote_address
 from config import SUBDOMAINS, THEME_CONFIG, SEO_CONFIG, CONTACT_INFO, FEATURES
 from datetime import datetime
 from github_service import github_service
+from subdomain_dispatcher import SubdomainFlask, subdomain_dispatcher
+from page_cache import page_cache
 import traceback
 import re
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+app = SubdomainFlask(__name__)
 
 # Fix Flask routing for subdomains
 app.url_map.strict_slashes = False
@@ -37,22 +39,10 @@ def markdown_filter(text):
     """Convert markdown to HTML"""
     if not text:
         return text
-    import markdown
     from markupsafe import Markup
-    # Use safe extensions and configurations
-    md = markdown.Markdown(extensions=[
-        'codehilite',  # Syntax highlighting for code blocks
-        'fenced_code',  # Support for fenced code blocks
-        'tables',  # Support for tables
-        'toc',  # Table of contents
-        'nl2br',  # Convert newlines to <br>
-    ], extension_configs={
-        'codehilite': {
-            'css_class': 'highlight',
-            'use_pygments': True,
-        }
-    })
-    return Markup(md.convert(text))
+    from utils.markdown_renderer import render_markdown
+    html, _ = render_markdown(text)
+    return Markup(html)
 
 # Configure rate limiting based on environment
 debug_mode = os.getenv('DEBUG', 'False').lower() == 'true'
@@ -113,6 +103,66 @@ migrate = Migrate(app, db)
 # Initialize GitHub service with caching
 github_service.init_cache(app)
 
+# Full-page cache for the homepage, invalidated whenever its content tables change
+from models import (Project, ProjectCategory, SeoSettings, PersonalInfo,
+                    SocialLink, Skill, Experience, Education, Testimonial)
+page_cache.init_app(app, watched_models=(Project, ProjectCategory, SeoSettings, PersonalInfo,
+                                         SocialLink, Skill, Experience, Education, Testimonial))
+
+# Full-text index for wiki search, kept in step with article writes
+from models import WikiArticle
+from wiki.search_index import wiki_search
+wiki_search.init_app(app, WikiArticle)
+from wiki.random_articles import random_articles
+random_articles.init_app(app, WikiArticle)
+from wiki.category_tree import category_tree
+category_tree.init_app(app, cache=page_cache.cache)
+# Article views are buffered and written in batches (see wiki/view_counter.py)
+from wiki.view_counter import view_counter
+view_counter.init_app(app, WikiArticle)
+
+from donation_stats import donation_stats
+donation_stats.init_app(app)
+
+# Durable background tasks, run by `flask run-task-worker`
+from task_queue import task_queue
+import tasks  # registers the task handlers
+task_queue.init_app(app)
+
+# Offline GeoIP lookups for admin security notifications
+from ip_intel import ip_intel
+ip_intel.init_app(app)
+
+# Sitemaps share the page cache store; entries are keyed by a content fingerprint
+from sitemaps import sitemaps
+sitemaps.init_app(app, cache=page_cache.cache)
+
+# Keyset pagination for long lists; total counts cached until their table is written
+from models import Donation
+from pagination import keyset_pagination
+keyset_pagination.init_app(app, cache=page_cache.cache, tracked_models=(WikiArticle, Donation))
+
+# Fingerprinted static assets (built by `flask build-assets`) served with immutable caching
+from assets import assets
+assets.init_app(app)
+
+# Responsive image variants (built by `flask build-image-variants` and on admin saves)
+from images import images
+images.init_app(app)
+
+# Conditional GET (ETag/Last-Modified -> 304) for public content views
+from conditional import conditional_get
+conditional_get.init_app(app)
+
+# Admin principals verified from a signed session claim, cached per worker and
+# revoked in every worker through a version token in the shared cache
+from admin.identity import admin_identity
+admin_identity.init_app(app, cache=page_cache.cache)
+
+# Admin dashboard widgets from one aggregate query, cached briefly
+from admin.dashboard_stats import dashboard_stats
+dashboard_stats.init_app(app, cache=page_cache.cache)
+
 # Setup Flask-Login (can co-exist if other parts of app use it)
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -161,199 +211,6 @@ else:
 # Import models here (after db initialization)
 from models import *
 
-@app.before_request
-def handle_subdomain_routing():
-    """Handle subdomain routing manually"""
-    host = request.headers.get('Host', '')
-    path = request.path
-    print(f"DEBUG: Request - Host: {host}, Path: {path}, URL: {request.url}")
-    print(f"DEBUG: Flask SERVER_NAME: {app.config.get('SERVER_NAME')}")
-    
-    # Extract subdomain from host
-    if host.startswith('wiki.'):
-        # Import wiki functions
-        from wiki.routes import index as wiki_index, search as wiki_search, article as wiki_article, random as wiki_random, random_article as wiki_random_article, explore as wiki_explore
-        
-        if path == '/':
-            print("DEBUG: Routing to wiki index")
-            # Set the endpoint for template context
-            from flask import g
-            g.endpoint = 'wiki.index'
-            return wiki_index()
-        elif path == '/search':
-            print("DEBUG: Routing to wiki search")
-            from flask import g
-            g.endpoint = 'wiki.search'
-            return wiki_search()
-        elif path.startswith('/article/'):
-            article_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to wiki article {article_id}")
-                from flask import g
-                g.endpoint = 'wiki.article'
-                return wiki_article(int(article_id))
-            except ValueError:
-                pass
-        elif path == '/random':
-            print("DEBUG: Routing to wiki random")
-            from flask import g
-            g.endpoint = 'wiki.random'
-            return wiki_random()
-        elif path == '/random-article':
-            print("DEBUG: Routing to wiki random article")
-            from flask import g
-            g.endpoint = 'wiki.random_article'
-            return wiki_random_article()
-        elif path == '/explore':
-            print("DEBUG: Routing to wiki explore")
-            from flask import g
-            g.endpoint = 'wiki.explore'
-            return wiki_explore()
-    
-    elif host.startswith('git.'):
-        # Import git functions
-        from git.routes import index as git_index, search as git_search, project as git_project, api_projects as git_api_projects, github_cache_stats, clear_github_cache, force_refresh_project
-        
-        if path == '/':
-            print("DEBUG: Routing to git index")
-            return git_index()
-        elif path == '/search':
-            print("DEBUG: Routing to git search")
-            return git_search()
-        elif path.startswith('/project/'):
-            project_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to git project {project_id}")
-                return git_project(int(project_id))
-            except ValueError:
-                pass
-        elif path == '/api/projects':
-            print("DEBUG: Routing to git api projects")
-            return git_api_projects()
-        elif path == '/api/github/cache-stats':
-            return github_cache_stats()
-        elif path == '/api/github/clear-cache':
-            return clear_github_cache()
-        elif path.startswith('/api/github/force-refresh/'):
-            project_id = path.split('/')[-1]
-            try:
-                return force_refresh_project(int(project_id))
-            except ValueError:
-                pass
-    
-    elif host.startswith('donation.'):
-        # Import donation functions
-        from donation.routes import (index as donation_index, project_detail as donation_project_detail, 
-                                   donate as donation_donate, donation_success, subscribe_newsletter as donation_subscribe_newsletter,
-                                   api_projects as donation_api_projects, api_project as donation_api_project, 
-                                   api_donations as donation_api_donations, highlights as donation_highlights,
-                                   thanksgiving as donation_thanksgiving, why_donate as donation_why_donate,
-                                   api_donate as donation_api_donate, payment_instructions as donation_payment_instructions)
-        
-        if path == '/':
-            print("DEBUG: Routing to donation index")
-            from flask import g
-            g.endpoint = 'donation.index'
-            return donation_index()
-        elif path.startswith('/project/'):
-            project_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to donation project {project_id}")
-                from flask import g
-                g.endpoint = 'donation.project_detail'
-                return donation_project_detail(int(project_id))
-            except ValueError:
-                pass
-        elif path.startswith('/donate/'):
-            project_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to donation donate {project_id}")
-                from flask import g
-                g.endpoint = 'donation.donate'
-                return donation_donate(int(project_id))
-            except ValueError:
-                pass
-        elif path.startswith('/success/'):
-            donation_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to donation success {donation_id}")
-                from flask import g
-                g.endpoint = 'donation.donation_success'
-                return donation_success(int(donation_id))
-            except ValueError:
-                pass
-        elif path == '/subscribe':
-            print("DEBUG: Routing to donation subscribe")
-            from flask import g
-            g.endpoint = 'donation.subscribe_newsletter'
-            return donation_subscribe_newsletter()
-        elif path == '/api/projects':
-            print("DEBUG: Routing to donation api projects")
-            from flask import g
-            g.endpoint = 'donation.api_projects'
-            return donation_api_projects()
-        elif path.startswith('/api/project/'):
-            project_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to donation api project {project_id}")
-                from flask import g
-                g.endpoint = 'donation.api_project'
-                return donation_api_project(int(project_id))
-            except ValueError:
-                pass
-        elif path.startswith('/api/donations/'):
-            project_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to donation api donations {project_id}")
-                from flask import g
-                g.endpoint = 'donation.api_donations'
-                return donation_api_donations(int(project_id))
-            except ValueError:
-                pass
-        elif path == '/highlights':
-            print("DEBUG: Routing to donation highlights")
-            from flask import g
-            g.endpoint = 'donation.highlights'
-            return donation_highlights()
-        elif path == '/thanksgiving':
-            print("DEBUG: Routing to donation thanksgiving")
-            from flask import g
-            g.endpoint = 'donation.thanksgiving'
-            return donation_thanksgiving()
-        elif path.startswith('/why-donate/'):
-            project_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to donation why-donate {project_id}")
-                from flask import g
-                g.endpoint = 'donation.why_donate'
-                return donation_why_donate(int(project_id))
-            except ValueError:
-                pass
-        elif path == '/api/donate':
-            print("DEBUG: Routing to donation api donate")
-            from flask import g
-            g.endpoint = 'donation.api_donate'
-            return donation_api_donate()
-        elif path.startswith('/payment/'):
-            donation_id = path.split('/')[-1]
-            try:
-                print(f"DEBUG: Routing to donation payment {donation_id}")
-                from flask import g
-                g.endpoint = 'donation.payment_instructions'
-                return donation_payment_instructions(int(donation_id))
-            except ValueError:
-                pass
-    
-    elif host.startswith('store.'):
-        from store.routes import index as store_index
-        if path == '/':
-            print("DEBUG: Routing to store index")
-            return store_index()
-    
-    # For main domain or if no subdomain route matches, continue to normal routing
-    print("DEBUG: No subdomain routing applied, continuing to normal Flask routing")
-    return None
-
 # Security headers for all responses
 @app.after_request
 def add_security_headers(response):
@@ -370,37 +227,36 @@ def add_security_headers(response):
         "connect-src 'self' https:; "
         "frame-ancestors 'self'"
     )
+    # Cache-Control for views that declared a route class (see conditional.py)
+    conditional_get.apply_cache_policy(response)
     return response
 
 # Main routes
 @app.route('/')
 def index():
-    # Add debugging to see what host is being received
-    host = request.headers.get('Host', '')
-    print(f"DEBUG: Main index route called with Host: {host}")
-    print(f"DEBUG: Request URL: {request.url}")
-    print(f"DEBUG: Request endpoint: {request.endpoint}")
-    
+    # Query strings (tracking parameters etc.) always render fresh so they
+    # cannot fill the page cache with one entry per unique URL
+    cacheable = not request.query_string
+    variant = f"{request.scheme}://{request.host}:{datetime.now().year}"
+    version = None
+    if cacheable:
+        # Read once, before rendering: the page is stored under the version it was rendered from
+        version = page_cache.get_version()
+        html = page_cache.get('index', variant, version=version)
+        if html is not None:
+            return html
+
+    html, complete = render_homepage()
+    if cacheable and complete:
+        page_cache.set('index', html, variant, version=version)
+    return html
+
+def render_homepage():
+    """Render the homepage. Returns (html, complete); the fallback page is not complete."""
     try:
-        # Fetch portfolio data from database
-        from models import (Project, ProjectCategory, SeoSettings, PersonalInfo, 
-                          SocialLink, Skill, Experience, Education, Testimonial)        # Get projects for homepage and all categories
-        homepage_projects = Project.query.filter_by(show_on_homepage=True).order_by(Project.created_at.desc()).limit(9).all()
-        featured_projects = Project.query.filter_by(is_featured=True).order_by(Project.created_at.desc()).limit(9).all()
-        all_projects = Project.query.order_by(Project.created_at.desc()).all()
-        project_categories = ProjectCategory.query.all()
-        
-        # Use homepage projects as primary, fall back to featured, then to first 9
-        display_projects = homepage_projects or featured_projects or all_projects[:9]
-        
-        # Get CMS data
-        seo = SeoSettings.query.filter_by(page_name='home').first() or SeoSettings.query.first()
-        personal = PersonalInfo.query.first()
-        social_links = SocialLink.query.filter_by(is_active=True).order_by(SocialLink.sort_order).all()
-        skills = Skill.query.filter_by(is_featured=True).order_by(Skill.sort_order).all()
-        experience = Experience.query.order_by(Experience.start_date.desc()).limit(3).all()
-        education = Education.query.order_by(Education.start_date.desc()).limit(3).all()
-        testimonials = Testimonial.query.filter_by(is_featured=True).order_by(Testimonial.sort_order, Testimonial.created_at.desc()).limit(25).all()
+        # Load all homepage content in a fixed number of queries
+        from portfolio_snapshot import PortfolioSnapshot
+        snapshot = PortfolioSnapshot.for_homepage()
         
         # Pass configuration data to template
         template_data = {
@@ -409,18 +265,18 @@ def index():
             'seo_config': SEO_CONFIG,
             'contact_info': CONTACT_INFO,
             'features': FEATURES,
-            'portfolio_projects': display_projects,
-            'project_categories': project_categories,
+            'portfolio_projects': snapshot.projects,
+            'project_categories': snapshot.project_categories,
             # CMS data
-            'seo': seo,
-            'personal': personal,
-            'social_links': social_links,
-            'skills': skills,
-            'experience': experience,
-            'education': education,
-            'testimonials': testimonials
+            'seo': snapshot.seo,
+            'personal': snapshot.personal,
+            'social_links': snapshot.social_links,
+            'skills': snapshot.skills,
+            'experience': snapshot.experience,
+            'education': snapshot.education,
+            'testimonials': snapshot.testimonials
         }
-        return render_template('index.html', **template_data, current_year=datetime.now().year)
+        return render_template('index.html', **template_data, current_year=datetime.now().year), True
     except Exception as e:
         print(f"Error loading portfolio data: {e}")
         # Fallback to template without portfolio data
@@ -433,7 +289,7 @@ def index():
             'portfolio_projects': [],
             'project_categories': []
         }
-        return render_template('index.html', **template_data, current_year=datetime.now().year)
+        return render_template('index.html', **template_data, current_year=datetime.now().year), False
 
 @app.route('/newsletter/subscribe', methods=['POST'])
 @limiter.limit("5 per minute")  # Rate limit: 5 submissions per minute per IP
@@ -441,7 +297,6 @@ def newsletter_subscribe():
     """Handle newsletter subscription from the main site with bot protection"""
     try:
         from models import NewsletterSubscriber
-        from email_service import email_service
         
         # Get form data
         email = request.form.get('email', '').strip().lower()
@@ -492,54 +347,10 @@ def newsletter_subscribe():
                 interests=interests or 'General Updates'
             )
             db.session.add(subscriber)
+            # Welcome email is sent by the task worker, committed with the subscription
+            task_queue.enqueue('newsletter_welcome', email=email)
             db.session.commit()
             
-            # Send welcome email
-            try:
-                welcome_subject = "🌟 Welcome to Lusan's Newsletter!"
-                welcome_message = f"""
-Dear {email.split('@')[0].capitalize()},
-
-Thanks a lot for signing up — I truly appreciate it!
-
-This newsletter is my little corner of the web where I share what I’ve been working on, what I’m learning, and anything I think might be helpful or interesting to fellow developers like you.
-
-Here’s a quick peek at what you can expect:
-
-🔥 Behind-the-Scenes Project Updates
-Get a first look at my latest builds, experiments, and open-source work.
-
-🧠 Practical Tutorials & Dev Notes
-I’ll share what I’ve learned — patterns, tips, and real-world lessons that have helped me improve as a developer.
-
-💡 Workflow & Productivity Tips
-Occasionally, I’ll drop a few things that have made coding or managing projects smoother for me.
-
-🌱 A Growing Developer Community
-You’ll be part of a small but growing space where devs help each other grow — no noise, just value.
-
-🎁 Extra Stuff (When I Can)
-From snippets to articles, case studies, or templates — if I build something useful, you’ll get it here first.
-
-That’s it — nothing fancy, no pressure. Just useful, honest content for devs who love to build.
-
-If you ever want to say hi, ask something, or share what you’re working on, feel free to reply — I read every message.
-
-Talk soon,
-Lusan
-Just a developer, trying to build good things.
-
-https://lusansapkota.com.np
-"""
-                
-                email_service.send_email(
-                    [email], 
-                    welcome_subject, 
-                    welcome_message
-                )
-            except Exception as e:
-                print(f"Failed to send welcome email: {e}")
-            
             return jsonify({'status': 'success', 'message': 'Thank you for subscribing! Check your email for confirmation.'})
         
     except Exception as e:
@@ -633,13 +444,12 @@ def handle_exception(e):
 @app.route('/contact/submit', methods=['POST'])
 @limiter.limit("3 per minute")  # Rate limit: 3 contact form submissions per minute per IP
 def contact_submit():
-    """Handle contact form submission — saves to DB instantly, emails fire in background thread."""
-    import logging, traceback, threading
+    """Handle contact form submission — saves to DB instantly, emails are queued for the task worker."""
+    import logging, traceback
     contact_logger = logging.getLogger(__name__)
 
     try:
         from models import ContactSubmission
-        from email_service import email_service
 
         # Get form data
         name = request.form.get('name', '').strip()
@@ -694,35 +504,13 @@ def contact_submit():
             is_spam=is_spam
         )
         db.session.add(contact_submission)
-        db.session.commit()
-        submission_id = contact_submission.id
+        db.session.flush()
 
-        # Fire emails in background — user gets instant response
+        # Emails are sent by the task worker; queued in the same commit as the submission
         if not is_spam:
-            def send_emails_background():
-                try:
-                    admin_sent = email_service.send_contact_notification(name, email, subject, message)
-                    if not admin_sent:
-                        contact_logger.error(f"Contact admin notification FAILED for submission #{submission_id} from {email}")
-
-                    reply_sent = email_service.send_contact_auto_reply(name, email, subject)
-                    if not reply_sent:
-                        contact_logger.error(f"Contact auto-reply FAILED for {email} (submission #{submission_id})")
-
-                    if admin_sent:
-                        # Use a fresh app context for DB write from background thread
-                        with app.app_context():
-                            from models import ContactSubmission as CS
-                            sub = CS.query.get(submission_id)
-                            if sub:
-                                sub.is_replied = True
-                                sub.replied_at = datetime.now()
-                                db.session.commit()
-                except Exception as e:
-                    contact_logger.error(f"Background email error for submission #{submission_id}: {e}", exc_info=True)
-
-            t = threading.Thread(target=send_emails_background, daemon=True)
-            t.start()
+            task_queue.enqueue('contact_notification', submission_id=contact_submission.id)
+            task_queue.enqueue('contact_auto_reply', name=name, email=email, subject=subject)
+        db.session.commit()
 
         return jsonify({'status': 'success', 'name': name, 'email': email})
 
@@ -806,107 +594,21 @@ def newsletter_unsubscribe_confirm():
 # SEO Routes
 @app.route('/sitemap.xml')
 def sitemap():
-    """Generate dynamic sitemap.xml"""
+    """Sitemap (or sitemap index once it outgrows one file), cached until content changes"""
     try:
-        from models import Project, SeoSettings
-        from urllib.parse import urlparse
-        
-        # Base domain
-        base_url = request.url_root.rstrip('/')
-        
-        # Static pages
-        pages = [
-            {
-                'url': base_url + '/',
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'weekly',
-                'priority': '1.0'
-            },
-            {
-                'url': base_url + '/#about',
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'monthly',
-                'priority': '0.8'
-            },
-            {
-                'url': base_url + '/#projects',
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'weekly',
-                'priority': '0.9'
-            },
-            {
-                'url': base_url + '/#skills',
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'monthly',
-                'priority': '0.7'
-            },
-            {
-                'url': base_url + '/#contact',
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'monthly',
-                'priority': '0.6'
-            }
-        ]
-        
-        # Add projects (if available)
-        try:
-            projects = Project.query.filter_by(is_active=True).all()
-            for project in projects:
-                if project.live_url:
-                    pages.append({
-                        'url': project.live_url,
-                        'lastmod': project.updated_at.strftime('%Y-%m-%d') if project.updated_at else datetime.now().strftime('%Y-%m-%d'),
-                        'changefreq': 'monthly',
-                        'priority': '0.6'
-                    })
-        except:
-            pass  # Projects table might not exist yet
-            
-        # Add subdomain links
-        subdomain_pages = [
-            {
-                'url': 'https://wiki.lusansapkota.com.np/',
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'weekly',
-                'priority': '0.8'
-            },
-            {
-                'url': 'https://git.lusansapkota.com.np/',
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'daily',
-                'priority': '0.8'
-            },
-            {
-                'url': 'https://donation.lusansapkota.com.np/',
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'monthly',
-                'priority': '0.5'
-            }
-        ]
-        
-        pages.extend(subdomain_pages)
-        
-        # Generate XML
-        xml_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        xml_content += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-        
-        for page in pages:
-            xml_content += '  <url>\n'
-            xml_content += f'    <loc>{page["url"]}</loc>\n'
-            xml_content += f'    <lastmod>{page["lastmod"]}</lastmod>\n'
-            xml_content += f'    <changefreq>{page["changefreq"]}</changefreq>\n'
-            xml_content += f'    <priority>{page["priority"]}</priority>\n'
-            xml_content += '  </url>\n'
-            
-        xml_content += '</urlset>'
-        
-        from flask import Response
-        return Response(xml_content, mimetype='application/xml')
-        
+        return sitemaps.response(request.url_root)
     except Exception as e:
         print(f"Sitemap generation error: {e}")
         abort(500)
 
+@app.route('/sitemap-<section>-<int:page>.xml')
+def sitemap_section(section, page):
+    """One file of a split sitemap"""
+    response = sitemaps.response(request.url_root, section, page)
+    if response is None:
+        abort(404)
+    return response
+
 @app.route('/robots.txt')
 def robots_txt():
     """Serve robots.txt file"""
@@ -978,6 +680,9 @@ def serve_logo_files(filename):
 
 commands.register_commands(app)
 
+# Compile the per-subdomain URL maps once every route is registered
+subdomain_dispatcher.init_app(app)
+
 if __name__ == '__main__':
     # Create database tables if they don't exist
     with app.app_context():
@@ -0,0 +1,216 @@
+"""
+Static Assets
+Copies CSS, JS and images to content-hashed filenames with precompressed
+siblings, records them in a manifest that templates resolve through
+``asset_url()``, and serves the hashed files with one-year immutable caching
+"""
+
+import fnmatch
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # Brotli siblings are optional
+    brotli = None
+
+MANIFEST_NAME = 'asset-manifest.json'
+ASSET_EXTENSIONS = {'.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.woff', '.woff2'}
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg'}
+# Served under a stable URL: the browser must always find the current worker
+UNVERSIONED = {'sw.js', 'sw-enhancements.js'}
+# Top-level static directories that are already content-addressed (images.py variants)
+SKIPPED_DIRECTORIES = {'variants'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+HASH_LENGTH = 10
+HASHED_NAME = re.compile(r'\.[0-9a-f]{%d}$' % HASH_LENGTH)
+
+# Static-folder files the service worker precaches, besides the pages below
+PRECACHE_PATTERNS = ('assets/css/*.css', 'assets/js/*.js', 'assets/logo/logo.png', 'assets/images/profile.webp')
+PRECACHE_PAGES = ('/', '/offline.html', '/static/manifest.json')
+SW_BEGIN = '// BEGIN GENERATED PRECACHE'
+SW_END = '// END GENERATED PRECACHE'
+
+
+def _hashed_name(filename, digest):
+    stem, extension = os.path.splitext(filename)
+    return f'{stem}.{digest[:HASH_LENGTH]}{extension}'
+
+
+class AssetManifest:
+    def __init__(self):
+        self.assets = {}      # {endpoint: {filename: hashed filename}}
+        self.version = None
+        self._hashed = {}     # {endpoint: set of hashed filenames}
+        self.manifest_path = None
+
+    def init_app(self, app):
+        self.manifest_path = os.path.join(app.static_folder, MANIFEST_NAME)
+        self.load()
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.before_request(self._serve_precompressed)
+        app.after_request(self._cache_headers)
+        app.extensions['assets'] = self
+
+    def load(self):
+        """Read the manifest; without one, asset_url() falls back to plain static URLs"""
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.version = data.get('version')
+        self.assets = data.get('assets', {})
+        self._hashed = {endpoint: set(files.values()) for endpoint, files in self.assets.items()}
+
+    # Templates
+
+    def asset_url(self, filename, endpoint='static', **values):
+        """URL of the fingerprinted copy of ``filename`` in ``endpoint``'s static folder"""
+        hashed = self.assets.get(endpoint, {}).get(filename)
+        return url_for(endpoint, filename=hashed or filename, **values)
+
+    # Serving
+
+    def _fingerprinted(self):
+        if not request.endpoint or not request.endpoint.endswith('static'):
+            return None
+        filename = (request.view_args or {}).get('filename')
+        if filename in self._hashed.get(request.endpoint, ()):
+            return filename
+        return None
+
+    def _serve_precompressed(self):
+        """Send the .br/.gz sibling of a fingerprinted file when the client accepts it"""
+        filename = self._fingerprinted()
+        if filename is None or os.path.splitext(filename)[1] not in COMPRESSIBLE_EXTENSIONS:
+            return None
+        blueprint = request.blueprint
+        folder = (current_app.blueprints[blueprint].static_folder if blueprint else current_app.static_folder)
+        accepted = request.accept_encodings
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[encoding] and os.path.exists(os.path.join(folder, filename + suffix)):
+                response = send_from_directory(folder, filename + suffix,
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+        return None
+
+    def _cache_headers(self, response):
+        if response.status_code in (200, 304) and self._fingerprinted():
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+            response.expires = None
+        return response
+
+    # Build
+
+    @staticmethod
+    def static_roots(app):
+        """{endpoint: folder} for the app and every blueprint with a static folder"""
+        roots = {'static': app.static_folder}
+        for name, blueprint in app.blueprints.items():
+            if blueprint.has_static_folder:
+                roots[f'{name}.static'] = blueprint.static_folder
+        return roots
+
+    def build(self, app, log=print):
+        """Fingerprint and precompress every asset, write the manifest and the service worker precache list"""
+        assets, written, compressed, removed = {}, 0, 0, 0
+        for endpoint, folder in sorted(self.static_roots(app).items()):
+            files = assets[endpoint] = {}
+            for directory, subdirectories, names in os.walk(folder):
+                if directory == folder:
+                    subdirectories[:] = [name for name in subdirectories if name not in SKIPPED_DIRECTORIES]
+                for name in sorted(names):
+                    stem, extension = os.path.splitext(name)
+                    if extension not in ASSET_EXTENSIONS or HASHED_NAME.search(stem) or name in UNVERSIONED:
+                        continue
+                    path = os.path.join(directory, name)
+                    with open(path, 'rb') as f:
+                        content = f.read()
+                    hashed = _hashed_name(name, hashlib.sha256(content).hexdigest())
+                    files[os.path.relpath(path, folder).replace(os.sep, '/')] = \
+                        os.path.relpath(os.path.join(directory, hashed), folder).replace(os.sep, '/')
+
+                    target = os.path.join(directory, hashed)
+                    if not os.path.exists(target):
+                        with open(target, 'wb') as f:
+                            f.write(content)
+                        written += 1
+                    if extension in COMPRESSIBLE_EXTENSIONS:
+                        compressed += self._compress(target, content)
+                    removed += self._remove_stale(directory, stem, extension, hashed)
+
+        version = hashlib.sha256(json.dumps(assets, sort_keys=True).encode('utf-8')).hexdigest()[:HASH_LENGTH]
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'assets': assets}, f, indent=2, sort_keys=True)
+        self.load()
+        self.write_service_worker(app)
+
+        total = sum(len(files) for files in assets.values())
+        log(f'Assets: {total} fingerprinted ({written} new copies, {compressed} compressed files, '
+            f'{removed} stale copies removed), version {version}')
+        return {'assets': total, 'written': written, 'compressed': compressed, 'removed': removed,
+                'version': version}
+
+    @staticmethod
+    def _compress(target, content):
+        count = 0
+        if not os.path.exists(target + '.gz'):
+            with open(target + '.gz', 'wb') as f:
+                # mtime=0 keeps the output identical between builds
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            count += 1
+        if brotli is not None and not os.path.exists(target + '.br'):
+            with open(target + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+            count += 1
+        return count
+
+    @staticmethod
+    def _remove_stale(directory, stem, extension, current):
+        """Delete copies of an earlier version of the same file"""
+        pattern = re.compile(re.escape(stem) + r'\.[0-9a-f]{%d}' % HASH_LENGTH + re.escape(extension) + r'(\.gz|\.br)?$')
+        removed = 0
+        for name in os.listdir(directory):
+            if pattern.match(name) and not name.startswith(current):
+                os.remove(os.path.join(directory, name))
+                removed += 1
+        return removed
+
+    def precache_urls(self, app):
+        static_url = app.static_url_path.rstrip('/')
+        files = self.assets.get('static', {})
+        urls = list(PRECACHE_PAGES)
+        for filename in sorted(files):
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in PRECACHE_PATTERNS):
+                urls.append(f'{static_url}/{files[filename]}')
+        return urls
+
+    def write_service_worker(self, app):
+        """Rewrite the generated block of sw.js with this build's version and precache list"""
+        path = os.path.join(app.static_folder, 'sw.js')
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        start, end = source.find(SW_BEGIN), source.find(SW_END)
+        if start < 0 or end < 0:
+            raise ValueError(f'{path} has no generated precache block')
+        block = '\n'.join([
+            SW_BEGIN + ' (flask build-assets)',
+            f"const ASSET_VERSION = '{self.version}';",
+            'const STATIC_ASSETS = ' + json.dumps(self.precache_urls(app), indent=4) + ';',
+            '',
+        ])
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(source[:start] + block + source[end:])
+
+
+# Global instance
+assets = AssetManifest()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Category Tree Benchmark
+Seeds throwaway SQLite databases with growing numbers of wiki categories and
+checks that the wiki pages showing the category sidebar run the same number
+of SQL statements whatever the category count, that rolled-up counts match a
+brute-force count, and that moving an article rebuilds the tree
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+DIRECTORY = tempfile.mkdtemp(prefix='category-tree-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(DIRECTORY, "benchmark.db")}'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DEBUG', 'true')  # blueprints mounted under /wiki
+
+from sqlalchemy import event
+
+from app import app
+from database import db
+from models import WikiArticle, WikiCategory
+from wiki.category_tree import category_tree
+from wiki.view_counter import view_counter
+
+PAGES = ['/wiki/', '/wiki/explore', '/wiki/article/1', '/wiki/random', '/wiki/search?q=article']
+
+
+def seed(roots, children, articles_per_category):
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    for r in range(roots):
+        root = WikiCategory(name=f'Root {r}')
+        db.session.add(root)
+        db.session.flush()
+        for c in range(children):
+            child = WikiCategory(name=f'Child {r}.{c}', parent_id=root.id)
+            db.session.add(child)
+            db.session.flush()
+            for category in (root, child):
+                for a in range(articles_per_category):
+                    db.session.add(WikiArticle(title=f'Article {category.id}.{a}', content='Body',
+                                               summary='Summary', category_id=category.id))
+    db.session.commit()
+
+
+def brute_force_totals():
+    def total(category):
+        return category.articles.count() + sum(total(child) for child in category.subcategories)
+    return {category.id: total(category) for category in WikiCategory.query}
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def statements(client, counter, url):
+    counter.count = 0
+    response = client.get(url)
+    assert response.status_code == 200, (url, response.status_code)
+    return counter.count
+
+
+def run_benchmark(sizes, children, articles_per_category):
+    client = app.test_client()
+    counter = StatementCounter()
+    ok = True
+    profiles = {}
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        for roots in sizes:
+            seed(roots, children, articles_per_category)
+            total_categories = roots * (children + 1)
+            cold = {url: statements(client, counter, url) for url in PAGES[:1]}
+            warm = {url: statements(client, counter, url) for url in PAGES}
+            profiles[roots] = (cold, warm)
+
+            start = time.perf_counter()
+            for _ in range(20):
+                category_tree.invalidate()
+                category_tree.tree()
+            build_ms = (time.perf_counter() - start) * 1000 / 20
+
+            expected = brute_force_totals()
+            rolled_up = all(category_tree.get(category_id).total_count == count
+                            for category_id, count in expected.items())
+
+            # Moving an article to another root changes both subtrees' totals
+            before = category_tree.get(1).total_count
+            article = WikiArticle.query.filter_by(category_id=1).first()
+            article.category_id = category_tree.roots()[-1].id
+            db.session.commit()
+            moved = roots < 2 or category_tree.get(1).total_count == before - 1
+            builds = category_tree.stats['builds']
+            statements(client, counter, '/wiki/')
+            rebuilt_once = category_tree.stats['builds'] == builds
+
+            passed = rolled_up and moved and rebuilt_once
+            ok = ok and passed
+            print(f"\n{total_categories:,} categories, {WikiArticle.query.count():,} articles: "
+                  f"tree build {build_ms:.2f} ms, rolled-up counts {'match' if rolled_up else 'DIFFER ✗'}, "
+                  f"move {'invalidates' if moved and rebuilt_once else 'STALE ✗'}")
+            print(f"  cold /wiki/: {cold['/wiki/']} statements")
+            for url, count in warm.items():
+                print(f"  {url:<26}{count:>4} statements")
+        # Write counted views while the database is still there
+        view_counter.flush()
+
+    constant = len({tuple(warm.values()) for _, warm in profiles.values()}) == 1 and \
+        len({tuple(cold.values()) for cold, _ in profiles.values()}) == 1
+    ok = ok and constant
+    shutil.rmtree(DIRECTORY, ignore_errors=True)
+    print(f"\n{'Statement counts are constant in the number of categories' if constant else 'Statement counts grow with categories ✗'}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the wiki category tree runs a constant number of queries')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2, 20, 100], help='Top-level category counts')
+    parser.add_argument('--children', type=int, default=3, help='Subcategories per top-level category')
+    parser.add_argument('--articles', type=int, default=2, help='Articles per category')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_benchmark(args.sizes, args.children, args.articles) else 1)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Conditional GET Benchmark
+Seeds a throwaway SQLite database, then for each public content view checks
+that a repeat request carrying the returned ETag is answered 304 without
+rendering a template, also after counted views are written, that an edit to
+the underlying rows yields a fresh 200, and times full renders against
+revalidations
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+DIRECTORY = tempfile.mkdtemp(prefix='conditional-get-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(DIRECTORY, "benchmark.db")}'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DEBUG', 'true')  # blueprints mounted under /wiki, /git, /donation
+
+from flask import template_rendered
+
+from app import app
+from database import db
+from wiki.view_counter import view_counter
+from models import (WikiArticle, WikiCategory, Project, ProjectCategory, DonationProject, Donation,
+                    PersonalInfo, SeoSettings)
+
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    category = WikiCategory(name='Python')
+    project_category = ProjectCategory(name='Web')
+    db.session.add_all([category, project_category])
+    db.session.flush()
+    for i in range(50):
+        db.session.add(WikiArticle(title=f'Article {i}', content=f'# Heading\n\nBody of article {i}.\n' * 20,
+                                   summary=f'Summary {i}', category_id=category.id))
+    for i in range(20):
+        db.session.add(Project(title=f'Project {i}', description='A project', category_id=project_category.id,
+                               technologies='python,flask'))
+    donation_project = DonationProject(title='Donation project', description='Support it', goal_amount=100)
+    db.session.add_all([donation_project, PersonalInfo(name='Lusan'), SeoSettings(page_name='git', title='Git')])
+    db.session.flush()
+    for i in range(5):
+        db.session.add(Donation(project_id=donation_project.id, donor_name='Donor', donor_email='d@example.com',
+                                amount=10, currency='USD', status='completed'))
+    db.session.commit()
+
+
+def retitle(model, row_id):
+    def edit():
+        row = db.session.get(model, row_id)
+        row.title = row.title + ' (edited)'
+        db.session.commit()
+    return edit
+
+
+CASES = [
+    ('wiki article', '/wiki/article/1', retitle(WikiArticle, 1)),
+    ('wiki article (neighbour edited)', '/wiki/article/2', retitle(WikiArticle, 3)),
+    ('git project', '/git/project/1', retitle(Project, 1)),
+    ('git projects API', '/git/api/projects?type=opensource', retitle(Project, 5)),
+    ('donation project', '/donation/project/1', retitle(DonationProject, 1)),
+    ('donation projects API', '/donation/api/projects', retitle(DonationProject, 1)),
+    ('why donate', '/donation/why-donate/1', retitle(DonationProject, 1)),
+]
+
+
+def timed(client, url, requests, headers=None):
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(url, headers=headers)
+    return (time.perf_counter() - start) * 1000 / requests
+
+
+def run_benchmark(requests):
+    rendered = []
+    template_rendered.connect(lambda sender, template, context, **extra: rendered.append(template.name), app)
+    client = app.test_client()
+    # A browser user agent, so article views are counted rather than skipped as a bot's
+    client.environ_base['HTTP_USER_AGENT'] = 'Mozilla/5.0 (benchmark)'
+    logging.getLogger('donation.routes').setLevel(logging.WARNING)
+    ok = True
+
+    with app.app_context():
+        seed()
+        print(f"\n{'View':<34}{'first':>7}{'repeat':>8}{'renders':>9}{'edited':>8}"
+              f"{'full ms':>10}{'304 ms':>9}  Cache-Control")
+        for label, url, edit in CASES:
+            first = client.get(url)
+            etag = first.headers.get('ETag')
+            conditional = {'If-None-Match': etag} if etag else {}
+            # Writing counted views is not an edit and must not change any validator
+            view_counter.flush()
+
+            rendered.clear()
+            repeat = client.get(url, headers=conditional)
+            renders = len(rendered)
+
+            full_ms = timed(client, url, requests)
+            revalidate_ms = timed(client, url, requests, conditional)
+
+            edit()
+            edited = client.get(url, headers=conditional)
+
+            passed = (first.status_code == 200 and etag and repeat.status_code == 304 and renders == 0
+                      and edited.status_code == 200 and edited.headers.get('ETag') != etag)
+            ok = ok and passed
+            print(f"{label:<34}{first.status_code:>7}{repeat.status_code:>8}{renders:>9}{edited.status_code:>8}"
+                  f"{full_ms:>10.2f}{revalidate_ms:>9.2f}  {first.headers.get('Cache-Control')}"
+                  f"{'' if passed else '  ✗'}")
+        view_counter.flush()
+
+    shutil.rmtree(DIRECTORY, ignore_errors=True)
+    print(f"\n{'All views revalidate without rendering' if ok else 'Some views failed the checks'}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check and time conditional GET on public content views')
+    parser.add_argument('--requests', type=int, default=50, help='Requests timed per view and path')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_benchmark(args.requests) else 1)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Admin Dashboard Statistics Benchmark
+Fills a throwaway SQLite database with growing numbers of projects, contacts,
+subscribers and donations, then compares the old dashboard queries (a COUNT
+per table plus the recent lists) with the aggregate statement, and checks
+that the counts agree, that the number of statements stays the same however
+large the tables get, and that a write refreshes the cached counts
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DIRECTORY = tempfile.mkdtemp(prefix='dashboard-stats-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(DIRECTORY, "benchmark.db")}'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DEBUG', 'true')  # in-memory rate limiter storage
+
+from sqlalchemy import desc, event, insert
+
+from admin.dashboard_stats import dashboard_stats
+from app import app
+from database import db
+from donation_stats import donation_stats
+from models import (ContactSubmission, Donation, DonationProject, NewsletterSubscriber, Project,
+                    ProjectCategory, Skill, Testimonial)
+
+
+def fill(rows):
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    now = datetime.utcnow()
+    db.session.execute(insert(ProjectCategory), [{'name': f'Category {i}'} for i in range(rows // 100 + 1)])
+    db.session.execute(insert(DonationProject), [{'title': f'Cause {i}', 'description': 'Help'}
+                                                 for i in range(rows // 100 + 1)])
+    db.session.execute(insert(Skill), [{'name': f'Skill {i}'} for i in range(rows // 100 + 1)])
+    db.session.execute(insert(Testimonial), [{'client_name': f'Client {i}', 'testimonial_text': 'Great'}
+                                             for i in range(rows // 100 + 1)])
+    db.session.execute(insert(Project), [{'title': f'Project {i}', 'description': 'Project'}
+                                         for i in range(rows)])
+    db.session.execute(insert(ContactSubmission), [
+        {'name': f'Sender {i}', 'email': f'sender{i}@example.com', 'subject': 'Hello', 'message': 'Hi',
+         'is_spam': i % 10 == 0, 'submitted_at': now - timedelta(minutes=i)} for i in range(rows)
+    ])
+    db.session.execute(insert(NewsletterSubscriber), [
+        {'email': f'reader{i}@example.com', 'is_active': i % 4 != 0, 'subscribed_at': now - timedelta(minutes=i)}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(Donation), [
+        {'project_id': 1, 'donor_name': f'Donor {i}', 'donor_email': f'donor{i % 500}@example.com',
+         'amount': 10.0 + i % 7, 'currency': 'USD' if i % 3 else 'NPR',
+         'status': 'completed' if i % 5 else 'pending', 'created_at': now - timedelta(minutes=i)}
+        for i in range(rows)
+    ])
+    db.session.commit()
+    # Core inserts skip the ORM events both aggregates rely on
+    donation_stats.reconcile(db.session)
+    dashboard_stats.invalidate()
+
+
+def old_dashboard():
+    """The queries the dashboard ran before, for comparison"""
+    totals = donation_stats.get_totals()
+    return {
+        'projects': Project.query.count(),
+        'categories': ProjectCategory.query.count(),
+        'contact_submissions': ContactSubmission.query.count(),
+        'newsletter_subscribers': NewsletterSubscriber.query.filter_by(is_active=True).count(),
+        'skills': Skill.query.count(),
+        'testimonials': Testimonial.query.count(),
+        'donation_projects': DonationProject.query.count(),
+        'donations': Donation.query.count(),
+        'total_donations_usd': totals['verified_usd'],
+        'total_donations_npr': totals['verified_npr'],
+        'recent_contacts': ContactSubmission.query.filter_by(is_spam=False)
+        .order_by(desc(ContactSubmission.submitted_at)).limit(5).all(),
+        'recent_subscribers': NewsletterSubscriber.query.order_by(desc(NewsletterSubscriber.subscribed_at))
+        .limit(5).all(),
+    }
+
+
+def aggregate_queries():
+    return {widget: build() for widget, build in dashboard_stats.widgets.items()}
+
+
+def new_dashboard():
+    return {widget: dashboard_stats.get(widget) for widget in dashboard_stats.widgets}
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def measure(func, counter, runs, cold):
+    """(ms per call, statements per call); ``cold`` drops the cached widgets before each call"""
+    func()  # compiled statement cache and page cache warm-up
+    db.session.remove()
+    total, statements = 0.0, 0
+    for _ in range(runs):
+        if cold:
+            dashboard_stats.invalidate()
+        counter.count = 0
+        start = time.perf_counter()
+        func()
+        total += time.perf_counter() - start
+        statements = counter.count
+        db.session.remove()
+    return total * 1000 / runs, statements
+
+
+def run_benchmark(sizes, runs):
+    ok = True
+    counter = StatementCounter()
+    profiles = set()
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        for rows in sizes:
+            fill(rows)
+            old_ms, old_statements = measure(old_dashboard, counter, runs, cold=False)
+            aggregate_ms, _ = measure(aggregate_queries, counter, runs, cold=False)
+            cold_ms, cold_statements = measure(new_dashboard, counter, runs, cold=True)
+            warm_ms, warm_statements = measure(new_dashboard, counter, runs, cold=False)
+            profiles.add((cold_statements, warm_statements))
+
+            old = old_dashboard()
+            new = new_dashboard()
+            counts_match = all(new['counts'][name] == value for name, value in old.items()
+                               if not name.startswith('recent_'))
+            lists_match = [c['name'] for c in new['recent_contacts']] == [c.name for c in old['recent_contacts']] \
+                and [s['email'] for s in new['recent_subscribers']] == [s.email for s in old['recent_subscribers']]
+
+            db.session.add(Skill(name='Fresh skill'))
+            db.session.commit()
+            refreshed = dashboard_stats.get('counts')['skills'] == old['skills'] + 1
+
+            passed = counts_match and lists_match and refreshed
+            ok = ok and passed
+            print(f"\n{rows:,} rows per table: counts {'match' if counts_match else 'DIFFER ✗'}, "
+                  f"recent lists {'match' if lists_match else 'DIFFER ✗'}, "
+                  f"write {'refreshes' if refreshed else 'STALE ✗'}")
+            print(f"  old queries   : {old_ms:8.2f} ms, {old_statements} statements")
+            print(f"  aggregate     : {aggregate_ms:8.2f} ms, {cold_statements} statements | {old_ms / aggregate_ms:5.1f}x")
+            print(f"  cache miss    : {cold_ms:8.2f} ms including the cache writes")
+            print(f"  cached        : {warm_ms:8.2f} ms, {warm_statements} statements | {old_ms / warm_ms:5.0f}x")
+        event.remove(db.engine, 'before_cursor_execute', counter)
+
+    constant = len(profiles) == 1
+    ok = ok and constant
+    shutil.rmtree(DIRECTORY, ignore_errors=True)
+    print(f"\n{'Statement counts are constant in table size' if constant else 'Statement counts grow with the tables ✗'}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the admin dashboard statistics')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Rows per table')
+    parser.add_argument('--runs', type=int, default=20, help='Timed dashboard loads per size')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_benchmark(args.sizes, args.runs) else 1)
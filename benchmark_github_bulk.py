@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+GitHub Bulk Fetch Benchmark
+Replays recorded GitHub responses from a local stub server and compares one REST
+call per repository with the chunked GraphQL bulk fetch and with ETag revalidation
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIRECTORY = tempfile.mkdtemp(prefix='github-bulk-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(DIRECTORY, "benchmark.db")}'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DEBUG', 'true')  # in-memory rate limiter storage
+
+from app import app
+from database import db
+from github_service import github_service
+
+# Recorded responses (trimmed to the fields the service reads)
+RECORDED_REST = {
+    'name': 'portfolio',
+    'full_name': 'lusansapkota/portfolio',
+    'description': 'Personal portfolio with wiki, git and donation subdomains',
+    'html_url': 'https://github.com/lusansapkota/portfolio',
+    'clone_url': 'https://github.com/lusansapkota/portfolio.git',
+    'ssh_url': 'git@github.com:lusansapkota/portfolio.git',
+    'stargazers_count': 12,
+    'forks_count': 3,
+    'watchers_count': 12,
+    'size': 5120,
+    'language': 'Python',
+    'topics': ['flask', 'portfolio'],
+    'created_at': '2024-01-15T10:30:00Z',
+    'updated_at': '2025-06-01T08:00:00Z',
+    'pushed_at': '2025-06-01T07:58:00Z',
+    'private': False,
+    'fork': False,
+    'default_branch': 'main',
+    'license': {'key': 'mit', 'name': 'MIT License'},
+    'homepage': 'https://lusansapkota.com.np',
+}
+
+RECORDED_GRAPHQL_NODE = {
+    'name': 'portfolio',
+    'nameWithOwner': 'lusansapkota/portfolio',
+    'description': 'Personal portfolio with wiki, git and donation subdomains',
+    'url': 'https://github.com/lusansapkota/portfolio',
+    'sshUrl': 'git@github.com:lusansapkota/portfolio.git',
+    'homepageUrl': 'https://lusansapkota.com.np',
+    'stargazerCount': 12,
+    'forkCount': 3,
+    'watchers': {'totalCount': 12},
+    'diskUsage': 5120,
+    'primaryLanguage': {'name': 'Python'},
+    'repositoryTopics': {'nodes': [{'topic': {'name': 'flask'}}, {'topic': {'name': 'portfolio'}}]},
+    'licenseInfo': {'name': 'MIT License'},
+    'createdAt': '2024-01-15T10:30:00Z',
+    'updatedAt': '2025-06-01T08:00:00Z',
+    'pushedAt': '2025-06-01T07:58:00Z',
+    'isPrivate': False,
+    'isFork': False,
+    'defaultBranchRef': {'name': 'main'},
+}
+
+
+class GitHubStub(BaseHTTPRequestHandler):
+    """Serves /repos/<owner>/<name> and /graphql from the recorded payloads"""
+
+    latency = 0.0
+    counts = {'rest': 0, 'not_modified': 0, 'graphql': 0}
+    recorded_rest = RECORDED_REST
+    recorded_node = RECORDED_GRAPHQL_NODE
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-RateLimit-Remaining', '4999')
+        self.send_header('X-RateLimit-Reset', str(int(time.time()) + 3600))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        parts = self.path.strip('/').split('/')
+        if len(parts) == 3 and parts[0] == 'repos':
+            GitHubStub.counts['rest'] += 1
+            owner, name = parts[1], parts[2]
+            if name.startswith('missing'):
+                return self._send_json(404, {'message': 'Not Found'})
+            payload = copy.deepcopy(self.recorded_rest)
+            payload.update(name=name, full_name=f'{owner}/{name}',
+                           html_url=f'https://github.com/{owner}/{name}')
+            etag = '"' + hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                GitHubStub.counts['not_modified'] += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            return self._send_json(200, payload, {'ETag': etag})
+        self._send_json(404, {'message': 'Not Found'})
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        if self.path.rstrip('/') != '/graphql':
+            return self._send_json(404, {'message': 'Not Found'})
+        GitHubStub.counts['graphql'] += 1
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        variables = request.get('variables', {})
+
+        data = {'rateLimit': {'cost': 1, 'remaining': 4999, 'resetAt': '2030-01-01T00:00:00Z'}}
+        errors = []
+        index = 0
+        while f'o{index}' in variables:
+            owner, name = variables[f'o{index}'], variables[f'n{index}']
+            alias = f'r{index}'
+            if name.startswith('missing'):
+                data[alias] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [alias],
+                               'message': f"Could not resolve to a Repository with the name '{owner}/{name}'."})
+            else:
+                node = copy.deepcopy(self.recorded_node)
+                node.update(name=name, nameWithOwner=f'{owner}/{name}', url=f'https://github.com/{owner}/{name}')
+                data[alias] = node
+            index += 1
+
+        payload = {'data': data}
+        if errors:
+            payload['errors'] = errors
+        self._send_json(200, payload)
+
+
+def start_stub(latency, fixtures=None):
+    if fixtures:
+        with open(fixtures) as f:
+            recorded = json.load(f)
+        GitHubStub.recorded_rest = recorded.get('rest', RECORDED_REST)
+        GitHubStub.recorded_node = recorded.get('graphql', RECORDED_GRAPHQL_NODE)
+    GitHubStub.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GitHubStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_benchmark(repo_count, latency, chunk_size, fixtures=None):
+    server = start_stub(latency, fixtures)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    # Point the service at the stub
+    github_service.base_url = base_url
+    github_service.graphql_url = f'{base_url}/graphql'
+    github_service.graphql_chunk_size = chunk_size
+    github_service.mock_mode = False
+    github_service.demo_repos = {}
+    github_service.headers['Authorization'] = 'token stub'
+
+    repos = [('lusansapkota', f'repo-{i}') for i in range(repo_count - 1)] + [('lusansapkota', 'missing-repo')]
+
+    with app.app_context():
+        # The stored validators live in github_repo_cache
+        db.drop_all()
+        db.create_all()
+
+        github_service.clear_all_cache()
+        start = time.perf_counter()
+        rest_results = {repo: github_service.get_repository_data(*repo, force_refresh=True) for repo in repos}
+        rest_time = time.perf_counter() - start
+
+        github_service.clear_all_cache()
+        start = time.perf_counter()
+        bulk_results = github_service.get_repositories_bulk(repos, force_refresh=True)
+        bulk_time = time.perf_counter() - start
+
+        # Cold Flask cache, stored validators: every REST fetch should revalidate with a 304
+        github_service.clear_all_cache()
+        start = time.perf_counter()
+        for repo in repos:
+            github_service.get_repository_data(*repo, force_refresh=True)
+        revalidate_time = time.perf_counter() - start
+
+    server.shutdown()
+
+    mismatched = [
+        repo for repo in repos
+        if (rest_results[repo] or {}).get('stargazers_count') != (bulk_results.get(repo) or {}).get('stargazers_count')
+    ]
+    print(f"\nRepositories: {repo_count} (stub latency {latency * 1000:.0f} ms, chunk size {chunk_size})")
+    print(f"  REST per repository : {rest_time:8.3f} s, {GitHubStub.counts['rest']} requests")
+    print(f"  GraphQL bulk        : {bulk_time:8.3f} s, {GitHubStub.counts['graphql']} requests")
+    print(f"  REST revalidation   : {revalidate_time:8.3f} s, {GitHubStub.counts['not_modified']} answered 304")
+    print(f"  Request outcomes    : {github_service.request_stats}")
+    print(f"  Speedup             : {rest_time / bulk_time:8.1f}x")
+    print(f"  Result mismatches   : {len(mismatched)}")
+    if not GitHubStub.counts['not_modified']:
+        print("  FAIL: no request was revalidated with a 304")
+    return not mismatched and GitHubStub.counts['not_modified'] > 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark GitHub REST vs GraphQL bulk fetching against a local stub')
+    parser.add_argument('--repos', type=int, default=40, help='Number of repositories to fetch')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated round-trip latency in seconds')
+    parser.add_argument('--chunk-size', type=int, default=50, help='Repositories per GraphQL query')
+    parser.add_argument('--fixtures', help='JSON file with recorded {"rest": ..., "graphql": ...} payloads')
+    args = parser.parse_args()
+    try:
+        ok = run_benchmark(args.repos, args.latency, args.chunk_size, args.fixtures)
+    finally:
+        shutil.rmtree(DIRECTORY, ignore_errors=True)
+    raise SystemExit(0 if ok else 1)
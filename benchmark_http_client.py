@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+HTTP Client Benchmark
+Compares one-off requests.get calls with the pooled http_client against a local
+HTTP stand-in, and checks that retries honor Retry-After
+"""
+
+import argparse
+import json
+import ssl
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_client import HttpClient
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Keep-alive JSON endpoint; /flaky answers 503 + Retry-After every other call"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    connections = 0
+    flaky_calls = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StandIn.lock:
+            StandIn.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/flaky':
+            with StandIn.lock:
+                StandIn.flaky_calls += 1
+                fail = StandIn.flaky_calls % 2 == 1
+            if fail:
+                return self._send(503, {'message': 'try again'}, {'Retry-After': '0'})
+        self._send(200, {'ok': True})
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stand_in(certfile=None, keyfile=None):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    scheme = 'http'
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'{scheme}://127.0.0.1:{server.server_address[1]}'
+
+
+def time_calls(label, call, count):
+    StandIn.connections = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        response = call()
+        assert response.status_code == 200, response.status_code
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<20}: {elapsed:8.3f} s, {elapsed * 1e6 / count:8.1f} µs/request, "
+          f"{StandIn.connections} connections")
+    return elapsed
+
+
+def run_benchmark(count, certfile=None, keyfile=None):
+    server, base_url = start_stand_in(certfile, keyfile)
+    verify = not certfile  # self-signed stand-in certificate
+    warnings.filterwarnings('ignore', message='Unverified HTTPS request')
+
+    client = HttpClient()
+    client.backoff_factor = 0.01
+    url = f'{base_url}/repos/lusansapkota/portfolio'
+
+    print(f"\nRequests: {count} against {base_url}")
+    bare = time_calls('requests.get', lambda: requests.get(url, timeout=5, verify=verify), count)
+    pooled = time_calls('http_client.get', lambda: client.get(url, verify=verify), count)
+    print(f"  Speedup             : {bare / pooled:8.1f}x")
+
+    StandIn.flaky_calls = 0
+    ok = client.get(f'{base_url}/flaky', verify=verify).status_code == 200
+    server.shutdown()
+
+    host = base_url.split('://', 1)[1]
+    stats = client.get_stats()[host]
+    print(f"  Retry on 503        : {'ok' if ok else 'FAILED'} ({stats['retries']} retries)")
+    print(f"  Host metrics        : avg {stats['avg_ms']} ms, max {stats['max_ms']} ms, statuses {stats['statuses']}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark pooled vs one-off HTTP requests against a local stand-in')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per client')
+    parser.add_argument('--certfile', help='Serve over TLS with this certificate (PEM) to include handshake cost')
+    parser.add_argument('--keyfile', help='Private key for --certfile')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_benchmark(args.requests, args.certfile, args.keyfile) else 1)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+IP Intelligence Benchmark
+Builds a synthetic GeoIP range database, then times uncached and cached
+lookups and checks private/reserved classification
+"""
+
+import argparse
+import csv
+import ipaddress
+import os
+import random
+import tempfile
+import time
+
+from ip_intel import IPIntelligence, build_database
+
+CLASSIFICATION_CASES = {
+    '127.0.0.1': 'loopback',
+    '::1': 'loopback',
+    '10.1.2.3': 'private',
+    '172.16.0.1': 'private',
+    '172.31.255.255': 'private',
+    '172.32.0.1': 'global',   # outside 172.16.0.0/12
+    '172.217.4.46': 'global',
+    '192.168.1.1': 'private',
+    '100.64.0.1': 'private',
+    '169.254.1.1': 'link_local',
+    '192.0.2.10': 'reserved',
+    '::ffff:10.0.0.1': 'private',
+    'fd00::1': 'private',
+    '2001:4860:4860::8888': 'global',
+    'not-an-ip': 'invalid',
+}
+
+
+def write_csv(path, ranges):
+    """Contiguous IPv4 ranges across the unicast space plus a few IPv6 networks"""
+    countries = ['Nepal', 'India', 'Germany', 'United States', 'Japan', 'Brazil']
+    step = (0xE0000000 - 0x01000000) // ranges
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['start_ip', 'end_ip', 'country', 'region', 'city', 'timezone', 'isp', 'org'])
+        for i in range(ranges):
+            start = 0x01000000 + i * step
+            country = countries[i % len(countries)]
+            writer.writerow([str(ipaddress.IPv4Address(start)), str(ipaddress.IPv4Address(start + step - 1)),
+                             country, f'Region {i % 50}', f'City {i % 500}', 'UTC', f'ISP {i % 200}', ''])
+        writer.writerow(['2001:4860::', '2001:4860:ffff:ffff:ffff:ffff:ffff:ffff',
+                         'United States', 'California', 'Mountain View', 'America/Los_Angeles', 'Google LLC', ''])
+
+
+def time_lookups(label, lookup, addresses):
+    start = time.perf_counter()
+    for address in addresses:
+        lookup(address)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<18}: {elapsed * 1e6 / len(addresses):8.2f} µs/lookup")
+    return elapsed
+
+
+def run_benchmark(ranges, lookups):
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'ranges.csv')
+        db_path = os.path.join(directory, 'geoip.bin')
+        write_csv(csv_path, ranges)
+
+        start = time.perf_counter()
+        stats = build_database(csv_path, db_path)
+        print(f"\nBuilt {stats['ipv4_ranges']} IPv4 + {stats['ipv6_ranges']} IPv6 ranges "
+              f"({os.path.getsize(db_path) / 1e6:.1f} MB) in {time.perf_counter() - start:.2f} s")
+
+        intel = IPIntelligence(db_path, cache_size=lookups)
+        rng = random.Random(42)
+        addresses = [str(ipaddress.IPv4Address(rng.randrange(0x01000000, 0xE0000000))) for _ in range(lookups)]
+
+        time_lookups('uncached', intel.lookup, addresses)
+        time_lookups('cached', intel.lookup, addresses)
+        print(f"  Sample            : {intel.lookup(addresses[0])}")
+        print(f"  IPv6 sample       : {intel.lookup('2001:4860:4860::8888')['city']}")
+
+        failures = {ip: (expected, intel.classify(ip)) for ip, expected in CLASSIFICATION_CASES.items()
+                    if intel.classify(ip) != expected}
+        print(f"  Classification    : {'ok' if not failures else failures}")
+        intel.reload()
+        return not failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark offline GeoIP lookups against a synthetic range database')
+    parser.add_argument('--ranges', type=int, default=500000, help='IPv4 ranges in the synthetic database')
+    parser.add_argument('--lookups', type=int, default=50000, help='Distinct addresses looked up per pass')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_benchmark(args.ranges, args.lookups) else 1)
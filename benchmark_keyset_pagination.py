@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Keyset Pagination Benchmark
+Fills a throwaway SQLite database with N articles (with plenty of tied sort
+keys), checks that walking the explore orders page by page with cursors,
+forwards and backwards, visits every article exactly once in the same order
+as OFFSET paging, and times a deep page and the total count both ways
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DIRECTORY = tempfile.mkdtemp(prefix='keyset-pagination-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(DIRECTORY, "benchmark.db")}'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DEBUG', 'true')  # in-memory rate limiter storage
+
+from sqlalchemy import insert
+
+from app import app
+from database import db
+from models import WikiArticle, WikiCategory
+from pagination import keyset_pagination
+from wiki.view_counter import view_counter
+
+PER_PAGE = 12
+ORDERS = {
+    'title': ((WikiArticle.title, WikiArticle.id), False),
+    'date': ((WikiArticle.created_at, WikiArticle.id), True),
+    'views': ((WikiArticle.views, WikiArticle.id), True),
+}
+
+
+def fill(count):
+    db.drop_all()
+    db.create_all()
+    category = WikiCategory(name='Benchmark')
+    db.session.add(category)
+    db.session.commit()
+    start = datetime(2024, 1, 1)
+    # Core inserts: no ORM objects and no search-index events while filling
+    for offset in range(0, count, 5000):
+        db.session.execute(insert(WikiArticle), [
+            {'title': f'Article {i % (count // 3 or 1)}', 'content': 'Body', 'summary': f'Summary {i}',
+             'category_id': category.id, 'views': i % 97, 'created_at': start + timedelta(minutes=i // 4)}
+            for i in range(offset, min(count, offset + 5000))
+        ])
+    db.session.commit()
+    # Core writes bypass the session events that retire cached counts
+    keyset_pagination.bump_version('wiki_article')
+
+
+def offset_ids(order, descending, page=None):
+    query = WikiArticle.query.order_by(*(column.desc() if descending else column.asc() for column in order))
+    if page is None:
+        return [article.id for article in query.with_entities(WikiArticle.id)]
+    return [article.id for article in query.paginate(page=page, per_page=PER_PAGE, error_out=False).items]
+
+
+def walk(sort):
+    """Every page forwards, then back from the last one; (forward ids, backward ids, page numbers ok, last cursor)"""
+    order, descending = ORDERS[sort]
+    forward, pages, cursor = [], [], None
+    while True:
+        page = keyset_pagination.paginate(WikiArticle.query, order, descending, cursor, PER_PAGE, {'sort': sort})
+        forward += [article.id for article in page]
+        pages.append(page)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+    backward, page = [], pages[-1]
+    while page.has_prev:
+        page = keyset_pagination.paginate(WikiArticle.query, order, descending, page.prev_cursor, PER_PAGE,
+                                          {'sort': sort})
+        backward = [article.id for article in page] + backward
+    backward += [article.id for article in pages[-1]]
+    numbers = [page.page for page in pages] == list(range(1, len(pages) + 1))
+    return forward, backward, numbers, pages[-2].next_cursor if len(pages) > 1 else None
+
+
+def timed(func, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+        db.session.remove()
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def run_benchmark(sizes, runs):
+    ok = True
+    with app.app_context():
+        for count in sizes:
+            fill(count)
+            pages = -(-count // PER_PAGE)
+            print(f"\n{count:,} articles, {pages:,} pages of {PER_PAGE}")
+            for sort, (order, descending) in ORDERS.items():
+                forward, backward, numbers, deep_cursor = walk(sort)
+                expected = offset_ids(order, descending)
+                passed = forward == expected and backward == expected and numbers
+                ok = ok and passed
+
+                offset_ms = timed(lambda: offset_ids(order, descending, pages), runs)
+                keyset_ms = timed(lambda: keyset_pagination.paginate(
+                    WikiArticle.query, order, descending, deep_cursor, PER_PAGE, {'sort': sort}).items, runs)
+                print(f"  {sort:<6} walk {'matches OFFSET order' if passed else 'MISMATCH ✗':<21}"
+                      f"last page: OFFSET {offset_ms:7.2f} ms | keyset {keyset_ms:6.2f} ms "
+                      f"| {offset_ms / keyset_ms:5.1f}x")
+
+            count_ms = timed(lambda: WikiArticle.query.order_by(None).count(), runs)
+            cached_ms = timed(lambda: keyset_pagination.count(WikiArticle.query, 'wiki_article', {'sort': 'title'}),
+                              runs)
+            print(f"  COUNT(*) {count_ms:.2f} ms | cached count {cached_ms:.3f} ms")
+
+            # A committed write retires the cached counts
+            before = keyset_pagination.count(WikiArticle.query, 'wiki_article', {'sort': 'title'})
+            db.session.add(WikiArticle(title='Fresh article', content='Body', views=0))
+            db.session.commit()
+            after = keyset_pagination.count(WikiArticle.query, 'wiki_article', {'sort': 'title'})
+            tampered = keyset_pagination.paginate(WikiArticle.query, *ORDERS['title'], 'not-a-cursor', PER_PAGE,
+                                                  {'sort': 'title'})
+            invalidated = after == before + 1 and tampered.page == 1 and not tampered.has_prev
+            print(f"  Count after insert {before:,} -> {after:,}, bad cursor falls back to page 1: "
+                  f"{'✓' if invalidated else '✗'}")
+            ok = ok and invalidated
+        view_counter.flush()
+    shutil.rmtree(DIRECTORY, ignore_errors=True)
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check and benchmark keyset pagination against OFFSET paging')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 100000], help='Article counts to test')
+    parser.add_argument('--runs', type=int, default=50, help='Timed calls per measurement')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_benchmark(args.sizes, args.runs) else 1)
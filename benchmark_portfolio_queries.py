@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Portfolio Query Count Check
+Seeds throwaway SQLite databases with N and 10×N projects and checks that
+the homepage, the git index and the resume data (get_portfolio_data) run the
+same number of SQL statements at both sizes, so a lazy load per project or a
+query that grows with the table cannot creep back in unnoticed
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+from datetime import date
+
+DIRECTORY = tempfile.mkdtemp(prefix='portfolio-queries-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(DIRECTORY, "benchmark.db")}'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DEBUG', 'true')  # blueprints mounted under /git
+
+from sqlalchemy import event
+
+from app import app
+from database import db
+from models import (Education, Experience, PersonalInfo, Project, ProjectCategory, SeoSettings, Skill,
+                    SocialLink, Testimonial)
+from utils.resume_generator import get_portfolio_data
+
+HOMEPAGE_STATEMENTS = 9  # PortfolioSnapshot.for_homepage()
+
+
+def seed(projects, per_category):
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    db.session.add_all([PersonalInfo(name='Lusan'), SeoSettings(page_name='home', title='Home'),
+                        SeoSettings(page_name='git', title='Git')])
+    categories = max(1, projects // per_category)
+    category_rows = [ProjectCategory(name=f'Category {i}') for i in range(categories)]
+    db.session.add_all(category_rows)
+    db.session.flush()
+    for i in range(projects):
+        db.session.add(Project(title=f'Project {i}', description='A project', technologies='python,flask',
+                               category_id=category_rows[i % categories].id,
+                               is_featured=i % 3 == 0, show_on_homepage=i % 2 == 0))
+    for i in range(5):
+        db.session.add(Skill(name=f'Skill {i}', category='backend', is_featured=True, sort_order=i))
+        db.session.add(SocialLink(platform=f'site{i}', url=f'https://example.com/{i}', is_active=True))
+        db.session.add(Experience(company=f'Company {i}', position='Engineer', start_date=date(2020, 1, i + 1)))
+        db.session.add(Education(institution=f'School {i}', degree='BSc', start_date=date(2015, 1, i + 1)))
+        db.session.add(Testimonial(client_name=f'Client {i}', testimonial_text='Great', is_featured=True))
+    db.session.commit()
+    db.session.remove()
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def profile(client, counter):
+    """{target: statements} for one request or call each, on a fresh session"""
+    counts = {}
+    # A query string skips the homepage page cache so the page is rendered from the database
+    for label, url in (('/', '/?query-count'), ('/git/', '/git/')):
+        counter.count = 0
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        counts[label] = counter.count
+    counter.count = 0
+    data = get_portfolio_data()
+    for project in data['featured_projects']:
+        project.category  # the resume prints each project's category
+    counts['get_portfolio_data()'] = counter.count
+    db.session.remove()
+    return counts
+
+
+def run_check(projects, per_category):
+    client = app.test_client()
+    counter = StatementCounter()
+    sizes = (projects, projects * 10)
+    profiles = {}
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        for size in sizes:
+            seed(size, per_category)
+            profiles[size] = profile(client, counter)
+        event.remove(db.engine, 'before_cursor_execute', counter)
+
+    constant = profiles[sizes[0]] == profiles[sizes[1]]
+    within_budget = all(counts['/'] <= HOMEPAGE_STATEMENTS for counts in profiles.values())
+    print(f"\n{'':<22}" + ''.join(f"{size:>10,} projects" for size in sizes))
+    for label in profiles[sizes[0]]:
+        marker = '' if profiles[sizes[0]][label] == profiles[sizes[1]][label] else '  ✗ grows'
+        print(f"{label:<22}" + ''.join(f"{profiles[size][label]:>19}" for size in sizes) + marker)
+
+    shutil.rmtree(DIRECTORY, ignore_errors=True)
+    print(f"\nHomepage {'within' if within_budget else 'OVER ✗'} its budget of {HOMEPAGE_STATEMENTS} statements")
+    print(f"{'Statement counts are constant in the number of projects' if constant else 'Statement counts grow with projects ✗'}")
+    return constant and within_budget
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check portfolio pages run a fixed number of queries')
+    parser.add_argument('--projects', type=int, default=50, help='Projects in the small database (N)')
+    parser.add_argument('--per-category', type=int, default=10, help='Projects per category, so categories grow too')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_check(args.projects, args.per_category) else 1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+SMTP Pool Benchmark
+Sends through EmailService against a local SMTP stand-in, comparing one
+connection per message with the pooled transport, and checks reconnects
+"""
+
+import argparse
+import os
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from email_service import EmailService
+
+
+class StandInHandler(socketserver.StreamRequestHandler):
+    """Minimal ESMTP server: accepts everything, drops sessions after ``drop_after`` messages"""
+
+    latency = 0.0
+    drop_after = 0
+    counts = {'connections': 0, 'messages': 0}
+    lock = threading.Lock()
+
+    def reply(self, line):
+        time.sleep(self.latency)  # one round trip per command
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        with StandInHandler.lock:
+            StandInHandler.counts['connections'] += 1
+        messages = 0
+        self.reply('220 stand-in ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250-stand-in\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME')
+            elif command.startswith('AUTH'):
+                self.reply('235 2.7.0 Authentication successful')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                messages += 1
+                with StandInHandler.lock:
+                    StandInHandler.counts['messages'] += 1
+                self.reply('250 2.0.0 Ok: queued')
+                if self.drop_after and messages >= self.drop_after:
+                    return  # hang up without QUIT, like a provider session limit
+            elif command.startswith('QUIT'):
+                self.reply('221 2.0.0 Bye')
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self.reply('250 2.0.0 Ok')
+
+
+class StandInServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_service(port, pool_size):
+    """EmailService configured from the environment, as in production"""
+    os.environ.update({
+        'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': str(port), 'MAIL_USE_TLS': 'false',
+        'MAIL_USERNAME': 'bench@localhost', 'MAIL_PASSWORD': 'bench', 'MAIL_POOL_SIZE': str(pool_size),
+    })
+    return EmailService()
+
+
+def unpooled_send(service, to_emails, message):
+    """What send_email did before pooling: a full session per message"""
+    import smtplib
+    server = smtplib.SMTP(service.smtp_server, service.smtp_port)
+    server.ehlo()
+    server.login(service.email_user, service.email_password)
+    server.sendmail(service.email_user, to_emails, message)
+    server.quit()
+
+
+def run(label, send, count, concurrency):
+    StandInHandler.counts.update(connections=0, messages=0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda i: send(i), range(count)))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<18}: {elapsed:7.3f} s, {count / elapsed:8.1f} msg/s, "
+          f"{StandInHandler.counts['connections']} connections, {sum(map(bool, results))}/{count} ok")
+    return elapsed
+
+
+def run_benchmark(count, concurrency, latency):
+    StandInHandler.latency = latency
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    service = make_service(port, concurrency)
+    message = 'Subject: benchmark\r\n\r\nhello\r\n'
+
+    print(f"\nMessages: {count}, concurrency {concurrency}, stand-in latency {latency * 1000:.0f} ms/command")
+
+    def one_off(i):
+        unpooled_send(service, [f'user{i}@example.com'], message)
+        return True
+
+    def pooled(sender):
+        return lambda i: sender.send_email([f'user{i}@example.com'], 'benchmark', 'hello')
+
+    before = run('connection/message', one_off, count, concurrency)
+    after = run('pooled', pooled(service), count, concurrency)
+    print(f"  Speedup           : {before / after:7.1f}x")
+
+    # Server hangs up every 5 messages; sends must reconnect transparently
+    StandInHandler.drop_after = 5
+    reconnect_service = make_service(port, 1)
+    run('pooled, drops', pooled(reconnect_service), 20, 1)
+    StandInHandler.drop_after = 0
+    print(f"  Pool stats        : {reconnect_service.transport.get_stats()}")
+
+    service.transport.close()
+    reconnect_service.transport.close()
+    server.shutdown()
+    return reconnect_service.transport.stats['sent'] == 20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark pooled SMTP sends against a local stand-in server')
+    parser.add_argument('--messages', type=int, default=200, help='Messages per run')
+    parser.add_argument('--concurrency', type=int, default=2, help='Sending threads (and pool size)')
+    parser.add_argument('--latency', type=float, default=0.005, help='Simulated round trip per SMTP command in seconds')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_benchmark(args.messages, args.concurrency, args.latency) else 1)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Subdomain Dispatch Benchmark
+Compares the old per-request if/elif host routing with the compiled dispatcher maps
+"""
+
+import argparse
+import io
+import time
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from app import app
+from subdomain_dispatcher import subdomain_dispatcher
+
+SAMPLE_REQUESTS = [
+    ('wiki.lusansapkota.com.np', '/'),
+    ('wiki.lusansapkota.com.np', '/search'),
+    ('wiki.lusansapkota.com.np', '/article/42'),
+    ('wiki.lusansapkota.com.np', '/explore'),
+    ('git.lusansapkota.com.np', '/project/7'),
+    ('git.lusansapkota.com.np', '/api/github/cache-stats'),
+    ('donation.lusansapkota.com.np', '/why-donate/3'),
+    ('donation.lusansapkota.com.np', '/payment/19'),
+    ('store.lusansapkota.com.np', '/'),
+    ('www.lusansapkota.com.np', '/'),
+]
+
+
+def legacy_resolve(host, path):
+    """Endpoint resolution as done by the old handle_subdomain_routing hook"""
+    if host.startswith('wiki.'):
+        from wiki.routes import index, search, article, random, random_article, explore
+        if path == '/':
+            return 'wiki.index', {}
+        elif path == '/search':
+            return 'wiki.search', {}
+        elif path.startswith('/article/'):
+            try:
+                return 'wiki.article', {'article_id': int(path.split('/')[-1])}
+            except ValueError:
+                pass
+        elif path == '/random':
+            return 'wiki.random', {}
+        elif path == '/random-article':
+            return 'wiki.random_article', {}
+        elif path == '/explore':
+            return 'wiki.explore', {}
+    elif host.startswith('git.'):
+        from git.routes import (index, search, project, api_projects, github_cache_stats,
+                                clear_github_cache, force_refresh_project)
+        if path == '/':
+            return 'git.index', {}
+        elif path == '/search':
+            return 'git.search', {}
+        elif path.startswith('/project/'):
+            try:
+                return 'git.project', {'project_id': int(path.split('/')[-1])}
+            except ValueError:
+                pass
+        elif path == '/api/projects':
+            return 'git.api_projects', {}
+        elif path == '/api/github/cache-stats':
+            return 'git.github_cache_stats', {}
+        elif path == '/api/github/clear-cache':
+            return 'git.clear_github_cache', {}
+        elif path.startswith('/api/github/force-refresh/'):
+            try:
+                return 'git.force_refresh_project', {'project_id': int(path.split('/')[-1])}
+            except ValueError:
+                pass
+    elif host.startswith('donation.'):
+        from donation.routes import (index, project_detail, donate, donation_success, subscribe_newsletter,
+                                     api_projects, api_project, api_donations, highlights, thanksgiving,
+                                     why_donate, api_donate, payment_instructions)
+        prefixes = [
+            ('/project/', 'donation.project_detail', 'project_id'),
+            ('/donate/', 'donation.donate', 'project_id'),
+            ('/success/', 'donation.donation_success', 'donation_id'),
+            ('/api/project/', 'donation.api_project', 'project_id'),
+            ('/api/donations/', 'donation.api_donations', 'project_id'),
+            ('/why-donate/', 'donation.why_donate', 'project_id'),
+            ('/payment/', 'donation.payment_instructions', 'donation_id'),
+        ]
+        exact = {
+            '/': 'donation.index',
+            '/subscribe': 'donation.subscribe_newsletter',
+            '/api/projects': 'donation.api_projects',
+            '/highlights': 'donation.highlights',
+            '/thanksgiving': 'donation.thanksgiving',
+            '/api/donate': 'donation.api_donate',
+        }
+        if path in exact:
+            return exact[path], {}
+        for prefix, endpoint, arg in prefixes:
+            if path.startswith(prefix):
+                try:
+                    return endpoint, {arg: int(path.split('/')[-1])}
+                except ValueError:
+                    pass
+    elif host.startswith('store.'):
+        from store.routes import index
+        if path == '/':
+            return 'store.index', {}
+    return None
+
+
+def legacy_dispatch(request, log):
+    """
+    Full cost of the old path: Flask matched every request against the main
+    URL map first, then the before_request hook re-resolved subdomain hosts
+    and printed its DEBUG lines.
+    """
+    try:
+        app.url_map.bind_to_environ(request.environ, subdomain='').match()
+    except HTTPException:
+        pass
+    print(f"DEBUG: Request - Host: {request.host}, Path: {request.path}, URL: {request.url}", file=log)
+    print(f"DEBUG: Flask SERVER_NAME: {app.config.get('SERVER_NAME')}", file=log)
+    return legacy_resolve(request.host, request.path)
+
+
+def dispatcher_resolve(request):
+    """Endpoint resolution through the compiled subdomain maps"""
+    adapter = subdomain_dispatcher.bind(request)
+    if adapter is None:
+        return None
+    return adapter.match()
+
+
+def run_benchmark(iterations):
+    requests_ = [
+        Request(EnvironBuilder(path=path, headers={'Host': host}).get_environ())
+        for host, path in SAMPLE_REQUESTS
+    ]
+
+    with app.app_context():
+        log = io.StringIO()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for request in requests_:
+                legacy_dispatch(request, log)
+            log.seek(0)
+            log.truncate()
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for host, path in SAMPLE_REQUESTS:
+                legacy_resolve(host, path)
+        chain_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for request in requests_:
+                dispatcher_resolve(request)
+        dispatcher_time = time.perf_counter() - start
+
+    total = iterations * len(SAMPLE_REQUESTS)
+    print(f"Resolved {total} requests per strategy")
+    print(f"  Legacy full path     : {legacy_time / total * 1e6:8.2f} us/request")
+    print(f"    (if/elif chain only: {chain_time / total * 1e6:8.2f} us/request)")
+    print(f"  Compiled dispatcher  : {dispatcher_time / total * 1e6:8.2f} us/request")
+    print(f"  Speedup              : {legacy_time / dispatcher_time:8.2f}x")
+    print(f"  Map sizes            : {subdomain_dispatcher.get_stats()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark subdomain request dispatch')
+    parser.add_argument('--iterations', type=int, default=5000, help='Passes over the sample request set')
+    args = parser.parse_args()
+    run_benchmark(args.iterations)
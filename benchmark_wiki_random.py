@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Wiki Random Article Benchmark
+Fills a throwaway SQLite database with N articles and times the old random
+pick (load every article, then sample) against the cached id array, for the
+six-card random page and the single-article redirect
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+DIRECTORY = tempfile.mkdtemp(prefix='wiki-random-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(DIRECTORY, "benchmark.db")}'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('DEBUG', 'true')  # in-memory rate limiter storage
+
+from sqlalchemy import insert
+
+from app import app
+from database import db
+from models import WikiArticle, WikiCategory
+from wiki.random_articles import random_articles
+from wiki.routes import CARD_OPTIONS
+from wiki.view_counter import view_counter
+
+
+def fill(count, body_bytes):
+    db.drop_all()
+    db.create_all()
+    category = WikiCategory(name='Benchmark')
+    db.session.add(category)
+    db.session.commit()
+    body = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * (body_bytes // 57 + 1))[:body_bytes]
+    # Core inserts: no ORM objects and no search-index events while filling
+    for start in range(0, count, 5000):
+        db.session.execute(insert(WikiArticle), [
+            {'title': f'Article {i}', 'content': body, 'summary': f'Summary {i}', 'tags': 'python',
+             'category_id': category.id, 'views': i % 1000}
+            for i in range(start, min(count, start + 5000))
+        ])
+    db.session.commit()
+    random_articles.invalidate()
+
+
+def old_page():
+    return random.sample(WikiArticle.query.all(), 6)
+
+
+def new_page():
+    return random_articles.choose(WikiArticle.query.options(*CARD_OPTIONS), 6)
+
+
+def old_redirect():
+    return random.choice(WikiArticle.query.all()).id
+
+
+def new_redirect():
+    return random_articles.choose(db.session.query(WikiArticle.id), 1)[0].id
+
+
+def measure(func, runs):
+    """(ms per call, peak MB) with the session cleared between calls, as between requests"""
+    db.session.remove()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(runs):
+        func()
+        db.session.remove()
+    elapsed = (time.perf_counter() - start) * 1000 / runs
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_benchmark(sizes, runs, old_runs, body_bytes):
+    ok = True
+    with app.app_context():
+        for count in sizes:
+            fill(count, body_bytes)
+            start = time.perf_counter()
+            random_articles.ids(db.session)
+            reload_ms = (time.perf_counter() - start) * 1000
+            print(f"\n{count:,} articles ({body_bytes} byte bodies), id array load {reload_ms:.1f} ms")
+
+            for label, old, new in (('random page (6)', old_page, new_page),
+                                    ('random redirect', old_redirect, new_redirect)):
+                old_ms, old_mb = measure(old, old_runs)
+                new_ms, new_mb = measure(new, runs)
+                print(f"  {label:<16}: load all {old_ms:9.2f} ms {old_mb:8.1f} MB | "
+                      f"id array {new_ms:7.3f} ms {new_mb:6.2f} MB | {old_ms / new_ms:7.0f}x")
+
+            picks = {article.id for _ in range(200) for article in new_page()}
+            distinct = len({len(new_page()) for _ in range(20)}) == 1
+            print(f"  Distinct ids over 200 pages: {len(picks):,}")
+            ok = ok and distinct and len(picks) > min(count, 1200) // 2
+        view_counter.flush()
+    shutil.rmtree(DIRECTORY, ignore_errors=True)
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark random wiki article selection')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Article counts to test')
+    parser.add_argument('--runs', type=int, default=200, help='Timed calls with the id array')
+    parser.add_argument('--old-runs', type=int, default=3, help='Timed calls loading every article')
+    parser.add_argument('--body-bytes', type=int, default=2000, help='Content size of each article')
+    args = parser.parse_args()
+    raise SystemExit(0 if run_benchmark(args.sizes, args.runs, args.old_runs, args.body_bytes) else 1)
@@ -24,8 +24,12 @@ def register_commands(app):
     @app.cli.command('update-github-data')
     @click.option('--force', is_flag=True, help='Force update all projects regardless of last update time')
     @click.option('--project-id', type=int, help='Update specific project by ID')
+    @click.option('--batch-size', default=10, help='Projects updated per commit')
+    @click.option('--daemon', is_flag=True, help='Keep running and refresh due projects every --interval seconds')
+    @click.option('--interval', default=1800, help='Seconds between refresh cycles in daemon mode')
+    @click.option('--bulk', is_flag=True, help='Fetch all due repositories with batched GraphQL queries and one bulk UPDATE')
     @with_appcontext
-    def update_github_data_command(force, project_id):
+    def update_github_data_command(force, project_id, batch_size, daemon, interval, bulk):
         """Update GitHub data for projects."""
         try:
             from github_service import github_service
@@ -56,55 +60,30 @@ def register_commands(app):
                     click.echo(f'Invalid GitHub URL for project "{project.title}": {project.github_url}')
                 return
             
-            # Update all projects
-            projects = Project.query.filter(Project.github_url.isnot(None)).all()
+            # Update all due projects through the refresher (batched commits)
+            from github_refresher import github_refresher
+            github_refresher.batch_size = batch_size
+            github_refresher.bulk = bulk
             
-            if not projects:
-                click.echo('No projects with GitHub URLs found.')
+            if daemon:
+                github_refresher.interval = interval
+                github_refresher.run_forever(log=click.echo)
                 return
             
-            click.echo(f'Found {len(projects)} projects with GitHub URLs.')
-            
             if force:
                 click.echo('Force mode: clearing all GitHub cache...')
                 github_service.clear_all_cache()
             
-            updated_count = 0
-            failed_count = 0
-            skipped_count = 0
-            
-            for project in projects:
-                username, repo = project.extract_github_repo()
-                if not username or not repo:
-                    click.echo(f'✗ Invalid GitHub URL: {project.title} - {project.github_url}')
-                    failed_count += 1
-                    continue
-                
-                # Check if update is needed (unless forced)
-                if not force and not project.should_update_github_data():
-                    click.echo(f'⏭ Skipped (recently updated): {project.title}')
-                    skipped_count += 1
-                    continue
-                
-                click.echo(f'Updating: {username}/{repo} ({project.title})...')
-                
-                if project.fetch_github_data():
-                    updated_count += 1
-                    click.echo(f'✓ Updated: {project.title} (stars: {project.stars}, forks: {project.forks})')
-                else:
-                    failed_count += 1
-                    click.echo(f'✗ Failed: {project.title}')
-            
-            if updated_count > 0:
-                db.session.commit()
-                click.echo(f'\n🎉 Committed {updated_count} updates to database.')
+            if bulk:
+                stats = github_refresher.refresh_bulk(force=force, log=click.echo)
+            else:
+                stats = github_refresher.refresh(force=force, log=click.echo)
             
             # Summary
             click.echo(f'\n📊 Summary:')
-            click.echo(f'  Updated: {updated_count}')
-            click.echo(f'  Failed: {failed_count}')
-            click.echo(f'  Skipped: {skipped_count}')
-            click.echo(f'  Total: {len(projects)}')
+            click.echo(f'  Updated: {stats["updated"]}')
+            click.echo(f'  Failed: {stats["failed"] + stats["invalid"]}')
+            click.echo(f'  Commits: {stats["batches"]}')
             
             # Cache stats
             stats = github_service.get_cache_stats()
@@ -127,6 +106,13 @@ def register_commands(app):
             click.echo(f'  Cache Enabled: {stats.get("cache_enabled", False)}')
             click.echo(f'  Cache Type: {stats.get("cache_type", "N/A")}')
             
+            requests_stats = stats.get('requests', {}).get('total')
+            if requests_stats:
+                click.echo(f'\n🔁 Conditional Requests (all time, {requests_stats["repositories"]} repos):')
+                click.echo(f'  200 Full: {requests_stats["full"]}')
+                click.echo(f'  304 Not Modified: {requests_stats["not_modified"]} ({requests_stats["not_modified_ratio"]:.0%} of fetches)')
+                click.echo(f'  Errors: {requests_stats["error"]}')
+            
             # Get rate limit info
             rate_limit = github_service.get_rate_limit_info()
             if rate_limit and 'resources' in rate_limit:
@@ -163,4 +149,282 @@ def register_commands(app):
                 click.echo('✅ Cleared all GitHub cache')
                 
         except Exception as e:
-            click.echo(f'Error clearing cache: {e}')
\ No newline at end of file
+            click.echo(f'Error clearing cache: {e}')
+    @app.cli.command('clear-page-cache')
+    @click.option('--prewarm', is_flag=True, help='Render the homepage into the fresh cache version')
+    @click.option('--base-url', default='http://localhost/', help='Host the homepage is rendered for')
+    @with_appcontext
+    def clear_page_cache_command(prewarm, base_url):
+        """Purge the homepage render cache."""
+        try:
+            from page_cache import page_cache
+            
+            version = page_cache.purge()
+            click.echo(f'✅ Homepage cache purged (version {version})')
+            
+            if prewarm:
+                response = app.test_client().get('/', base_url=base_url)
+                click.echo(f'🔥 Prewarmed {base_url} (HTTP {response.status_code})')
+                
+        except Exception as e:
+            click.echo(f'Error clearing page cache: {e}')
+
+    @app.cli.command('reconcile-donation-stats')
+    @with_appcontext
+    def reconcile_donation_stats_command():
+        """Recompute the donation statistics table from the donation rows."""
+        try:
+            from donation_stats import donation_stats
+            
+            totals = donation_stats.reconcile(db.session)
+            click.echo(f'✅ Donation stats reconciled: {totals["completed"]} completed donations, '
+                       f'{totals["supporter_count"]} supporters')
+            click.echo(f'  USD: ${totals["total_usd"]:,.2f} requested, ${totals["verified_usd"]:,.2f} received')
+            click.echo(f'  NPR: Rs.{totals["total_npr"]:,.2f} requested, Rs.{totals["verified_npr"]:,.2f} received')
+            
+        except Exception as e:
+            db.session.rollback()
+            click.echo(f'Error reconciling donation stats: {e}')
+
+    @app.cli.command('resume-newsletters')
+    @click.option('--job-id', type=int, help='Resume one job instead of every stalled or queued job')
+    @with_appcontext
+    def resume_newsletters_command(job_id):
+        """Finish newsletter sends whose background sender stopped."""
+        try:
+            from newsletter_delivery import newsletter_delivery
+            from models import NewsletterJob
+            
+            jobs = [db.session.get(NewsletterJob, job_id)] if job_id else newsletter_delivery.resumable_jobs()
+            jobs = [job for job in jobs if job is not None]
+            if not jobs:
+                click.echo('No newsletter jobs to resume')
+                return
+            
+            for job in jobs:
+                click.echo(f'📨 Resuming job {job.id}: {job.subject}')
+                result = newsletter_delivery.run(job.id)
+                if result is None:
+                    click.echo('  Skipped: another process is still sending it')
+                else:
+                    click.echo(f'  {result.status}: {result.sent_count}/{result.total} sent, {result.failed_count} failed')
+                    
+        except Exception as e:
+            db.session.rollback()
+            click.echo(f'Error resuming newsletters: {e}')
+
+    @app.cli.command('run-task-worker')
+    @click.option('--workers', default=2, help='Tasks run concurrently')
+    @click.option('--poll-interval', default=1.0, help='Seconds between polls when the queue is idle')
+    @click.option('--once', is_flag=True, help='Exit once no task is due instead of polling')
+    @with_appcontext
+    def run_task_worker_command(workers, poll_interval, once):
+        """Run queued background tasks (emails) until stopped."""
+        from flask import current_app
+        from task_queue import task_queue
+        
+        task_queue.run_worker(current_app._get_current_object(), workers=workers,
+                              poll_interval=poll_interval, once=once, log=click.echo)
+
+    @app.cli.command('task-queue-stats')
+    @click.option('--requeue-dead', is_flag=True, help='Give every dead task a fresh set of attempts')
+    @click.option('--purge-days', type=int, help='Delete finished tasks older than this many days')
+    @with_appcontext
+    def task_queue_stats_command(requeue_dead, purge_days):
+        """Show background task counts and dead tasks."""
+        try:
+            from datetime import timedelta
+            from task_queue import task_queue
+            from models import QueuedTask
+            
+            if requeue_dead:
+                click.echo(f'🔁 Requeued {task_queue.requeue_dead()} dead tasks')
+            if purge_days is not None:
+                click.echo(f'🧹 Purged {task_queue.purge_done(timedelta(days=purge_days))} finished tasks')
+            
+            stats = task_queue.get_stats()
+            click.echo('📊 Task queue:')
+            for status in ('pending', 'running', 'done', 'dead'):
+                click.echo(f'  {status.title()}: {stats[status]}')
+            click.echo(f'  Oldest due task waiting: {stats["oldest_due_seconds"]}s')
+            
+            for task in QueuedTask.query.filter_by(status='dead').order_by(QueuedTask.id).limit(20):
+                click.echo(f'  ✗ #{task.id} {task.name} after {task.attempts} attempts: {task.last_error}')
+                
+        except Exception as e:
+            db.session.rollback()
+            click.echo(f'Error reading task queue: {e}')
+
+    @app.cli.command('build-geoip-db')
+    @click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--output', help='Database file to write (default: GEOIP_DB_PATH or instance/geoip.bin)')
+    @with_appcontext
+    def build_geoip_db_command(csv_path, output):
+        """Build the offline GeoIP range database from a CSV."""
+        try:
+            from ip_intel import ip_intel, build_database
+            
+            output = output or ip_intel.db_path
+            stats = build_database(csv_path, output)
+            ip_intel.reload()
+            click.echo(f'✅ GeoIP database written to {output}')
+            click.echo(f'  IPv4 ranges: {stats["ipv4_ranges"]}, IPv6 ranges: {stats["ipv6_ranges"]}')
+            click.echo(f'  Locations: {stats["locations"]}, skipped rows: {stats["skipped"]}')
+            
+        except Exception as e:
+            click.echo(f'Error building GeoIP database: {e}')
+
+    @app.cli.command('build-assets')
+    @with_appcontext
+    def build_assets_command():
+        """Fingerprint and precompress static assets and regenerate the service worker precache list."""
+        try:
+            from flask import current_app
+            from assets import assets
+            
+            stats = assets.build(current_app._get_current_object(), log=click.echo)
+            click.echo(f'✅ Asset manifest written (version {stats["version"]})')
+            
+        except Exception as e:
+            click.echo(f'Error building assets: {e}')
+
+    @app.cli.command('build-image-variants')
+    @click.argument('paths', nargs=-1)
+    @click.option('--force', is_flag=True, help='Regenerate variants that already exist')
+    @with_appcontext
+    def build_image_variants_command(paths, force):
+        """Generate responsive WebP/PNG/JPEG variants of static and project images."""
+        try:
+            from images import images
+            
+            stats = images.build(list(paths) or None, force=force, log=click.echo)
+            click.echo(f'✅ {stats["images"]} images: {stats["created"]} generated, {stats["reused"]} unchanged, '
+                       f'{stats["failed"]} failed, {stats["removed"]} stale variant sets removed')
+            
+        except Exception as e:
+            click.echo(f'Error building image variants: {e}')
+
+    @app.cli.command('rebuild-wiki-search')
+    @with_appcontext
+    def rebuild_wiki_search_command():
+        """Rebuild the wiki full-text search index."""
+        try:
+            from wiki.search_index import wiki_search
+            
+            count = wiki_search.rebuild(db.session)
+            click.echo(f'✅ Indexed {count} wiki articles')
+            
+        except Exception as e:
+            click.echo(f'Error rebuilding wiki search index: {e}')
+            db.session.rollback()
+
+    @app.cli.command('render-wiki-articles')
+    @click.option('--workers', default=None, type=int, help='Render processes (default: CPU count)')
+    @click.option('--batch-size', default=200, help='Articles loaded and written per batch')
+    @click.option('--force', is_flag=True, help='Re-render articles whose stored HTML is current')
+    @with_appcontext
+    def render_wiki_articles_command(workers, batch_size, force):
+        """Pre-render wiki article markdown into stored HTML."""
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+            from sqlalchemy import update, bindparam
+            from models import WikiArticle
+            from utils.markdown_renderer import render_for_storage, content_hash
+            
+            table = WikiArticle.__table__
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam('b_id'))
+                .values(content_html=bindparam('b_html'), content_toc=bindparam('b_toc'),
+                        content_hash=bindparam('b_hash'), updated_at=table.c.updated_at)
+            )
+            
+            rendered = skipped = 0
+            last_id = 0
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                while True:
+                    rows = db.session.query(WikiArticle.id, WikiArticle.content, WikiArticle.content_hash) \
+                        .filter(WikiArticle.id > last_id).order_by(WikiArticle.id).limit(batch_size).all()
+                    if not rows:
+                        break
+                    last_id = rows[-1].id
+                    
+                    pending = [(row.id, row.content) for row in rows
+                               if force or row.content_hash != content_hash(row.content)]
+                    skipped += len(rows) - len(pending)
+                    if not pending:
+                        continue
+                    
+                    results = pool.map(render_for_storage, pending, chunksize=8)
+                    db.session.execute(statement, [
+                        {'b_id': article_id, 'b_html': html, 'b_toc': toc, 'b_hash': digest}
+                        for article_id, html, toc, digest in results
+                    ])
+                    db.session.commit()
+                    rendered += len(pending)
+                    click.echo(f'  Rendered {rendered} articles...')
+            
+            click.echo(f'✅ Rendered {rendered} wiki articles ({skipped} already current)')
+            
+        except Exception as e:
+            click.echo(f'Error rendering wiki articles: {e}')
+            db.session.rollback()
+
+    @app.cli.command('flush-wiki-views')
+    @with_appcontext
+    def flush_wiki_views_command():
+        """Write buffered wiki article views to the database now."""
+        try:
+            from wiki.view_counter import view_counter
+            
+            written = view_counter.flush()
+            click.echo(f'✅ Wrote {written} wiki article views ({view_counter.pending()} still pending)')
+            
+        except Exception as e:
+            click.echo(f'Error flushing wiki views: {e}')
+
+    @app.cli.command('backfill-wiki-text')
+    @click.option('--batch-size', default=500, help='Articles loaded and written per batch')
+    @click.option('--force', is_flag=True, help='Recompute articles whose derived fields are already set')
+    @with_appcontext
+    def backfill_wiki_text_command(batch_size, force):
+        """Fill in the plain text, excerpt, word count and reading time of wiki articles."""
+        try:
+            from sqlalchemy import update, bindparam
+            from models import WikiArticle, derive_article_text
+            
+            table = WikiArticle.__table__
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam('b_id'))
+                .values(plain_text=bindparam('b_plain_text'), excerpt=bindparam('b_excerpt'),
+                        word_count=bindparam('b_word_count'), reading_time=bindparam('b_reading_time'),
+                        updated_at=table.c.updated_at)
+            )
+            
+            updated = 0
+            last_id = 0
+            while True:
+                query = db.session.query(WikiArticle.id, WikiArticle.content).filter(WikiArticle.id > last_id)
+                if not force:
+                    query = query.filter(WikiArticle.word_count.is_(None))
+                rows = query.order_by(WikiArticle.id).limit(batch_size).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                
+                params = []
+                for row in rows:
+                    plain_text, excerpt, word_count, reading_time = derive_article_text(row.content)
+                    params.append({'b_id': row.id, 'b_plain_text': plain_text, 'b_excerpt': excerpt,
+                                   'b_word_count': word_count, 'b_reading_time': reading_time})
+                db.session.execute(statement, params)
+                db.session.commit()
+                updated += len(rows)
+                click.echo(f'  Updated {updated} articles...')
+            
+            click.echo(f'✅ Derived text fields for {updated} wiki articles')
+            
+        except Exception as e:
+            click.echo(f'Error backfilling wiki text fields: {e}')
+            db.session.rollback()
@@ -0,0 +1,134 @@
+"""
+Conditional Responses
+Lets public views answer If-None-Match / If-Modified-Since with 304 Not
+Modified before they query everything and render. Each view names a
+validator: a cheap function of its URL arguments returning the values its
+output depends on (row timestamps and counts). Their hash, together with a
+fingerprint of the deployed templates and assets, is the ETag. Cache-Control
+comes from the view's route class and is applied by add_security_headers
+"""
+
+import hashlib
+import os
+from datetime import date, datetime
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from sqlalchemy import func
+
+from assets import assets
+from database import db
+from images import images
+
+# Cache-Control by route class
+CACHE_POLICIES = {
+    # HTML pages may be stored but are revalidated on every use; unchanged ones cost a 304
+    'page': 'public, no-cache',
+    # JSON APIs stay fresh for a minute, then revalidate
+    'api': 'public, max-age=60, must-revalidate',
+}
+
+
+def table_state(column, *criteria):
+    """(row count, latest ``column`` value) of the rows matching ``criteria``, in one aggregate query"""
+    return tuple(db.session.query(func.count(), func.max(column))
+                 .select_from(column.class_).filter(*criteria).one())
+
+
+def _datetimes(value):
+    if isinstance(value, datetime):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _datetimes(item)
+
+
+class ConditionalResponses:
+    def __init__(self):
+        self._release = None
+        self.stats = {'validated': 0, 'not_modified': 0}
+
+    def init_app(self, app):
+        app.extensions['conditional'] = self
+
+    def release(self):
+        """Hash of every template the app renders, so a deploy that changes one retires old ETags"""
+        if self._release is None:
+            app = current_app
+            folders = [os.path.join(app.root_path, app.template_folder)]
+            folders += [os.path.join(blueprint.root_path, blueprint.template_folder)
+                        for blueprint in app.blueprints.values() if blueprint.template_folder]
+            digest = hashlib.sha1()
+            for folder in sorted(set(folders)):
+                for directory, _, names in sorted(os.walk(folder)):
+                    for name in sorted(names):
+                        with open(os.path.join(directory, name), 'rb') as f:
+                            digest.update(name.encode('utf-8') + f.read())
+            self._release = digest.hexdigest()
+        return self._release
+
+    def etag(self, state):
+        # Image variants and fingerprinted asset URLs are baked into the HTML too
+        raw = repr((self.release(), assets.version, images.version(), date.today().year,
+                    request.path, request.query_string, state))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def last_modified(state):
+        """Latest timestamp anywhere in the validator state"""
+        return max(_datetimes(state), default=None)
+
+    @staticmethod
+    def _not_modified(etag, last_modified):
+        # If-Modified-Since only counts when the client has no ETag to offer
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        if last_modified and request.if_modified_since:
+            return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+        return False
+
+    def validate(self, validator, policy='page'):
+        """
+        Decorator for GET views. ``validator`` takes the view's URL arguments
+        and returns the state the response depends on, or None to let the view
+        run as usual (for instance so it can 404).
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                g.cache_policy = policy
+                # Pending flash messages are shown once, so that render must happen
+                if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                    return view(**kwargs)
+                state = validator(**kwargs)
+                if state is None:
+                    return view(**kwargs)
+
+                self.stats['validated'] += 1
+                etag, last_modified = self.etag(state), self.last_modified(state)
+                if self._not_modified(etag, last_modified):
+                    self.stats['not_modified'] += 1
+                    response = current_app.response_class(status=304)
+                else:
+                    response = make_response(view(**kwargs))
+                    if response.status_code != 200:
+                        return response
+                # Weak: a proxy compressing the body keeps the validator usable
+                response.set_etag(etag, weak=True)
+                if last_modified:
+                    response.last_modified = last_modified
+                return response
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def apply_cache_policy(response):
+        """Cache-Control for the route class the view chose, unless the view set its own"""
+        policy = g.get('cache_policy')
+        if policy and 'Cache-Control' not in response.headers and response.status_code in (200, 304):
+            response.headers['Cache-Control'] = CACHE_POLICIES[policy]
+        return response
+
+
+# Global instance
+conditional_get = ConditionalResponses()
@@ -12,6 +12,8 @@ cd $APP_DIR
 
 # Pull latest changes
 echo "$(date): Pulling latest changes..." >> $LOG_FILE
+# sw.js carries the precache list of the last asset build; it is regenerated below
+git checkout -- static/sw.js
 git pull origin main >> $LOG_FILE 2>&1
 
 # Activate virtual environment
@@ -25,8 +27,10 @@ pip install -r requirements.txt >> $LOG_FILE 2>&1
 echo "$(date): Running database migrations..." >> $LOG_FILE
 # Add migration commands here if using Flask-Migrate
 
-# Collect static files (if needed)
-# python manage.py collectstatic --noinput
+# Fingerprint and precompress static assets
+echo "$(date): Building static assets..." >> $LOG_FILE
+flask --app app build-assets >> $LOG_FILE 2>&1
+flask --app app build-image-variants >> $LOG_FILE 2>&1
 
 # Restart application
 echo "$(date): Restarting application..." >> $LOG_FILE
@@ -1,12 +1,37 @@
 from flask import render_template, request, jsonify, flash, redirect, url_for, current_app
 from . import donation_bp
 from models import DonationProject, Donation, NewsletterSubscriber, PaymentMethod, ThanksgivingSettings, DonationSettings, db
-from email_service import email_service
+from task_queue import task_queue
+from donation_stats import donation_stats
+from conditional import conditional_get, table_state
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Validators for conditional GET
+
+def donation_project_state(project_id):
+    project = db.session.query(DonationProject.updated_at, DonationProject.is_active) \
+        .filter(DonationProject.id == project_id).first()
+    return tuple(project) if project else None
+
+def project_detail_state(project_id):
+    """The page shows an active donation project, else falls back to a portfolio project"""
+    from models import SeoSettings, PersonalInfo, Project
+    project = donation_project_state(project_id)
+    if project is None or not project[1]:
+        regular = db.session.query(Project.updated_at).filter(Project.id == project_id).first()
+        if regular is None:
+            return None
+        project = tuple(regular)
+    return (project, table_state(Donation.updated_at, Donation.project_id == project_id),
+            table_state(PaymentMethod.updated_at), table_state(SeoSettings.updated_at),
+            table_state(PersonalInfo.updated_at))
+
+def projects_state():
+    return table_state(DonationProject.updated_at)
+
 @donation_bp.route('/')
 def index():
     """Main donation page showing all active projects"""
@@ -42,15 +67,9 @@ def index():
         project_count = len(all_projects)
         
         # Calculate total raised in different currencies
-        total_usd = db.session.query(db.func.sum(Donation.amount)).filter(
-            Donation.status == 'completed',
-            Donation.currency == 'USD'
-        ).scalar() or 0
-        
-        total_npr = db.session.query(db.func.sum(Donation.amount)).filter(
-            Donation.status == 'completed',
-            Donation.currency == 'NPR'
-        ).scalar() or 0
+        totals = donation_stats.get_totals()
+        total_usd = totals['total_usd']
+        total_npr = totals['total_npr']
         
         # Format the totals for display with proper currency symbols
         total_raised_display = ""
@@ -64,7 +83,7 @@ def index():
             total_raised_display = "$0 / Rs.0"
         
         # Count unique supporters
-        supporter_count = db.session.query(db.func.count(db.func.distinct(Donation.donor_email))).filter_by(status='completed').scalar() or 0
+        supporter_count = totals['supporter_count']
         
     except Exception as e:
         logger.error(f"Error calculating statistics: {e}")
@@ -90,6 +109,7 @@ def index():
                          current_year=datetime.now().year)
 
 @donation_bp.route('/project/<int:project_id>')
+@conditional_get.validate(project_detail_state)
 def project_detail(project_id):
     """Detailed view of a specific donation project (supports both DonationProject and regular Project)"""
     from models import SeoSettings, PersonalInfo, Project
@@ -127,6 +147,9 @@ def project_detail(project_id):
             from flask import abort
             abort(404)
     
+    # Completed donations to this project, from the donation_stats rows
+    supporter_count = sum(totals['count'] for totals in donation_stats.get_project_totals(project_id).values())
+
     # Get available payment methods - sorted by currency and status
     try:
         payment_methods = PaymentMethod.query.filter_by(is_active=True)\
@@ -154,6 +177,7 @@ def project_detail(project_id):
                          project=project,
                          project_type=project_type,
                          donations=donations,
+                         supporter_count=supporter_count,
                          payment_methods=payment_methods,
                          npr_methods=npr_methods,
                          usd_methods=usd_methods,
@@ -225,30 +249,12 @@ def donate(project_id):
             )
             
             db.session.add(donation)
-            db.session.commit()
+            db.session.flush()
             
-            # Send thank you email to donor
-            try:
-                if email_service:
-                    email_service.send_donation_thank_you(
-                        donor_email, 
-                        donor_name, 
-                        amount, 
-                        project.title,
-                        currency
-                    )
-            except Exception as e:
-                logger.error(f"Failed to send thank you email: {e}")
-            
-            # Send admin notification email
-            try:
-                if email_service:
-                    email_service.send_admin_donation_notification(
-                        donation,
-                        project.title
-                    )
-            except Exception as e:
-                logger.error(f"Failed to send admin notification email: {e}")
+            # Thank-you and admin notification emails are sent by the task worker
+            task_queue.enqueue('donation_thank_you', donation_id=donation.id)
+            task_queue.enqueue('admin_donation_notification', donation_id=donation.id)
+            db.session.commit()
             
             if request.is_json:
                 return jsonify({
@@ -339,15 +345,10 @@ def subscribe_newsletter():
                 interests=interests
             )
             db.session.add(subscriber)
+            # Welcome email is sent by the task worker
+            task_queue.enqueue('newsletter_welcome', email=email, name=name or None)
             db.session.commit()
             
-            # Send welcome email
-            try:
-                if email_service:
-                    email_service.send_newsletter_welcome(email, name or 'Subscriber')
-            except Exception as e:
-                logger.error(f"Failed to send welcome email: {e}")
-            
             if request.is_json or 'application/json' in request.headers.get('Accept', ''):
                 return jsonify({'success': True, 'status': 'success', 'message': 'Thank you for subscribing to my newsletter!'})
             flash('Thank you for subscribing to my newsletter!', 'success')
@@ -364,12 +365,14 @@ def subscribe_newsletter():
         return redirect(url_for('donation.index'))
 
 @donation_bp.route('/api/projects')
+@conditional_get.validate(projects_state, policy='api')
 def api_projects():
     """API endpoint to get all active projects"""
     projects = DonationProject.query.filter_by(is_active=True).all()
     return jsonify([project.to_dict() for project in projects])
 
 @donation_bp.route('/api/project/<int:project_id>')
+@conditional_get.validate(donation_project_state, policy='api')
 def api_project(project_id):
     """API endpoint to get a specific project"""
     project = DonationProject.query.get_or_404(project_id)
@@ -409,15 +412,9 @@ def highlights():
         total_featured = featured_donation_count
         
         # Calculate total raised in different currencies
-        total_usd = db.session.query(db.func.sum(Donation.amount)).filter(
-            Donation.status == 'completed',
-            Donation.currency == 'USD'
-        ).scalar() or 0
-        
-        total_npr = db.session.query(db.func.sum(Donation.amount)).filter(
-            Donation.status == 'completed',
-            Donation.currency == 'NPR'
-        ).scalar() or 0
+        totals = donation_stats.get_totals()
+        total_usd = totals['total_usd']
+        total_npr = totals['total_npr']
         
         # Format the totals for display with proper currency symbols
         if total_usd > 0 and total_npr > 0:
@@ -430,7 +427,7 @@ def highlights():
             total_raised_display = "$0 / Rs.0"
         
         # Count unique supporters
-        supporter_count = db.session.query(db.func.count(db.func.distinct(Donation.donor_email))).filter_by(status='completed').scalar() or 0
+        supporter_count = totals['supporter_count']
         
         # Prepare achievement stats
         achievement_stats = {
@@ -517,6 +514,7 @@ def thanksgiving():
                          current_year=datetime.now().year)
 
 @donation_bp.route('/why-donate/<int:project_id>')
+@conditional_get.validate(donation_project_state)
 def why_donate(project_id):
     """Page explaining why someone should donate to a specific project"""
     project = DonationProject.query.get_or_404(project_id)
@@ -553,20 +551,11 @@ def api_donate():
         )
         
         db.session.add(donation)
-        db.session.commit()
+        db.session.flush()
         
-        # Send thank you email
-        try:
-            if email_service:
-                email_service.send_donation_thank_you(
-                    donation.donor_email, 
-                    donation.donor_name, 
-                    donation.amount, 
-                    project.title,
-                    donation.currency
-                )
-        except Exception as e:
-            logger.error(f"Failed to send thank you email: {e}")
+        # Thank-you email is sent by the task worker
+        task_queue.enqueue('donation_thank_you', donation_id=donation.id)
+        db.session.commit()
         
         return jsonify({
             'success': True,
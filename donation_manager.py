@@ -99,19 +99,16 @@ def view_donations():
             print("-" * 30)
             
             # Top currencies
-            usd_total = db.session.query(db.func.sum(Donation.amount)).filter(
-                Donation.status == 'completed', Donation.currency == 'USD'
-            ).scalar() or 0
-            
-            npr_total = db.session.query(db.func.sum(Donation.amount)).filter(
-                Donation.status == 'completed', Donation.currency == 'NPR'
-            ).scalar() or 0
+            from donation_stats import donation_stats
+            totals = donation_stats.get_totals()
+            usd_total = totals['total_usd']
+            npr_total = totals['total_npr']
             
             print(f"  💵 Total USD Raised: ${usd_total:,.2f}")
             print(f"  💰 Total NPR Raised: Rs.{npr_total:,.2f}")
             
             # Unique donors
-            unique_donors = db.session.query(db.func.count(db.func.distinct(Donation.donor_email))).filter_by(status='completed').scalar() or 0
+            unique_donors = totals['supporter_count']
             print(f"  👥 Unique Supporters: {unique_donors}")
             
             # Average donation
@@ -0,0 +1,234 @@
+"""
+Donation Statistics
+Keeps the donation_stats aggregate table in step with completed donations, so
+totals and supporter counts are read from a handful of rows instead of
+scanning every donation
+"""
+
+from sqlalchemy import case, event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import db
+from models import Donation, DonationStats
+
+DEFAULT_CURRENCY = 'NPR'
+TRACKED_FIELDS = ('status', 'currency', 'project_id', 'donor_email', 'amount', 'verified_amount')
+
+
+class DonationStatsTracker:
+    """
+    Applies the change in each flushed donation's contribution as ``+=``
+    deltas on the flushing connection, so the aggregate commits or rolls
+    back with the donation itself. Only completed donations contribute.
+
+    Rows written outside the ORM (bulk or Core updates) are not seen; run
+    ``flask reconcile-donation-stats`` after those.
+    """
+
+    def init_app(self, app):
+        if not event.contains(Session, 'before_flush', self._before_flush):
+            event.listen(Session, 'before_flush', self._before_flush)
+            event.listen(Session, 'after_flush', self._after_flush)
+        app.extensions['donation_stats'] = self
+
+    # Contributions
+
+    @staticmethod
+    def _contribution(values):
+        """(currency, project_id, email, amount, verified) counted for a donation, or None"""
+        if values['status'] != 'completed':
+            return None
+        amount = values['amount'] or 0.0
+        return (values['currency'] or DEFAULT_CURRENCY, values['project_id'], values['donor_email'],
+                amount, values['verified_amount'] or amount)
+
+    def _before_flush(self, session, flush_context, instances):
+        """Read the stored state of donations about to change or be deleted"""
+        changing = [obj for obj in session.dirty if isinstance(obj, Donation) and session.is_modified(obj)]
+        changing += [obj for obj in session.deleted if isinstance(obj, Donation)]
+        ids = {obj.id for obj in changing if obj.id is not None}
+        if not ids:
+            return
+        # From the table rather than attribute history, which misses the old
+        # value when an expired attribute is assigned without being loaded
+        table = Donation.__table__
+        rows = session.connection().execute(
+            select(table.c.id, *(table.c[name] for name in TRACKED_FIELDS)).where(table.c.id.in_(ids))
+        ).mappings()
+        stored = session.info['donation_stats_before'] = {}
+        for row in rows:
+            stored[row['id']] = self._contribution(row)
+
+    def _after_flush(self, session, flush_context):
+        stored = session.info.pop('donation_stats_before', {})
+        changes = []
+        for donation in session.new:
+            if isinstance(donation, Donation):
+                changes.append((None, self._contribution(self._values(donation))))
+        for donation in session.dirty:
+            if isinstance(donation, Donation) and donation.id in stored:
+                changes.append((stored[donation.id], self._contribution(self._values(donation))))
+        for donation in session.deleted:
+            if isinstance(donation, Donation) and donation.id in stored:
+                changes.append((stored[donation.id], None))
+
+        totals, supporters = {}, {}
+        for old, new in changes:
+            if old == new:
+                continue
+            for sign, contribution in ((-1, old), (1, new)):
+                if contribution is None:
+                    continue
+                currency, project_id, email, amount, verified = contribution
+                for key in (('currency', currency), ('project', f'{project_id}:{currency}')):
+                    delta = totals.setdefault(key, [0, 0.0, 0.0])
+                    delta[0] += sign
+                    delta[1] += sign * amount
+                    delta[2] += sign * verified
+                supporters[email] = supporters.get(email, 0) + sign
+
+        if totals or supporters:
+            self._apply(session.connection(), totals, supporters)
+
+    @staticmethod
+    def _values(donation):
+        return {name: getattr(donation, name) for name in TRACKED_FIELDS}
+
+    def _apply(self, connection, totals, supporters):
+        table = DonationStats.__table__
+        supporter_delta = 0
+        for email, count in supporters.items():
+            if not count:
+                continue
+            after = self._increment(connection, table, ('supporter', email), count, 0.0, 0.0)
+            before = after - count
+            if before <= 0 < after:
+                supporter_delta += 1
+            elif after <= 0 < before:
+                supporter_delta -= 1
+        if supporter_delta:
+            self._increment(connection, table, ('summary', 'supporters'), supporter_delta, 0.0, 0.0)
+        connection.execute(table.delete().where(table.c.scope == 'supporter', table.c.completed_count <= 0))
+
+        for key, (count, amount, verified) in totals.items():
+            self._increment(connection, table, key, count, amount, verified)
+
+    @staticmethod
+    def _increment(connection, table, key, count, amount, verified):
+        """
+        Add to one row, creating it if missing; returns the new completed_count.
+
+        Concurrent flushes can both be the first to touch a key (a new
+        supporter, project or currency), so creating the row must not fail
+        for the one that loses the race: SQLite and PostgreSQL upsert in one
+        statement, other databases retry the UPDATE when the INSERT collides.
+        """
+        scope, stat_key = key
+        values = {'scope': scope, 'stat_key': stat_key, 'completed_count': count,
+                  'total_amount': amount, 'verified_amount': verified, 'updated_at': func.now()}
+        match = (table.c.scope == scope) & (table.c.stat_key == stat_key)
+
+        dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(connection.dialect.name)
+        if dialect is not None:
+            statement = dialect.insert(table).values(**values)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.scope, table.c.stat_key],
+                set_={
+                    'completed_count': table.c.completed_count + statement.excluded.completed_count,
+                    'total_amount': table.c.total_amount + statement.excluded.total_amount,
+                    'verified_amount': table.c.verified_amount + statement.excluded.verified_amount,
+                    'updated_at': statement.excluded.updated_at,
+                },
+            )
+            if connection.dialect.insert_returning:
+                return connection.execute(statement.returning(table.c.completed_count)).scalar()
+            connection.execute(statement)
+            return connection.execute(select(table.c.completed_count).where(match)).scalar()
+
+        update = table.update().where(match).values(
+            completed_count=table.c.completed_count + count,
+            total_amount=table.c.total_amount + amount,
+            verified_amount=table.c.verified_amount + verified,
+            updated_at=func.now(),
+        )
+        if not connection.execute(update).rowcount:
+            try:
+                with connection.begin_nested():
+                    connection.execute(table.insert().values(**values))
+                return count
+            except IntegrityError:
+                # Another flush created the row first; add to it instead
+                connection.execute(update)
+        return connection.execute(select(table.c.completed_count).where(match)).scalar()
+
+    # Reads
+
+    def get_totals(self):
+        """
+        Totals over completed donations: ``total_<cur>`` sums the requested amount and
+        ``verified_<cur>`` the received amount (verified_amount or amount).
+        """
+        rows = DonationStats.query.filter(DonationStats.scope.in_(('currency', 'summary'))).all()
+        totals = {'completed': 0, 'supporter_count': 0,
+                  'total_usd': 0.0, 'total_npr': 0.0, 'verified_usd': 0.0, 'verified_npr': 0.0}
+        for row in rows:
+            if row.scope == 'summary':
+                totals['supporter_count'] = max(0, row.completed_count)
+                continue
+            currency = row.stat_key.lower()
+            totals['completed'] += row.completed_count
+            totals[f'total_{currency}'] = row.total_amount
+            totals[f'verified_{currency}'] = row.verified_amount
+        return totals
+
+    def get_project_totals(self, project_id):
+        """{currency: {'count', 'total', 'verified'}} for one donation project"""
+        rows = DonationStats.query.filter(DonationStats.scope == 'project',
+                                          DonationStats.stat_key.like(f'{project_id}:%')).all()
+        return {
+            row.stat_key.split(':', 1)[1]: {'count': row.completed_count, 'total': row.total_amount,
+                                            'verified': row.verified_amount}
+            for row in rows
+        }
+
+    # Maintenance
+
+    def reconcile(self, session):
+        """Recompute every row from the donation table; returns the fresh totals"""
+        # Same normalization as _contribution: a missing or empty currency counts as the default
+        currency = func.coalesce(func.nullif(Donation.currency, ''), DEFAULT_CURRENCY)
+        verified = case(
+            ((Donation.verified_amount.is_(None)) | (Donation.verified_amount == 0), Donation.amount),
+            else_=Donation.verified_amount,
+        )
+        completed = Donation.status == 'completed'
+        sums = (func.count(Donation.id), func.coalesce(func.sum(Donation.amount), 0.0),
+                func.coalesce(func.sum(verified), 0.0))
+
+        rows = []
+        for cur, count, amount, received in session.query(currency, *sums).filter(completed).group_by(currency):
+            rows.append({'scope': 'currency', 'stat_key': cur, 'completed_count': count,
+                         'total_amount': amount, 'verified_amount': received})
+        for project_id, cur, count, amount, received in (
+                session.query(Donation.project_id, currency, *sums).filter(completed)
+                .group_by(Donation.project_id, currency)):
+            rows.append({'scope': 'project', 'stat_key': f'{project_id}:{cur}', 'completed_count': count,
+                         'total_amount': amount, 'verified_amount': received})
+        supporters = session.query(Donation.donor_email, func.count(Donation.id)).filter(completed) \
+            .group_by(Donation.donor_email).all()
+        for email, count in supporters:
+            rows.append({'scope': 'supporter', 'stat_key': email, 'completed_count': count,
+                         'total_amount': 0.0, 'verified_amount': 0.0})
+        rows.append({'scope': 'summary', 'stat_key': 'supporters', 'completed_count': len(supporters),
+                     'total_amount': 0.0, 'verified_amount': 0.0})
+
+        session.query(DonationStats).delete()
+        session.execute(DonationStats.__table__.insert(), rows)
+        session.commit()
+        return self.get_totals()
+
+
+# Global instance
+donation_stats = DonationStatsTracker()
@@ -8,46 +8,24 @@ from flask import current_app, render_template_string
 from typing import List, Optional, Dict
 from datetime import datetime
 import logging
-import requests
 import socket
 
+from ip_intel import ip_intel
+from smtp_pool import SMTPPool
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Swapped for each recipient's unsubscribe link in a rendered newsletter
+NEWSLETTER_UNSUBSCRIBE_PLACEHOLDER = '%%NEWSLETTER_UNSUBSCRIBE_URL%%'
+
 def get_ip_info(ip_address: str) -> Dict[str, str]:
     """
-    Get geolocation information for an IP address
+    Get geolocation information for an IP address from the local GeoIP database
     """
     try:
-        # Handle localhost/private IPs
-        if ip_address in ['127.0.0.1', '::1', 'localhost'] or ip_address.startswith('192.168.') or ip_address.startswith('10.') or ip_address.startswith('172.'):
-            return {
-                'ip': ip_address,
-                'city': 'Local/Private Network',
-                'region': 'Local',
-                'country': 'Local',
-                'timezone': 'Local Timezone',
-                'isp': 'Local Network',
-                'org': 'Private Network'
-            }
-        
-        # Use ip-api.com for geolocation (free service)
-        response = requests.get(f'http://ip-api.com/json/{ip_address}', timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if data['status'] == 'success':
-                return {
-                    'ip': ip_address,
-                    'city': data.get('city', 'Unknown'),
-                    'region': data.get('regionName', 'Unknown'),
-                    'country': data.get('country', 'Unknown'),
-                    'timezone': data.get('timezone', 'Unknown'),
-                    'isp': data.get('isp', 'Unknown'),
-                    'org': data.get('org', 'Unknown'),
-                    'lat': data.get('lat', 'Unknown'),
-                    'lon': data.get('lon', 'Unknown')
-                }
+        return ip_intel.lookup(ip_address)
     except Exception as e:
         logger.warning(f"Failed to get IP info for {ip_address}: {e}")
     
@@ -73,6 +51,15 @@ class EmailService:
         # Must be configured as a "Send mail as" alias in Gmail settings
         self.from_email = os.getenv('MAIL_FROM', self.email_user)
         
+        # Authenticated connections are reused across sends
+        self.transport = SMTPPool(
+            self.smtp_server, self.smtp_port,
+            username=self.email_user, password=self.email_password,
+            use_tls=os.getenv('MAIL_USE_TLS', 'true').lower() == 'true',
+            max_connections=int(os.getenv('MAIL_POOL_SIZE', 2)),
+            idle_timeout=int(os.getenv('MAIL_POOL_IDLE_TIMEOUT', 60)),
+        )
+        
     def send_email(self, to_emails: List[str], subject: str, body: str, 
                    html_body: Optional[str] = None, attachments: Optional[List[str]] = None,
                    reply_to: Optional[str] = None) -> bool:
@@ -110,13 +97,8 @@ class EmailService:
                         )
                         msg.attach(part)
             
-            # Send email
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
-            text = msg.as_string()
-            server.sendmail(self.email_user, to_emails, text)
-            server.quit()
+            # Send email over a pooled connection
+            self.transport.send(self.email_user, to_emails, msg.as_string())
             
             logger.info(f"Email sent successfully to {to_emails}")
             return True
@@ -182,21 +164,22 @@ class EmailService:
         
         return self.send_email([donor_email], subject, text_body, html_body)
     
-    def send_newsletter(self, subscribers: List[str], subject: str, content: str) -> bool:
+    def newsletter_unsubscribe_url(self, email: str) -> str:
+        """Unsubscribe link for one subscriber (decoded by /newsletter/unsubscribe/<token>)"""
+        import base64
+        unsubscribe_token = base64.b64encode(email.encode()).decode()
+        return f"https://lusansapkota.com.np/newsletter/unsubscribe/{unsubscribe_token}"
+
+    def render_newsletter(self, subject: str, content: str) -> Dict[str, str]:
         """
-        Send newsletter to subscribers with proper unsubscribe links.
+        Render the newsletter once for all recipients.
+        Returns {'text': ..., 'html': ...} with NEWSLETTER_UNSUBSCRIBE_PLACEHOLDER where each
+        recipient's unsubscribe link goes; see personalize_newsletter().
         Uses table-based HTML layout for maximum mail client compatibility.
         """
-        import base64
-
-        success_count = 0
+        unsubscribe_url = NEWSLETTER_UNSUBSCRIBE_PLACEHOLDER
 
-        for email in subscribers:
-            try:
-                unsubscribe_token = base64.b64encode(email.encode()).decode()
-                unsubscribe_url = f"https://lusansapkota.com.np/newsletter/unsubscribe/{unsubscribe_token}"
-
-                html_template = f"""<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+        html_template = f"""<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
 <html xmlns="http://www.w3.org/1999/xhtml">
 <head>
     <meta http-equiv="Content-Type" content="text/html; charset=UTF-8" />
@@ -313,7 +296,7 @@ class EmailService:
 </body>
 </html>"""
 
-                text_content = f"""{subject}
+        text_template = f"""{subject}
 
 {content}
 
@@ -326,7 +309,26 @@ To unsubscribe, visit: {unsubscribe_url}
 Lusan Sapkota - Full Stack Developer
 Kathmandu, Nepal"""
 
-                if self.send_email([email], subject, text_content, html_template):
+        return {'text': text_template, 'html': html_template}
+
+    def personalize_newsletter(self, rendered: Dict[str, str], email: str) -> Dict[str, str]:
+        """Per-recipient copy of a render_newsletter() result"""
+        unsubscribe_url = self.newsletter_unsubscribe_url(email)
+        return {part: body.replace(NEWSLETTER_UNSUBSCRIBE_PLACEHOLDER, unsubscribe_url)
+                for part, body in rendered.items()}
+
+    def send_newsletter(self, subscribers: List[str], subject: str, content: str) -> bool:
+        """
+        Send newsletter to subscribers with proper unsubscribe links, one after another.
+        The admin panel uses newsletter_delivery for concurrent, resumable sends.
+        """
+        rendered = self.render_newsletter(subject, content)
+        success_count = 0
+
+        for email in subscribers:
+            try:
+                message = self.personalize_newsletter(rendered, email)
+                if self.send_email([email], subject, message['text'], message['html']):
                     success_count += 1
 
             except Exception as e:
@@ -457,6 +459,48 @@ Kathmandu, Nepal"""
         
         return self.send_email([email], reply_subject, text_body, html_body)
     
+    def send_newsletter_welcome(self, email: str, name: Optional[str] = None) -> bool:
+        """
+        Send the welcome email to a new newsletter subscriber
+        """
+        subject = "🌟 Welcome to Lusan's Newsletter!"
+        text_body = f"""
+Dear {name or email.split('@')[0].capitalize()},
+
+Thanks a lot for signing up — I truly appreciate it!
+
+This newsletter is my little corner of the web where I share what I’ve been working on, what I’m learning, and anything I think might be helpful or interesting to fellow developers like you.
+
+Here’s a quick peek at what you can expect:
+
+🔥 Behind-the-Scenes Project Updates
+Get a first look at my latest builds, experiments, and open-source work.
+
+🧠 Practical Tutorials & Dev Notes
+I’ll share what I’ve learned — patterns, tips, and real-world lessons that have helped me improve as a developer.
+
+💡 Workflow & Productivity Tips
+Occasionally, I’ll drop a few things that have made coding or managing projects smoother for me.
+
+🌱 A Growing Developer Community
+You’ll be part of a small but growing space where devs help each other grow — no noise, just value.
+
+🎁 Extra Stuff (When I Can)
+From snippets to articles, case studies, or templates — if I build something useful, you’ll get it here first.
+
+That’s it — nothing fancy, no pressure. Just useful, honest content for devs who love to build.
+
+If you ever want to say hi, ask something, or share what you’re working on, feel free to reply — I read every message.
+
+Talk soon,
+Lusan
+Just a developer, trying to build good things.
+
+https://lusansapkota.com.np
+"""
+        
+        return self.send_email([email], subject, text_body)
+    
     def send_donation_thank_you(self, email: str, name: str, amount: float, project_title: str, currency: str = 'USD') -> bool:
         """
         Send a thank you email for donation
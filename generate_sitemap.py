@@ -4,145 +4,18 @@ Dynamic Sitemap Generator for Lusan Sapkota Portfolio
 Generates XML sitemaps with proper priority and frequency settings
 """
 
-import os
-from datetime import datetime, timezone
-from urllib.parse import urljoin
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
 import argparse
 
-def create_sitemap(base_url="https://www.lusansapkota.com.np", output_file="static/sitemap.xml"):
-    """Generate a comprehensive sitemap for the portfolio website"""
+def create_sitemap(base_url="https://www.lusansapkota.com.np", output_file="static/sitemap.xml", files_url=None):
+    """Write the sitemap with the same generator that serves /sitemap.xml"""
+    from app import app
+    from sitemaps import sitemaps
     
-    # Create the root element
-    urlset = Element('urlset')
-    urlset.set('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-    urlset.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-    urlset.set('xsi:schemaLocation', 'http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd')
+    with app.app_context():
+        paths = sitemaps.write_files(output_file, base_url, files_url)
     
-    # Current timestamp
-    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
-    
-    # Define pages with their SEO properties
-    pages = [
-        {
-            'url': '/',
-            'priority': '1.0',
-            'changefreq': 'weekly',
-            'lastmod': now
-        },
-        {
-            'url': '/#about',
-            'priority': '0.9',
-            'changefreq': 'monthly',
-            'lastmod': now
-        },
-        {
-            'url': '/#skills',
-            'priority': '0.8',
-            'changefreq': 'monthly',
-            'lastmod': now
-        },
-        {
-            'url': '/#portfolio',
-            'priority': '0.9',
-            'changefreq': 'weekly',
-            'lastmod': now
-        },
-        {
-            'url': '/#services',
-            'priority': '0.8',
-            'changefreq': 'monthly',
-            'lastmod': now
-        },
-        {
-            'url': '/#testimonials',
-            'priority': '0.7',
-            'changefreq': 'monthly',
-            'lastmod': now
-        },
-        {
-            'url': '/#contact',
-            'priority': '0.8',
-            'changefreq': 'monthly',
-            'lastmod': now
-        },
-        {
-            'url': '/privacy',
-            'priority': '0.3',
-            'changefreq': 'yearly',
-            'lastmod': now
-        }
-    ]
-    
-    # Add subdomain pages
-    subdomains = [
-        {
-            'url': 'https://wiki.lusansapkota.com.np/',
-            'priority': '0.7',
-            'changefreq': 'weekly',
-            'lastmod': now
-        },
-        {
-            'url': 'https://git.lusansapkota.com.np/',
-            'priority': '0.6',
-            'changefreq': 'weekly',
-            'lastmod': now
-        },
-        {
-            'url': 'https://donation.lusansapkota.com.np/',
-            'priority': '0.5',
-            'changefreq': 'monthly',
-            'lastmod': now
-        }
-    ]
-    
-    # Create URL elements for main pages
-    for page in pages:
-        url_elem = SubElement(urlset, 'url')
-        
-        loc = SubElement(url_elem, 'loc')
-        loc.text = urljoin(base_url, page['url']) if not page['url'].startswith('http') else page['url']
-        
-        lastmod = SubElement(url_elem, 'lastmod')
-        lastmod.text = page['lastmod']
-        
-        changefreq = SubElement(url_elem, 'changefreq')
-        changefreq.text = page['changefreq']
-        
-        priority = SubElement(url_elem, 'priority')
-        priority.text = page['priority']
-    
-    # Add subdomain URLs
-    for page in subdomains:
-        url_elem = SubElement(urlset, 'url')
-        
-        loc = SubElement(url_elem, 'loc')
-        loc.text = page['url']
-        
-        lastmod = SubElement(url_elem, 'lastmod')
-        lastmod.text = page['lastmod']
-        
-        changefreq = SubElement(url_elem, 'changefreq')
-        changefreq.text = page['changefreq']
-        
-        priority = SubElement(url_elem, 'priority')
-        priority.text = page['priority']
-    
-    # Format the XML
-    rough_string = tostring(urlset, 'utf-8')
-    reparsed = minidom.parseString(rough_string)
-    pretty_xml = reparsed.toprettyxml(indent="  ")
-    
-    # Remove extra blank lines
-    pretty_xml = '\n'.join([line for line in pretty_xml.split('\n') if line.strip()])
-    
-    # Write to file
-    os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(pretty_xml)
-    
-    print(f"Sitemap generated successfully: {output_file}")
+    for path in paths:
+        print(f"Sitemap generated successfully: {path}")
     return output_file
 
 def create_robots_txt(base_url="https://www.lusansapkota.com.np", output_file="static/robots.txt"):
@@ -222,11 +95,12 @@ if __name__ == "__main__":
     parser.add_argument('--base-url', default='https://www.lusansapkota.com.np', help='Base URL for the website')
     parser.add_argument('--sitemap-output', default='static/sitemap.xml', help='Output path for sitemap')
     parser.add_argument('--robots-output', default='static/robots.txt', help='Output path for robots.txt')
+    parser.add_argument('--files-url', help='Public URL of the sitemap directory, used in a split sitemap index')
     
     args = parser.parse_args()
     
     # Generate sitemap and robots.txt
-    create_sitemap(args.base_url, args.sitemap_output)
+    create_sitemap(args.base_url, args.sitemap_output, args.files_url)
     create_robots_txt(args.base_url, args.robots_output)
     
     print("SEO files generated successfully!")
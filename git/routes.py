@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, request, redirect, url_for, curren
 from models import Project, ProjectCategory, SeoSettings, PersonalInfo
 from database import db
 from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from portfolio_snapshot import PortfolioSnapshot
+from conditional import conditional_get, table_state
 from . import git_bp
 
 # Helper function to get SEO settings
@@ -10,12 +13,28 @@ def get_git_seo_settings(page_name='git'):
     seo = SeoSettings.query.filter_by(page_name=page_name).first()
     return seo
 
+# Validators for conditional GET
+
+def projects_state():
+    projects = db.session.query(db.func.count(Project.id), db.func.max(Project.updated_at),
+                                db.func.max(Project.github_data_updated)).one()
+    categories = db.session.query(ProjectCategory.id, ProjectCategory.name).order_by(ProjectCategory.id).all()
+    return tuple(projects), [tuple(row) for row in categories]
+
+def project_state(project_id):
+    project = db.session.query(Project.updated_at, Project.github_data_updated, ProjectCategory.name) \
+        .outerjoin(ProjectCategory, Project.category_id == ProjectCategory.id) \
+        .filter(Project.id == project_id).first()
+    if project is None:
+        return None
+    return tuple(project), table_state(SeoSettings.updated_at), table_state(PersonalInfo.updated_at)
+
 @git_bp.route('/')
 def index():
     print(f"DEBUG: Accessing git blueprint index route. Attempting to render 'git/index.html'")
     
-    # Get SEO settings
-    seo = get_git_seo_settings('git')
+    # SEO, profile and categories with project counts in one snapshot
+    snapshot = PortfolioSnapshot.for_git('git')
     
     # Get filter parameters
     category_id = request.args.get('category', type=int)
@@ -23,26 +42,8 @@ def index():
     status = request.args.get('status')
     search_query = request.args.get('q', '')
     
-    # Update GitHub data in background for projects that need it (async approach)
-    # Only update a few projects per request to avoid blocking
-    projects_to_update = Project.query.filter(
-        Project.github_url.isnot(None)
-    ).limit(5).all()  # Get up to 5 projects that have GitHub URLs
-    
-    # Filter projects that actually need updates
-    projects_needing_update = [p for p in projects_to_update if p.should_update_github_data()]
-    
-    updated_any = False
-    for project in projects_needing_update[:3]:  # Limit to 3 updates per request
-        if project.fetch_github_data():
-            updated_any = True
-    
-    if updated_any:
-        try:
-            db.session.commit()
-        except Exception as e:
-            print(f"Error committing GitHub data updates: {e}")
-            db.session.rollback()
+    # GitHub stats are kept fresh by the background refresher
+    # (`flask update-github-data --daemon`); the page only reads stored values
     
     # Base query
     query = Project.query
@@ -67,8 +68,7 @@ def index():
         ))
     
     # Order by featured first, then by creation date
-    projects = query.order_by(Project.is_featured.desc(), Project.created_at.desc()).all()
-    categories = ProjectCategory.query.all()
+    projects = query.options(joinedload(Project.category)).order_by(Project.is_featured.desc(), Project.created_at.desc()).all()
     
     template_name_to_render = 'git/index.html'
     jinja_env = current_app.jinja_env
@@ -78,18 +78,16 @@ def index():
     except Exception as e:
         print(f"DEBUG: Error getting template '{template_name_to_render}' from Jinja2 env: {e}")
     
-    # Get CMS data
-    personal = PersonalInfo.query.first()
-    
     return render_template(template_name_to_render, 
                          projects=projects, 
-                         categories=categories,
+                         categories=snapshot.project_categories,
+                         category_counts=snapshot.category_counts,
                          current_category=category_id,
                          current_type=project_type,
                          current_status=status,
                          search_query=search_query,
-                         seo=seo,
-                         personal=personal)
+                         seo=snapshot.seo,
+                         personal=snapshot.personal)
 
 @git_bp.route('/search')
 def search():
@@ -111,6 +109,7 @@ def search():
     return render_template('git/search.html', projects=projects, query=query, seo=seo, personal=personal)
 
 @git_bp.route('/api/projects')
+@conditional_get.validate(projects_state, policy='api')
 def api_projects():
     """API endpoint for dynamic project filtering"""
     category_id = request.args.get('category', type=int)
@@ -159,6 +158,7 @@ def api_projects():
     } for p in projects])
 
 @git_bp.route('/project/<int:project_id>')
+@conditional_get.validate(project_state)
 def project(project_id):
     project = Project.query.get_or_404(project_id)
     
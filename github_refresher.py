@@ -0,0 +1,169 @@
+"""
+GitHub Refresher
+Background owner of all Project GitHub updates, so page requests only read from the database
+"""
+
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database import db
+from models import Project
+
+
+class GitHubRefresher:
+    def __init__(self, batch_size=10, interval=1800, bulk=False):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.bulk = bulk
+        self._stop = threading.Event()
+
+    def due_projects(self, force=False, limit=None):
+        """Projects with a GitHub URL whose data is stale (see Project.should_update_github_data)"""
+        query = Project.query.filter(Project.github_url.isnot(None), Project.github_url != '')
+        if not force:
+            # Pre-filter in SQL; should_update_github_data() stays the source of truth
+            cutoff = datetime.utcnow() - timedelta(hours=24)
+            query = query.filter(db.or_(Project.github_data_updated.is_(None),
+                                        Project.github_data_updated < cutoff))
+        query = query.order_by(Project.github_data_updated.asc().nullsfirst(), Project.id)
+        if limit:
+            query = query.limit(limit)
+        return [project for project in query.all() if force or project.should_update_github_data()]
+
+    def refresh(self, force=False, limit=None, log=print):
+        """Refresh every due project, committing every ``batch_size`` projects"""
+        stats = {'updated': 0, 'failed': 0, 'invalid': 0, 'batches': 0}
+        pending = 0
+
+        for project in self.due_projects(force=force, limit=limit):
+            if self._stop.is_set():
+                break
+
+            username, repo = project.extract_github_repo()
+            if not username or not repo:
+                log(f'✗ Invalid GitHub URL: {project.title} - {project.github_url}')
+                stats['invalid'] += 1
+                continue
+
+            if project.fetch_github_data():
+                stats['updated'] += 1
+                log(f'✓ Updated: {project.title} (stars: {project.stars}, forks: {project.forks})')
+            else:
+                # fetch_github_data() stamps github_data_updated when GitHub has no
+                # data, so missing repositories wait a full day before the next try
+                stats['failed'] += 1
+                log(f'✗ Failed: {project.title}')
+
+            pending += 1
+            if pending >= self.batch_size:
+                self._commit(stats, log)
+                pending = 0
+
+        if pending:
+            self._commit(stats, log)
+        return stats
+
+    def refresh_bulk(self, force=False, limit=None, log=print):
+        """
+        Refresh every due project from one batched GitHub fetch (GraphQL,
+        chunked) and write all rows with a single bulk UPDATE.
+        """
+        from sqlalchemy import update
+        from github_service import github_service
+
+        stats = {'updated': 0, 'failed': 0, 'invalid': 0, 'batches': 0}
+        projects = {}
+        for project in self.due_projects(force=force, limit=limit):
+            username, repo = project.extract_github_repo()
+            if not username or not repo:
+                log(f'✗ Invalid GitHub URL: {project.title} - {project.github_url}')
+                stats['invalid'] += 1
+                continue
+            projects.setdefault((username, repo), []).append(project)
+
+        if not projects:
+            return stats
+
+        results = github_service.get_repositories_bulk(list(projects), force_refresh=force)
+
+        rows = []
+        now = datetime.utcnow()
+        for key, repo_projects in projects.items():
+            if key not in results:
+                # Transient failure; leave the project due for the next cycle
+                for project in repo_projects:
+                    stats['failed'] += 1
+                    log(f'✗ Failed: {project.title}')
+                continue
+            github_data = results[key]
+            for project in repo_projects:
+                if github_data:
+                    values = project.github_update_values(github_data)
+                    stats['updated'] += 1
+                    log(f'✓ Updated: {project.title} (stars: {values["stars"]}, forks: {values["forks"]})')
+                else:
+                    values = {'github_data_updated': now}
+                    stats['failed'] += 1
+                    log(f'✗ Not found: {project.title}')
+                rows.append((project, values))
+
+        if not rows:
+            return stats
+
+        # Same column set for every row so the UPDATE runs as one executemany
+        columns = set().union(*(values for _, values in rows))
+        params = [
+            {'id': project.id, **{column: values.get(column, getattr(project, column)) for column in columns}}
+            for project, values in rows
+        ]
+        try:
+            db.session.execute(update(Project), params)
+            db.session.commit()
+            stats['batches'] += 1
+        except Exception as e:
+            log(f'Error writing GitHub updates: {e}')
+            db.session.rollback()
+            return stats
+
+        # Bulk UPDATE bypasses the flush events the page cache listens to
+        from page_cache import page_cache
+        page_cache.bump_version()
+        return stats
+
+    def _commit(self, stats, log):
+        try:
+            db.session.commit()
+            stats['batches'] += 1
+        except Exception as e:
+            log(f'Error committing GitHub updates: {e}')
+            db.session.rollback()
+
+    def run_forever(self, log=print):
+        """Refresh on a fixed interval until SIGINT/SIGTERM"""
+        self._stop.clear()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self.stop())
+
+        log(f'GitHub refresher started (every {self.interval}s, batches of {self.batch_size})')
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                stats = self.refresh_bulk(log=log) if self.bulk else self.refresh(log=log)
+                log(f'GitHub refresh cycle: {stats} in {time.monotonic() - started:.1f}s')
+            except Exception as e:
+                log(f'GitHub refresh cycle failed: {e}')
+                db.session.rollback()
+            finally:
+                # Release the connection while sleeping
+                db.session.remove()
+            self._stop.wait(self.interval)
+        log('GitHub refresher stopped')
+
+    def stop(self):
+        self._stop.set()
+
+
+# Global instance
+github_refresher = GitHubRefresher()
@@ -12,10 +12,15 @@ from flask_caching import Cache
 import json
 import hashlib
 
+from http_client import http_client
+
 class GitHubService:
     def __init__(self):
         self.cache = None
-        self.base_url = "https://api.github.com"
+        self.base_url = os.getenv('GITHUB_API_URL', "https://api.github.com").rstrip('/')
+        self.graphql_url = os.getenv('GITHUB_GRAPHQL_URL', f"{self.base_url}/graphql")
+        # Repositories per GraphQL request; each costs a handful of nodes, well under the 500k node limit
+        self.graphql_chunk_size = int(os.getenv('GITHUB_GRAPHQL_CHUNK_SIZE', '50'))
         self.headers = {
             'Accept': 'application/vnd.github.v3+json',
             'User-Agent': 'Portfolio-Website-v1.0'
@@ -26,6 +31,9 @@ class GitHubService:
         if github_token:
             self.headers['Authorization'] = f'token {github_token}'
         
+        # Conditional request outcomes in this process: 200 / 304 / error
+        self.request_stats = {'full': 0, 'not_modified': 0, 'error': 0}
+        
         # Mock data mode for development
         self.mock_mode = os.getenv('GITHUB_MOCK_MODE', 'False').lower() == 'true'
         
@@ -221,12 +229,38 @@ class GitHubService:
         return None
     
     def _fetch_from_api(self, username, repo, cache_key, error_cache_key):
-        """Fetch data from GitHub API"""
+        """Fetch data from GitHub API, revalidating the stored payload when one exists"""
         api_url = f"{self.base_url}/repos/{username}/{repo}"
+        full_name = f"{username}/{repo}"
+        
+        # Conditional request: 304 responses do not count against the rate limit
+        stored = self._load_validators(full_name)
+        headers = self.headers
+        if stored and stored['payload']:
+            headers = dict(self.headers)
+            if stored['etag']:
+                headers['If-None-Match'] = stored['etag']
+            if stored['last_modified']:
+                headers['If-Modified-Since'] = stored['last_modified']
         
         try:
             print(f"Fetching GitHub data for {username}/{repo}")
-            response = requests.get(api_url, headers=self.headers, timeout=10)
+            response = http_client.get(api_url, headers=headers, timeout=10)
+            
+            if response.status_code == 304 and stored and stored['payload']:
+                processed_data = json.loads(stored['payload'])
+                processed_data['cached_at'] = datetime.utcnow().isoformat()
+                processed_data['api_rate_limit_remaining'] = response.headers.get('X-RateLimit-Remaining')
+                processed_data['api_rate_limit_reset'] = response.headers.get('X-RateLimit-Reset')
+                
+                # Unchanged upstream: just extend freshness
+                if self.cache:
+                    self.cache.set(cache_key, processed_data, timeout=7200)
+                    self.cache.delete(error_cache_key)
+                self._record_response(full_name, 'not_modified')
+                
+                print(f"Revalidated cached data for {username}/{repo} (304)")
+                return processed_data
             
             if response.status_code == 200:
                 data = response.json()
@@ -263,6 +297,7 @@ class GitHubService:
                     self.cache.set(cache_key, processed_data, timeout=7200)
                     # Clear any error cache
                     self.cache.delete(error_cache_key)
+                self._record_response(full_name, 'full', response, processed_data)
                 
                 print(f"Successfully fetched and cached data for {username}/{repo}")
                 return processed_data
@@ -278,6 +313,7 @@ class GitHubService:
                         'cached_at': datetime.utcnow().isoformat()
                     }
                     self.cache.set(error_cache_key, error_data, timeout=21600)  # 6 hours
+                self._record_response(full_name, 'error')
                 return None
                 
             elif response.status_code == 403:
@@ -292,6 +328,7 @@ class GitHubService:
                         'rate_limit_reset': response.headers.get('X-RateLimit-Reset')
                     }
                     self.cache.set(error_cache_key, error_data, timeout=3600)  # 1 hour
+                self._record_response(full_name, 'error')
                 return None
                 
             else:
@@ -305,6 +342,7 @@ class GitHubService:
                         'cached_at': datetime.utcnow().isoformat()
                     }
                     self.cache.set(error_cache_key, error_data, timeout=1800)  # 30 minutes
+                self._record_response(full_name, 'error')
                 return None
                 
         except requests.exceptions.Timeout:
@@ -317,6 +355,7 @@ class GitHubService:
                     'cached_at': datetime.utcnow().isoformat()
                 }
                 self.cache.set(error_cache_key, error_data, timeout=900)  # 15 minutes
+            self._record_response(full_name, 'error')
             return None
             
         except Exception as e:
@@ -329,12 +368,299 @@ class GitHubService:
                     'cached_at': datetime.utcnow().isoformat()
                 }
                 self.cache.set(error_cache_key, error_data, timeout=900)  # 15 minutes
+            self._record_response(full_name, 'error')
             return None
     
+    # Persistent validators
+
+    def _load_validators(self, full_name):
+        """Stored ETag/Last-Modified and payload for a repository, or None"""
+        try:
+            from database import db
+            from models import GitHubRepoCache
+            
+            table = GitHubRepoCache.__table__
+            with db.engine.connect() as connection:
+                row = connection.execute(
+                    table.select().where(table.c.full_name == full_name)
+                ).mappings().first()
+            return dict(row) if row else None
+        except Exception as e:
+            print(f"Error loading GitHub validators for {full_name}: {e}")
+            return None
+
+    def _record_response(self, full_name, outcome, response=None, payload=None):
+        """
+        Count a 200 ('full'), 304 ('not_modified') or 'error' outcome and, for
+        200s, store the new validators and payload. Uses its own connection so
+        the caller's session is never committed as a side effect.
+        """
+        self.request_stats[outcome] += 1
+        try:
+            from database import db
+            from models import GitHubRepoCache
+            
+            table = GitHubRepoCache.__table__
+            counter = table.c[f'{outcome}_responses']
+            now = datetime.utcnow()
+            values = {counter.name: counter + 1}
+            if outcome != 'error':
+                values['validated_at'] = now
+            if outcome == 'full':
+                values.update(
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                    payload=json.dumps(payload),
+                    fetched_at=now,
+                )
+            
+            with db.engine.begin() as connection:
+                result = connection.execute(
+                    table.update().where(table.c.full_name == full_name).values(**values)
+                )
+                if result.rowcount == 0:
+                    values[counter.name] = 1
+                    connection.execute(table.insert().values(
+                        full_name=full_name,
+                        **{name: 0 for name in ('full_responses', 'not_modified_responses', 'error_responses')
+                           if name != counter.name},
+                        **values
+                    ))
+        except Exception as e:
+            print(f"Error storing GitHub validators for {full_name}: {e}")
+
+    def get_request_stats(self):
+        """Counts of 200 / 304 / error responses: this process and all-time totals"""
+        stats = {'process': dict(self.request_stats)}
+        try:
+            from database import db
+            from models import GitHubRepoCache
+            from sqlalchemy import func, select
+            
+            table = GitHubRepoCache.__table__
+            with db.engine.connect() as connection:
+                full, not_modified, errors, repos = connection.execute(select(
+                    func.coalesce(func.sum(table.c.full_responses), 0),
+                    func.coalesce(func.sum(table.c.not_modified_responses), 0),
+                    func.coalesce(func.sum(table.c.error_responses), 0),
+                    func.count(),
+                )).one()
+            revalidations = full + not_modified
+            stats['total'] = {
+                'full': full,
+                'not_modified': not_modified,
+                'error': errors,
+                'repositories': repos,
+                # Share of REST fetches answered by a free 304
+                'not_modified_ratio': round(not_modified / revalidations, 3) if revalidations else 0.0,
+            }
+        except Exception as e:
+            print(f"Error reading GitHub request stats: {e}")
+        return stats
+
+    # Bulk GraphQL fetch
+
+    GRAPHQL_REPOSITORY_FIELDS = """
+        name
+        nameWithOwner
+        description
+        url
+        sshUrl
+        homepageUrl
+        stargazerCount
+        forkCount
+        watchers { totalCount }
+        diskUsage
+        primaryLanguage { name }
+        repositoryTopics(first: 20) { nodes { topic { name } } }
+        licenseInfo { name }
+        createdAt
+        updatedAt
+        pushedAt
+        isPrivate
+        isFork
+        defaultBranchRef { name }
+    """
+
+    def get_repositories_bulk(self, repos, force_refresh=False):
+        """
+        Get data for many repositories with one GraphQL request per chunk.
+
+        Args:
+            repos (iterable): (username, repo) pairs
+            force_refresh (bool): Ignore cached data and cached errors
+
+        Returns:
+            dict: (username, repo) -> repository data, or None when the repository
+            is invalid or not found. Pairs that could not be fetched because of a
+            transport or API failure are left out so callers can retry them later.
+        """
+        results = {}
+        # GraphQL source repository -> requested repositories it answers (demo mapping)
+        sources = {}
+
+        for username, repo in dict.fromkeys(repos):
+            key = (username, repo)
+            if not self._is_valid_repo_format(username, repo):
+                results[key] = None
+                continue
+            if self.mock_mode:
+                results[key] = self.get_repository_data(username, repo)
+                continue
+            if not force_refresh and self.cache:
+                if self.cache.get(self._get_error_cache_key(username, repo)):
+                    results[key] = None
+                    continue
+                cached_data = self.cache.get(self._get_cache_key(username, repo))
+                if cached_data:
+                    results[key] = cached_data
+                    continue
+            demo = self.demo_repos.get(f"{username}/{repo}")
+            source = tuple(demo.split('/', 1)) if demo else key
+            sources.setdefault(source, []).append(key)
+
+        if not sources:
+            return results
+
+        if 'Authorization' not in self.headers:
+            # The GraphQL API requires a token; fall back to one REST call per repository
+            print("GitHub Service: no GITHUB_TOKEN, bulk fetch falling back to REST")
+            for targets in sources.values():
+                for username, repo in targets:
+                    results[(username, repo)] = self.get_repository_data(username, repo, force_refresh)
+            return results
+
+        source_list = list(sources)
+        for start in range(0, len(source_list), self.graphql_chunk_size):
+            chunk = source_list[start:start + self.graphql_chunk_size]
+            for source, data in self._fetch_graphql_chunk(chunk).items():
+                for username, repo in sources[source]:
+                    results[(username, repo)] = self._store_bulk_result(username, repo, source, data)
+
+        return results
+
+    def _fetch_graphql_chunk(self, chunk):
+        """
+        Fetch one chunk of repositories. Returns {source: data or None};
+        repositories missing from the result failed transiently.
+        """
+        variables = {}
+        selections = []
+        for index, (owner, name) in enumerate(chunk):
+            variables[f'o{index}'] = owner
+            variables[f'n{index}'] = name
+            selections.append(f'r{index}: repository(owner: $o{index}, name: $n{index}) {{ ...RepositoryFields }}')
+
+        params = ', '.join(f'$o{index}: String!, $n{index}: String!' for index in range(len(chunk)))
+        query = (
+            f"query({params}) {{\n  rateLimit {{ cost remaining resetAt }}\n  "
+            + '\n  '.join(selections)
+            + f"\n}}\nfragment RepositoryFields on Repository {{{self.GRAPHQL_REPOSITORY_FIELDS}}}"
+        )
+
+        try:
+            print(f"Fetching GitHub data for {len(chunk)} repositories via GraphQL")
+            # A read-only query, so retrying the POST is safe
+            response = http_client.post(self.graphql_url, json={'query': query, 'variables': variables},
+                                        headers=self.headers, timeout=30, retries=http_client.max_retries)
+            if response.status_code != 200:
+                print(f"GitHub GraphQL error: {response.status_code}")
+                return {}
+            payload = response.json()
+        except Exception as e:
+            print(f"Error fetching GitHub GraphQL data: {e}")
+            return {}
+
+        data = payload.get('data') or {}
+        not_found = {
+            error['path'][0]
+            for error in payload.get('errors') or []
+            if error.get('type') == 'NOT_FOUND' and error.get('path')
+        }
+        rate_limit = data.get('rateLimit') or {}
+
+        results = {}
+        for index, source in enumerate(chunk):
+            alias = f'r{index}'
+            node = data.get(alias)
+            if node:
+                results[source] = self._process_graphql_node(node, rate_limit)
+            elif alias in not_found:
+                results[source] = None
+        return results
+
+    def _process_graphql_node(self, node, rate_limit):
+        """Map a GraphQL Repository node onto the REST-shaped payload used everywhere else"""
+        reset = rate_limit.get('resetAt')
+        if reset:
+            try:
+                reset = str(int(datetime.fromisoformat(reset.replace('Z', '+00:00')).timestamp()))
+            except ValueError:
+                reset = None
+        return {
+            'name': node.get('name'),
+            'full_name': node.get('nameWithOwner'),
+            'description': node.get('description'),
+            'html_url': node.get('url'),
+            'clone_url': f"{node.get('url')}.git",
+            'ssh_url': node.get('sshUrl'),
+            'stargazers_count': node.get('stargazerCount', 0),
+            'forks_count': node.get('forkCount', 0),
+            'watchers_count': (node.get('watchers') or {}).get('totalCount', 0),
+            'size': node.get('diskUsage') or 0,
+            'language': (node.get('primaryLanguage') or {}).get('name'),
+            'topics': [
+                topic_node['topic']['name']
+                for topic_node in (node.get('repositoryTopics') or {}).get('nodes', [])
+            ],
+            'created_at': node.get('createdAt'),
+            'updated_at': node.get('updatedAt'),
+            'pushed_at': node.get('pushedAt'),
+            'is_private': node.get('isPrivate', False),
+            'is_fork': node.get('isFork', False),
+            'default_branch': (node.get('defaultBranchRef') or {}).get('name', 'main'),
+            'license': (node.get('licenseInfo') or {}).get('name'),
+            'homepage': node.get('homepageUrl'),
+            'cached_at': datetime.utcnow().isoformat(),
+            'api_rate_limit_remaining': str(rate_limit['remaining']) if 'remaining' in rate_limit else None,
+            'api_rate_limit_reset': reset
+        }
+
+    def _store_bulk_result(self, username, repo, source, data):
+        """Cache a bulk result under the requested repository's keys"""
+        cache_key = self._get_cache_key(username, repo)
+        error_cache_key = self._get_error_cache_key(username, repo)
+
+        if data is None:
+            print(f"Repository {source[0]}/{source[1]} not found (GraphQL)")
+            if self.cache:
+                self.cache.set(error_cache_key, {
+                    'error': 'not_found',
+                    'status_code': 404,
+                    'message': 'Repository not found',
+                    'cached_at': datetime.utcnow().isoformat()
+                }, timeout=21600)  # 6 hours
+            return None
+
+        if source != (username, repo):
+            data = data.copy()
+            data['name'] = repo
+            data['full_name'] = f"{username}/{repo}"
+            data['html_url'] = f"https://github.com/{username}/{repo}"
+            data['clone_url'] = f"https://github.com/{username}/{repo}.git"
+            data['ssh_url'] = f"git@github.com:{username}/{repo}.git"
+            data['demo_data'] = True
+            data['demo_source'] = f"{source[0]}/{source[1]}"
+
+        if self.cache:
+            self.cache.set(cache_key, data, timeout=7200)
+            self.cache.delete(error_cache_key)
+        return data
+
     def get_rate_limit_info(self):
         """Get current rate limit information"""
         try:
-            response = requests.get(f"{self.base_url}/rate_limit", headers=self.headers, timeout=5)
+            response = http_client.get(f"{self.base_url}/rate_limit", headers=self.headers, timeout=5)
             if response.status_code == 200:
                 return response.json()
         except Exception as e:
@@ -364,7 +690,8 @@ class GitHubService:
         # This is a basic implementation, Redis cache might have more detailed stats
         return {
             'cache_enabled': True,
-            'cache_type': type(self.cache.cache).__name__ if hasattr(self.cache, 'cache') else 'Unknown'
+            'cache_type': type(self.cache.cache).__name__ if hasattr(self.cache, 'cache') else 'Unknown',
+            'requests': self.get_request_stats()
         }
 
 # Global instance
@@ -0,0 +1,205 @@
+"""
+HTTP Client
+Shared outbound HTTP session with per-host connection pools, keep-alive,
+bounded retries and per-host latency metrics
+"""
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+class HttpClient:
+    """
+    Thin wrapper over one ``requests.Session``.
+
+    urllib3 keeps a pool of keep-alive connections per host, so repeated calls
+    to the same API skip the TCP and TLS handshakes. Retries are done here
+    rather than in urllib3 so the delay can follow ``Retry-After`` and
+    GitHub's ``X-RateLimit-Reset``, and so every attempt is counted.
+    """
+
+    def __init__(self):
+        self.connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+        self.read_timeout = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+        self.max_retries = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+        self.backoff_factor = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+        # Longest server-requested wait we will sleep through; longer waits return the response
+        self.backoff_max = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
+        self.pool_connections = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+        self.pool_maxsize = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def reset(self):
+        """Close pooled connections (e.g. after fork, or to pick up new settings)"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+    # Requests
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, timeout=None, retries=None, **kwargs):
+        """
+        Send a request through the pooled session.
+
+        ``timeout`` defaults to (connect, read) from the environment.
+        ``retries`` defaults to ``HTTP_MAX_RETRIES`` for idempotent methods and
+        0 otherwise; pass it explicitly for safe POSTs such as GraphQL queries.
+        The last response is returned even if its status is retryable; the last
+        exception is re-raised when every attempt failed to connect or timed out.
+        """
+        method = method.upper()
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        if retries is None:
+            retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        host = urlsplit(url).netloc
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._record(host, time.perf_counter() - started, error=True)
+                if attempt >= retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                self._record(host, time.perf_counter() - started, status=response.status_code)
+                delay = self._retry_delay(response, attempt) if attempt < retries else None
+                if delay is None:
+                    return response
+                response.close()
+
+            attempt += 1
+            self._record_retry(host)
+            time.sleep(delay)
+
+    # Backoff
+
+    def _backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying ``response``, or None to return it as is"""
+        headers = response.headers
+        # GitHub signals an exhausted primary rate limit with 403 (or 429) and Remaining: 0
+        rate_limited = headers.get('X-RateLimit-Remaining') == '0' and response.status_code in (403, 429)
+        if response.status_code not in RETRY_STATUSES and not rate_limited:
+            return None
+
+        requested = _parse_retry_after(headers.get('Retry-After'))
+        if requested is None and rate_limited:
+            try:
+                requested = max(0.0, float(headers.get('X-RateLimit-Reset')) - time.time())
+            except (TypeError, ValueError):
+                requested = None
+
+        if requested is None:
+            return self._backoff(attempt)
+        if requested > self.backoff_max:
+            # Not worth blocking on; let the caller handle the error response
+            return None
+        # Small jitter so concurrent callers do not return at the same instant
+        return requested + random.uniform(0, self.backoff_factor)
+
+    # Metrics
+
+    def _host_stats(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats.setdefault(host, {
+                'requests': 0, 'errors': 0, 'retries': 0, 'statuses': {},
+                'total_time': 0.0, 'max_time': 0.0,
+            })
+        return stats
+
+    def _record(self, host, elapsed, status=None, error=False):
+        with self._stats_lock:
+            stats = self._host_stats(host)
+            stats['requests'] += 1
+            stats['total_time'] += elapsed
+            stats['max_time'] = max(stats['max_time'], elapsed)
+            if error:
+                stats['errors'] += 1
+            else:
+                stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+
+    def _record_retry(self, host):
+        with self._stats_lock:
+            self._host_stats(host)['retries'] += 1
+
+    def get_stats(self):
+        """Per-host request counts and latency for this process"""
+        with self._stats_lock:
+            result = {}
+            for host, stats in self._stats.items():
+                result[host] = {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'statuses': {str(status): count for status, count in stats['statuses'].items()},
+                    'avg_ms': round(stats['total_time'] * 1000 / stats['requests'], 2) if stats['requests'] else 0,
+                    'max_ms': round(stats['max_time'] * 1000, 2),
+                }
+            return result
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+
+def _parse_retry_after(value):
+    """Retry-After as seconds; it may be delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+# Global instance
+http_client = HttpClient()
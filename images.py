@@ -0,0 +1,289 @@
+"""
+Responsive Images
+Generates width variants of static images (WebP plus an optimized PNG or
+JPEG fallback) under static/variants/<source hash>/, so an unchanged image is
+never processed twice and a changed one gets new URLs. Templates render them
+through the ``responsive_image`` macro in components/responsive_image.html
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from urllib.parse import urlsplit
+
+from flask import has_request_context, request, url_for
+
+from assets import HASHED_NAME, IMMUTABLE_CACHE_CONTROL, assets
+from models import Project, DonationProject
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Without Pillow, templates fall back to the original image
+    Image = ImageOps = None
+
+VARIANT_DIR = 'variants'
+INDEX_NAME = 'index.json'
+META_NAME = 'meta.json'
+WIDTHS = (320, 640, 960, 1280, 1920)
+# Static-folder directories scanned by a full build, besides project images
+SOURCE_DIRS = ('assets/images',)
+SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+# Seconds between checks for an index rewritten by another process
+INDEX_CHECK_INTERVAL = 5
+
+
+class ImageVariants:
+    def __init__(self, widths=WIDTHS):
+        self.widths = widths
+        self.static_folder = None
+        self.static_url_path = '/static'
+        self.server_name = None
+        self.index = {}           # {static path: {hash, widths, format, width, height}}
+        self._index_mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.static_url_path = app.static_url_path.rstrip('/')
+        self.server_name = app.config.get('SERVER_NAME')
+        app.add_template_global(self.responsive, 'responsive_image_data')
+        app.after_request(self._cache_headers)
+        app.extensions['images'] = self
+
+    @property
+    def root(self):
+        return os.path.join(self.static_folder, VARIANT_DIR)
+
+    # Index
+
+    def _index_path(self):
+        return os.path.join(self.root, INDEX_NAME)
+
+    def _read_index(self):
+        try:
+            with open(self._index_path(), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        temporary = f'{self._index_path()}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(temporary, self._index_path())
+        self._checked_at = 0
+
+    def _refresh_index(self):
+        """Pick up an index written by the CLI or the task worker"""
+        now = time.monotonic()
+        if self._checked_at and now - self._checked_at < INDEX_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self._index_path())
+        except OSError:
+            mtime = None
+        if mtime != self._index_mtime:
+            self.index, self._index_mtime = self._read_index(), mtime
+
+    def version(self):
+        """Changes whenever the index does, for validators of pages that embed variant URLs"""
+        self._refresh_index()
+        return self._index_mtime
+
+    # Templates
+
+    def _local_host(self, netloc):
+        host = netloc.split(':')[0]
+        if self.server_name:
+            server = self.server_name.split(':')[0]
+            if host == server or host.endswith('.' + server):
+                return True
+        return has_request_context() and netloc == request.host
+
+    def static_path(self, src):
+        """
+        Static-folder path for an image given as a static path, a /static URL
+        or an absolute URL on this site; None for anything hosted elsewhere
+        """
+        if not src:
+            return None
+        parts = urlsplit(src)
+        if parts.netloc and not self._local_host(parts.netloc):
+            return None
+        path = parts.path
+        if path.startswith(self.static_url_path + '/'):
+            path = path[len(self.static_url_path) + 1:]
+        elif parts.scheme or parts.netloc or path.startswith('/'):
+            return None
+        # Fingerprinted URLs from asset_url() map back to their source
+        stem, extension = os.path.splitext(path)
+        return HASHED_NAME.sub('', stem) + extension
+
+    def responsive(self, src):
+        """
+        Data for the responsive_image macro: ``src`` always, plus ``webp`` and
+        ``fallback`` srcsets and intrinsic ``width``/``height`` when variants exist
+        """
+        path = self.static_path(src)
+        entry = None
+        if path is not None:
+            self._refresh_index()
+            entry = self.index.get(path)
+        if entry is None:
+            # A bare static path still needs turning into a URL
+            relative = path is not None and not urlsplit(src).path.startswith('/')
+            return {'src': assets.asset_url(path) if relative else src}
+
+        def variant(width, extension):
+            return url_for('static', filename=f"{VARIANT_DIR}/{entry['hash']}/{width}.{extension}")
+
+        def srcset(extension):
+            return ', '.join(f'{variant(width, extension)} {width}w' for width in entry['widths'])
+
+        return {
+            'src': variant(entry['widths'][-1], entry['format']),
+            'webp': srcset('webp'),
+            'fallback': srcset(entry['format']),
+            'width': entry['width'],
+            'height': entry['height'],
+        }
+
+    # Serving
+
+    def _cache_headers(self, response):
+        # Variant URLs contain the source hash, so their content never changes
+        if response.status_code in (200, 304) and request.endpoint == 'static':
+            filename = (request.view_args or {}).get('filename', '')
+            if filename.startswith(VARIANT_DIR + '/') and not filename.endswith(INDEX_NAME):
+                response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+                response.expires = None
+        return response
+
+    # Generation
+
+    @staticmethod
+    def _require_pillow():
+        if Image is None:
+            raise RuntimeError('Pillow is required to generate image variants (pip install Pillow)')
+
+    def sources(self):
+        """Static-folder paths of every image a full build covers"""
+        paths = set()
+        for directory in SOURCE_DIRS:
+            for folder, _, names in os.walk(os.path.join(self.static_folder, directory)):
+                for name in names:
+                    stem, extension = os.path.splitext(name)
+                    if extension.lower() in SOURCE_EXTENSIONS and not HASHED_NAME.search(stem):
+                        paths.add(os.path.relpath(os.path.join(folder, name), self.static_folder).replace(os.sep, '/'))
+        for model in (Project, DonationProject):
+            for (image_url,) in model.query.with_entities(model.image_url).filter(model.image_url.isnot(None)):
+                path = self.static_path(image_url)
+                if path and os.path.splitext(path)[1].lower() in SOURCE_EXTENSIONS:
+                    paths.add(path)
+        return sorted(paths)
+
+    def _source_file(self, path):
+        source = os.path.realpath(os.path.join(self.static_folder, path))
+        if not source.startswith(os.path.realpath(self.static_folder) + os.sep):
+            raise ValueError('outside the static folder')
+        return source
+
+    def generate(self, path, force=False):
+        """(index entry, created) for one static image; existing variants of the same content are reused"""
+        self._require_pillow()
+        with open(self._source_file(path), 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        target = os.path.join(self.root, digest)
+        meta_path = os.path.join(target, META_NAME)
+        if not force and os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                return dict(json.load(f), hash=digest), False
+        return dict(self._render(content, target), hash=digest), True
+
+    def _render(self, content, target):
+        with Image.open(io.BytesIO(content)) as opened:
+            image = ImageOps.exif_transpose(opened)
+            alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+            if alpha:
+                # Fully opaque RGBA images are photos in disguise; JPEG suits them better
+                image = image.convert('RGBA')
+                alpha = image.getchannel('A').getextrema()[0] < 255
+            image = image.convert('RGBA' if alpha else 'RGB')
+            extension = 'png' if alpha else 'jpg'
+            widths = sorted({width for width in self.widths if width < image.width} |
+                            {min(image.width, self.widths[-1])})
+
+            # Written beside the target and renamed, so readers never see a partial set
+            temporary = f'{target}.{os.getpid()}.tmp'
+            shutil.rmtree(temporary, ignore_errors=True)
+            os.makedirs(temporary)
+            for width in widths:
+                height = round(image.height * width / image.width)
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                resized.save(os.path.join(temporary, f'{width}.webp'), 'WEBP', quality=WEBP_QUALITY, method=6)
+                if alpha:
+                    resized.save(os.path.join(temporary, f'{width}.png'), 'PNG', optimize=True)
+                else:
+                    resized.save(os.path.join(temporary, f'{width}.jpg'), 'JPEG', quality=JPEG_QUALITY,
+                                 optimize=True, progressive=True)
+
+        meta = {'widths': widths, 'format': extension, 'width': widths[-1],
+                'height': round(image.height * widths[-1] / image.width)}
+        with open(os.path.join(temporary, META_NAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.replace(temporary, target)
+        except OSError:
+            # Another process produced the same variants first
+            shutil.rmtree(temporary, ignore_errors=True)
+        return meta
+
+    def build(self, paths=None, force=False, log=print):
+        """
+        Generate variants for ``paths`` (static-folder paths), or for every
+        source image and project image when None. A full build also removes
+        variant sets no image refers to any more.
+        """
+        self._require_pillow()
+        full = paths is None
+        with self._lock:
+            index = {} if full else self._read_index()
+            created = reused = failed = 0
+            for path in (self.sources() if full else paths):
+                try:
+                    entry, new = self.generate(path, force=force)
+                except (OSError, ValueError) as e:
+                    log(f'  ✗ {path}: {e}')
+                    failed += 1
+                    continue
+                index[path] = entry
+                if new:
+                    created += 1
+                    log(f"  ✓ {path}: {len(entry['widths'])} widths as WebP + {entry['format'].upper()}")
+                else:
+                    reused += 1
+
+            removed = 0
+            if full and os.path.isdir(self.root):
+                current = {entry['hash'] for entry in index.values()}
+                for name in os.listdir(self.root):
+                    if os.path.isdir(os.path.join(self.root, name)) and name not in current:
+                        shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                        removed += 1
+            self._write_index(index)
+        return {'images': len(index), 'created': created, 'reused': reused, 'failed': failed, 'removed': removed}
+
+
+# Global instance
+images = ImageVariants()
@@ -0,0 +1,307 @@
+"""
+IP Intelligence
+Classifies addresses with the ipaddress module and resolves locations from a
+local range database (built from a CSV by ``flask build-geoip-db``), memory
+mapped and binary searched, with an LRU cache in front. No network calls
+"""
+
+import array
+import bisect
+import csv
+import ipaddress
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join('instance', 'geoip.bin')
+
+# File layout: header, then for IPv4 and IPv6 in turn the column of range
+# starts, the column of range ends and the column of location offsets,
+# then the location blob. Ranges are sorted by start and do not overlap, so
+# a lookup is one bisect over the starts column. IPv4 columns are
+# little-endian uint32; IPv6 starts and ends are 16-byte big-endian so they
+# compare as bytes. Locations are length-prefixed JSON.
+MAGIC = b'PFGEOIP2'
+HEADER = struct.Struct('<8sQQQ')    # magic, v4 count, v6 count, blob offset
+V4_WIDTH, V6_WIDTH, OFFSET_WIDTH = 4, 16, 4
+LOCATION_LENGTH = struct.Struct('<H')
+LOCATION_FIELDS = ('country', 'region', 'city', 'timezone', 'isp', 'org', 'lat', 'lon')
+
+# Non-global ranges reported as private networks; anything else that is not
+# globally routable (documentation, benchmarking, 240/4, ...) is "reserved"
+PRIVATE_NETWORKS = tuple(ipaddress.ip_network(net) for net in (
+    '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', '100.64.0.0/10', 'fc00::/7',
+))
+
+
+def _parse_address(value):
+    """(version, int) for a dotted/colon address or an integer as used by range CSVs"""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4, number) if number <= 0xFFFFFFFF else _normalize(ipaddress.IPv6Address(number))
+    return _normalize(ipaddress.ip_address(value))
+
+
+def _normalize(addr):
+    if addr.version == 6 and addr.ipv4_mapped:
+        addr = addr.ipv4_mapped
+    return addr.version, int(addr)
+
+
+class _FixedWidthKeys:
+    """Sequence view of fixed-width byte keys for bisect"""
+
+    def __init__(self, data, width):
+        self.data = data
+        self.width = width
+
+    def __len__(self):
+        return len(self.data) // self.width
+
+    def __getitem__(self, index):
+        start = index * self.width
+        return bytes(self.data[start:start + self.width])
+
+
+class IPIntelligence:
+    """Address classification and offline GeoIP lookups"""
+
+    def __init__(self, db_path=None, cache_size=4096):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._mmap = None
+        self._counts = (0, 0)
+        self._columns = None
+        self._blob_offset = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._resolve = lru_cache(maxsize=cache_size)(self._resolve_uncached)
+
+    def init_app(self, app):
+        self.db_path = os.getenv('GEOIP_DB_PATH', self.db_path or os.path.join(app.root_path, DEFAULT_DB_PATH))
+        app.extensions['ip_intel'] = self
+
+    # Classification
+
+    @staticmethod
+    def classify(ip_address):
+        """'loopback', 'link_local', 'multicast', 'private', 'reserved', 'global' or 'invalid'"""
+        if ip_address == 'localhost':
+            return 'loopback'
+        try:
+            addr = ipaddress.ip_address(ip_address.strip())
+        except (ValueError, AttributeError):
+            return 'invalid'
+        return IPIntelligence._scope(addr)
+
+    @staticmethod
+    def _scope(addr):
+        if addr.version == 6 and addr.ipv4_mapped:
+            addr = addr.ipv4_mapped
+        if addr.is_loopback:
+            return 'loopback'
+        if addr.is_link_local:
+            return 'link_local'
+        if addr.is_multicast:
+            return 'multicast'
+        if addr.is_global:
+            return 'global'
+        if any(addr in network for network in PRIVATE_NETWORKS if network.version == addr.version):
+            return 'private'
+        return 'reserved'
+
+    # Database
+
+    def _open(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            path = self.db_path or DEFAULT_DB_PATH
+            if not os.path.exists(path):
+                logger.info(f"GeoIP database not found at {path}; locations will be reported as Unknown")
+                return
+            try:
+                with open(path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, v4_count, v6_count, blob_offset = HEADER.unpack_from(mapped, 0)
+                if magic != MAGIC:
+                    raise ValueError('not a GeoIP range database')
+                self._mmap, self._counts, self._blob_offset = mapped, (v4_count, v6_count), blob_offset
+                self._columns = self._map_columns(mapped, v4_count, v6_count)
+                logger.info(f"GeoIP database loaded: {v4_count} IPv4 and {v6_count} IPv6 ranges")
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning(f"Could not open GeoIP database {path}: {e}")
+
+    def reload(self):
+        """Reopen the database file (after a rebuild) and drop cached lookups"""
+        with self._lock:
+            mapped = self._mmap
+            self._mmap, self._counts, self._columns, self._loaded = None, (0, 0), None, False
+        self._resolve.cache_clear()
+        if mapped is not None:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # a lookup in flight still holds a view; the map closes when it is collected
+
+    @staticmethod
+    def _map_columns(mapped, v4_count, v6_count):
+        """Views over the columns; IPv4 ones are plain uint32 sequences bisect can search in C"""
+        view = memoryview(mapped)
+        position = HEADER.size
+
+        def column(width, count):
+            nonlocal position
+            data = view[position:position + width * count]
+            position += width * count
+            return data
+
+        def uint32(data):
+            if sys.byteorder == 'little':
+                return data.cast('I')
+            values = array.array('I', bytes(data))
+            values.byteswap()
+            return values
+
+        v4 = tuple(uint32(column(width, v4_count)) for width in (V4_WIDTH, V4_WIDTH, OFFSET_WIDTH))
+        v6_starts = _FixedWidthKeys(column(V6_WIDTH, v6_count), V6_WIDTH)
+        v6_ends = _FixedWidthKeys(column(V6_WIDTH, v6_count), V6_WIDTH)
+        v6 = (v6_starts, v6_ends, uint32(column(OFFSET_WIDTH, v6_count)))
+        return {4: v4, 6: v6}
+
+    def _search(self, version, number):
+        """Location offset of the range containing ``number``, or None"""
+        starts, ends, offsets = self._columns[version]
+        key = number if version == 4 else number.to_bytes(V6_WIDTH, 'big')
+        # Rightmost range starting at or below the address
+        index = bisect.bisect_right(starts, key) - 1
+        if index < 0 or key > ends[index]:
+            return None
+        return offsets[index]
+
+    def _location(self, offset):
+        position = self._blob_offset + offset
+        (length,) = LOCATION_LENGTH.unpack_from(self._mmap, position)
+        start = position + LOCATION_LENGTH.size
+        return dict(zip(LOCATION_FIELDS, json.loads(self._mmap[start:start + length])))
+
+    # Lookups
+
+    def _resolve_uncached(self, ip_address):
+        try:
+            addr = ipaddress.ip_address(ip_address.strip())
+            scope = self._scope(addr)
+        except (ValueError, AttributeError):
+            addr, scope = None, 'loopback' if ip_address == 'localhost' else 'invalid'
+        if scope in ('loopback', 'private', 'link_local'):
+            return {'city': 'Local/Private Network', 'region': 'Local', 'country': 'Local',
+                    'timezone': 'Local Timezone', 'isp': 'Local Network', 'org': 'Private Network', 'scope': scope}
+        if scope != 'global':
+            return {'city': 'Reserved Address', 'region': 'Reserved', 'country': 'Reserved',
+                    'timezone': 'Unknown', 'isp': 'None', 'org': 'Reserved Range', 'scope': scope}
+
+        self._open()
+        location = None
+        if self._mmap is not None:
+            offset = self._search(*_normalize(addr))
+            if offset is not None:
+                location = self._location(offset)
+        info = {'city': 'Unknown', 'region': 'Unknown', 'country': 'Unknown',
+                'timezone': 'Unknown', 'isp': 'Unknown', 'org': 'Unknown', 'scope': scope}
+        if location:
+            info.update({key: value for key, value in location.items() if value not in (None, '')})
+        return info
+
+    def lookup(self, ip_address):
+        """Location details for an address, in the shape admin notifications expect"""
+        return dict(self._resolve(ip_address), ip=ip_address)
+
+    def get_stats(self):
+        self._open()
+        info = self._resolve.cache_info()
+        return {
+            'database': self.db_path or DEFAULT_DB_PATH,
+            'loaded': self._mmap is not None,
+            'ipv4_ranges': self._counts[0],
+            'ipv6_ranges': self._counts[1],
+            'cache_hits': info.hits,
+            'cache_misses': info.misses,
+            'cache_size': info.currsize,
+        }
+
+
+def build_database(csv_path, output_path):
+    """
+    Build a range database from a CSV with a header row naming ``start_ip``
+    and ``end_ip`` (or ``ip_from``/``ip_to``, or a CIDR ``network``) plus any
+    of country, region, city, timezone, isp, org, lat, lon. Addresses may be
+    written out or given as integers. Returns counts of what was written.
+    """
+    ranges = {4: [], 6: []}
+    locations, blob = {}, bytearray()
+    skipped = 0
+
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            try:
+                if row.get('network'):
+                    network = ipaddress.ip_network(row['network'], strict=False)
+                    version, start = _normalize(network.network_address)
+                    end = start + network.num_addresses - 1
+                else:
+                    version, start = _parse_address(row.get('start_ip') or row['ip_from'])
+                    end_version, end = _parse_address(row.get('end_ip') or row['ip_to'])
+                    if end_version != version or end < start:
+                        raise ValueError('bad range')
+            except (KeyError, ValueError):
+                skipped += 1
+                continue
+
+            location = tuple(row.get(field, '') for field in LOCATION_FIELDS)
+            offset = locations.get(location)
+            if offset is None:
+                encoded = json.dumps(location, separators=(',', ':')).encode('utf-8')
+                offset = locations[location] = len(blob)
+                blob += LOCATION_LENGTH.pack(len(encoded)) + encoded
+            ranges[version].append((start, end, offset))
+
+    # Sort, dropping ranges that overlap the previous one so the binary search stays exact
+    for version in (4, 6):
+        kept, last_end = [], -1
+        for start, end, offset in sorted(ranges[version]):
+            if start <= last_end:
+                skipped += 1
+                continue
+            kept.append((start, end, offset))
+            last_end = end
+        ranges[version] = kept
+
+    v4, v6 = ranges[4], ranges[6]
+    blob_offset = HEADER.size + len(v4) * (2 * V4_WIDTH + OFFSET_WIDTH) + len(v6) * (2 * V6_WIDTH + OFFSET_WIDTH)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temporary = f'{output_path}.tmp'
+    with open(temporary, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(v4), len(v6), blob_offset))
+        for column in range(3):
+            out.write(struct.pack(f'<{len(v4)}I', *(record[column] for record in v4)))
+        for column in range(2):
+            out.write(b''.join(record[column].to_bytes(V6_WIDTH, 'big') for record in v6))
+        out.write(struct.pack(f'<{len(v6)}I', *(record[2] for record in v6)))
+        out.write(blob)
+    # Processes holding the old file mapped keep reading it until they reload
+    os.replace(temporary, output_path)
+    return {'ipv4_ranges': len(v4), 'ipv6_ranges': len(v6), 'locations': len(locations), 'skipped': skipped}
+
+
+# Global instance
+ip_intel = IPIntelligence()
@@ -73,9 +73,17 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the wiki search index tables are managed by wiki/search_index.py
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and name.startswith('wiki_search'):
+            return False
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
@@ -0,0 +1,21 @@
+"""Add a session generation to users so admin sessions can be revoked
+
+Revision ID: admin_session_generation_010
+Revises: wiki_text_fields_009
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'admin_session_generation_010'
+down_revision = 'wiki_text_fields_009'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Sessions issued before this migration carry no claim and log in again
+    op.execute('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS session_generation INTEGER NOT NULL DEFAULT 0')
+
+def downgrade():
+    op.drop_column('user', 'session_generation')
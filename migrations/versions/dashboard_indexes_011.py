@@ -0,0 +1,22 @@
+"""Index the dates the admin dashboard lists recent contacts and subscribers by
+
+Revision ID: dashboard_indexes_011
+Revises: admin_session_generation_010
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'dashboard_indexes_011'
+down_revision = 'admin_session_generation_010'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS ix_contact_submission_submitted_at ON contact_submission (submitted_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_newsletter_subscriber_subscribed_at ON newsletter_subscriber (subscribed_at)")
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_newsletter_subscriber_subscribed_at")
+    op.execute("DROP INDEX IF EXISTS ix_contact_submission_submitted_at")
@@ -0,0 +1,31 @@
+"""Add donation_stats aggregate table
+
+Revision ID: donation_stats_004
+Revises: github_repo_cache_003
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'donation_stats_004'
+down_revision = 'github_repo_cache_003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS donation_stats (
+            scope VARCHAR(20) NOT NULL,
+            stat_key VARCHAR(160) NOT NULL,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            total_amount FLOAT NOT NULL DEFAULT 0,
+            verified_amount FLOAT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (scope, stat_key)
+        )
+    """)
+    # Fill it with `flask reconcile-donation-stats` after upgrading
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS donation_stats")
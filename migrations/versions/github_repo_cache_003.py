@@ -0,0 +1,32 @@
+"""Persist GitHub ETag/Last-Modified validators and payloads per repository
+
+Revision ID: github_repo_cache_003
+Revises: wiki_rendered_content_002
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'github_repo_cache_003'
+down_revision = 'wiki_rendered_content_002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS github_repo_cache (
+            full_name VARCHAR(200) PRIMARY KEY,
+            etag VARCHAR(200),
+            last_modified VARCHAR(100),
+            payload TEXT,
+            fetched_at TIMESTAMP,
+            validated_at TIMESTAMP,
+            full_responses INTEGER DEFAULT 0,
+            not_modified_responses INTEGER DEFAULT 0,
+            error_responses INTEGER DEFAULT 0
+        )
+    """)
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS github_repo_cache")
@@ -0,0 +1,30 @@
+"""Add sort-order indexes for keyset pagination of wiki explore and donations
+
+Revision ID: keyset_indexes_008
+Revises: project_updated_at_007
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'keyset_indexes_008'
+down_revision = 'project_updated_at_007'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Seeking past a NULL key never matches, so every sort key needs a value
+    op.execute("UPDATE wiki_article SET views = 0 WHERE views IS NULL")
+    op.execute("UPDATE wiki_article SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL")
+    op.execute("UPDATE donation SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_wiki_article_title_id ON wiki_article (title, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_wiki_article_created_at_id ON wiki_article (created_at, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_wiki_article_views_id ON wiki_article (views, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_donation_created_at_id ON donation (created_at, id)")
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_donation_created_at_id")
+    op.execute("DROP INDEX IF EXISTS ix_wiki_article_views_id")
+    op.execute("DROP INDEX IF EXISTS ix_wiki_article_created_at_id")
+    op.execute("DROP INDEX IF EXISTS ix_wiki_article_title_id")
@@ -0,0 +1,50 @@
+"""Add newsletter delivery job and recipient tables
+
+Revision ID: newsletter_delivery_005
+Revises: donation_stats_004
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'newsletter_delivery_005'
+down_revision = 'donation_stats_004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS newsletter_job (
+            id SERIAL PRIMARY KEY,
+            subject VARCHAR(300) NOT NULL,
+            content TEXT NOT NULL,
+            status VARCHAR(20) DEFAULT 'queued',
+            total INTEGER DEFAULT 0,
+            sent_count INTEGER DEFAULT 0,
+            failed_count INTEGER DEFAULT 0,
+            created_by VARCHAR(80),
+            created_at TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            heartbeat_at TIMESTAMP
+        )
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS newsletter_delivery (
+            id SERIAL PRIMARY KEY,
+            job_id INTEGER NOT NULL REFERENCES newsletter_job(id),
+            subscriber_id INTEGER REFERENCES newsletter_subscriber(id),
+            email VARCHAR(120) NOT NULL,
+            status VARCHAR(20) DEFAULT 'pending',
+            claim_token VARCHAR(32),
+            error VARCHAR(500),
+            sent_at TIMESTAMP,
+            CONSTRAINT uq_newsletter_delivery_job_email UNIQUE (job_id, email)
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_newsletter_delivery_job_status ON newsletter_delivery (job_id, status)")
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS newsletter_delivery")
+    op.execute("DROP TABLE IF EXISTS newsletter_job")
@@ -0,0 +1,21 @@
+"""Add updated_at to project for conditional GET validators
+
+Revision ID: project_updated_at_007
+Revises: task_queue_006
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'project_updated_at_007'
+down_revision = 'task_queue_006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("ALTER TABLE project ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP")
+    op.execute("UPDATE project SET updated_at = COALESCE(last_updated, created_at) WHERE updated_at IS NULL")
+
+def downgrade():
+    op.drop_column('project', 'updated_at')
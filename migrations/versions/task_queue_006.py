@@ -0,0 +1,36 @@
+"""Add queued_task table for the background task queue
+
+Revision ID: task_queue_006
+Revises: newsletter_delivery_005
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'task_queue_006'
+down_revision = 'newsletter_delivery_005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS queued_task (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}',
+            status VARCHAR(20) DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            max_attempts INTEGER DEFAULT 5,
+            run_at TIMESTAMP,
+            locked_by VARCHAR(32),
+            locked_until TIMESTAMP,
+            last_error VARCHAR(1000),
+            created_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_queued_task_status_run_at ON queued_task (status, run_at)")
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS queued_task")
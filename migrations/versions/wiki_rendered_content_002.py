@@ -0,0 +1,26 @@
+"""Store pre-rendered markdown HTML, TOC and content hash on wiki articles
+
+Revision ID: wiki_rendered_content_002
+Revises: seo_enhancement_001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'wiki_rendered_content_002'
+down_revision = 'seo_enhancement_001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing rows are rendered lazily on first view, or in bulk with
+    # `flask render-wiki-articles`.
+    op.execute("ALTER TABLE wiki_article ADD COLUMN IF NOT EXISTS content_html TEXT")
+    op.execute("ALTER TABLE wiki_article ADD COLUMN IF NOT EXISTS content_toc TEXT")
+    op.execute("ALTER TABLE wiki_article ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+
+def downgrade():
+    op.drop_column('wiki_article', 'content_hash')
+    op.drop_column('wiki_article', 'content_toc')
+    op.drop_column('wiki_article', 'content_html')
@@ -0,0 +1,28 @@
+"""Store plain text, excerpt, word count and reading time derived from wiki article content
+
+Revision ID: wiki_text_fields_009
+Revises: keyset_indexes_008
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = 'wiki_text_fields_009'
+down_revision = 'keyset_indexes_008'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing rows fall back to their content until backfilled with
+    # `flask backfill-wiki-text`, or until their next save.
+    op.execute("ALTER TABLE wiki_article ADD COLUMN IF NOT EXISTS plain_text TEXT")
+    op.execute("ALTER TABLE wiki_article ADD COLUMN IF NOT EXISTS excerpt TEXT")
+    op.execute("ALTER TABLE wiki_article ADD COLUMN IF NOT EXISTS word_count INTEGER")
+    op.execute("ALTER TABLE wiki_article ADD COLUMN IF NOT EXISTS reading_time INTEGER")
+
+def downgrade():
+    op.drop_column('wiki_article', 'reading_time')
+    op.drop_column('wiki_article', 'word_count')
+    op.drop_column('wiki_article', 'excerpt')
+    op.drop_column('wiki_article', 'plain_text')
@@ -5,6 +5,10 @@ from flask_login import UserMixin
 from flask import url_for
 import re
 from urllib.parse import urlparse
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import deferred
+from sqlalchemy.orm.attributes import set_committed_value
+from utils.markdown_renderer import render_markdown, content_hash
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -12,10 +16,13 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
+    # Bumped to revoke every admin session issued before (see admin/identity.py)
+    session_generation = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
+        self.session_generation = (self.session_generation or 0) + 1
         
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -56,6 +63,7 @@ class Project(db.Model):
     github_data_updated = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='completed')  # completed, in-progress, maintenance
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f'<Project {self.title}>'
@@ -96,26 +104,8 @@ class Project(db.Model):
             
             if github_data:
                 # Update project data from GitHub
-                self.stars = github_data.get('stargazers_count', 0)
-                self.forks = github_data.get('forks_count', 0)
-                
-                # Update last_updated from GitHub's updated_at
-                if github_data.get('updated_at'):
-                    try:
-                        # Handle GitHub's ISO format
-                        github_updated = datetime.fromisoformat(
-                            github_data.get('updated_at').replace('Z', '+00:00')
-                        )
-                        self.last_updated = github_updated
-                    except (ValueError, AttributeError):
-                        pass
-                
-                # Update description if not set locally
-                if not self.description and github_data.get('description'):
-                    self.description = github_data.get('description')
-                
-                # Update github_data_updated timestamp
-                self.github_data_updated = datetime.utcnow()
+                for column, value in self.github_update_values(github_data).items():
+                    setattr(self, column, value)
                 
                 print(f"Successfully updated GitHub data for {username}/{repo}")
                 return True
@@ -129,6 +119,30 @@ class Project(db.Model):
             print(f"Error updating GitHub data for {username}/{repo}: {e}")
             return False
     
+    def github_update_values(self, github_data):
+        """Column values to store for a GitHub repository payload"""
+        values = {
+            'stars': github_data.get('stargazers_count', 0),
+            'forks': github_data.get('forks_count', 0),
+            'github_data_updated': datetime.utcnow(),
+        }
+        
+        # Update last_updated from GitHub's updated_at
+        if github_data.get('updated_at'):
+            try:
+                # Handle GitHub's ISO format
+                values['last_updated'] = datetime.fromisoformat(
+                    github_data.get('updated_at').replace('Z', '+00:00')
+                )
+            except (ValueError, AttributeError):
+                pass
+        
+        # Update description if not set locally
+        if not self.description and github_data.get('description'):
+            values['description'] = github_data.get('description')
+        
+        return values
+    
     def should_update_github_data(self):
         """Check if GitHub data should be updated (every 24 hours)"""
         if not self.github_data_updated:
@@ -137,8 +151,48 @@ class Project(db.Model):
         from datetime import timedelta
         return datetime.utcnow() - self.github_data_updated > timedelta(hours=24)
 
+class GitHubRepoCache(db.Model):
+    """Persisted GitHub validators and last payload per repository, for conditional requests"""
+    __tablename__ = 'github_repo_cache'
+    
+    full_name = db.Column(db.String(200), primary_key=True)  # owner/name as requested from the API
+    etag = db.Column(db.String(200))
+    last_modified = db.Column(db.String(100))
+    payload = db.Column(db.Text)  # processed repository data as JSON
+    fetched_at = db.Column(db.DateTime)  # last 200 response
+    validated_at = db.Column(db.DateTime)  # last 200 or 304 response
+    full_responses = db.Column(db.Integer, default=0)
+    not_modified_responses = db.Column(db.Integer, default=0)
+    error_responses = db.Column(db.Integer, default=0)
+    
+    def __repr__(self):
+        return f'<GitHubRepoCache {self.full_name}>'
+
+# Listing text derived from wiki article content at write time
+HTML_TAG = re.compile('<.*?>')
+EXCERPT_CHARS = 300
+WORDS_PER_MINUTE = 200
+
+def derive_article_text(content):
+    """
+    (plain text, excerpt, word count, reading time) for article content.
+    The excerpt keeps one character past EXCERPT_CHARS so readers can tell
+    whether it was cut; it is None when there is no content.
+    """
+    if not content:
+        return '', None, 0, 1
+    plain_text = HTML_TAG.sub('', content)
+    word_count = len(plain_text.split())
+    return plain_text, plain_text[:EXCERPT_CHARS + 1], word_count, max(1, word_count // WORDS_PER_MINUTE)
+
 class WikiArticle(db.Model):
     __tablename__ = 'wiki_article'
+    # One per explore sort order, ending in the id tiebreaker keyset paging seeks on
+    __table_args__ = (
+        db.Index('ix_wiki_article_title_id', 'title', 'id'),
+        db.Index('ix_wiki_article_created_at_id', 'created_at', 'id'),
+        db.Index('ix_wiki_article_views_id', 'views', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -150,33 +204,79 @@ class WikiArticle(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Markdown rendered at write time; content_hash marks which content/renderer produced it
+    content_html = deferred(db.Column(db.Text))
+    content_toc = deferred(db.Column(db.Text))
+    content_hash = db.Column(db.String(64))
+    
+    # Derived from content on save so listings never load or scan the body
+    plain_text = deferred(db.Column(db.Text))
+    excerpt = db.Column(db.Text)
+    word_count = db.Column(db.Integer)
+    reading_time = db.Column(db.Integer)
+    
     def __repr__(self):
         return f'<WikiArticle {self.title}>'
     
+    def needs_render(self):
+        """True when the stored HTML is missing or was rendered from other content"""
+        return self.content_hash != content_hash(self.content)
+    
+    def render_content(self):
+        """Render markdown into the stored columns (flushed with the article)"""
+        self.content_html, self.content_toc = render_markdown(self.content)
+        self.content_hash = content_hash(self.content)
+    
+    def backfill_rendered_content(self):
+        """
+        Render and store HTML for an article saved before pre-rendering existed.
+        Written with a plain UPDATE so updated_at and other write hooks are untouched.
+        """
+        html, toc = render_markdown(self.content)
+        digest = content_hash(self.content)
+        db.session.execute(
+            update(WikiArticle)
+            .where(WikiArticle.id == self.id)
+            .values(content_html=html, content_toc=toc, content_hash=digest,
+                    updated_at=WikiArticle.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        set_committed_value(self, 'content_html', html)
+        set_committed_value(self, 'content_toc', toc)
+        set_committed_value(self, 'content_hash', digest)
+    
+    def derive_text_fields(self):
+        """Store the plain text and listing fields derived from content (flushed with the article)"""
+        self.plain_text, self.excerpt, self.word_count, self.reading_time = derive_article_text(self.content)
+    
     def strip_html(self, text):
         """Remove HTML tags from text"""
         if not text:
             return ""
-        clean = re.compile('<.*?>')
-        return re.sub(clean, '', text)
+        return HTML_TAG.sub('', text)
     
     def get_excerpt(self, length=200):
         """Get a clean text excerpt without HTML tags"""
         if self.summary:
             return self.strip_html(self.summary)
+        # Stored fields cover every excerpt up to EXCERPT_CHARS; older rows fall back to the content
+        if self.word_count is not None and length <= EXCERPT_CHARS:
+            if self.excerpt is None:
+                return "No content available"
+            clean_content = self.excerpt
         elif self.content:
             clean_content = self.strip_html(self.content)
-            if len(clean_content) > length:
-                return clean_content[:length] + '...'
-            return clean_content
-        return "No content available"
+        else:
+            return "No content available"
+        if len(clean_content) > length:
+            return clean_content[:length] + '...'
+        return clean_content
     
     def get_reading_time(self):
         """Estimate reading time in minutes"""
-        if self.content:
-            word_count = len(self.strip_html(self.content).split())
-            return max(1, word_count // 200)  # Assume 200 words per minute
-        return 1
+        if self.reading_time is not None:
+            return self.reading_time
+        return derive_article_text(self.content)[3]
     
     def to_dict(self):
         return {
@@ -193,6 +293,24 @@ class WikiArticle(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+@event.listens_for(WikiArticle, 'before_insert')
+@event.listens_for(WikiArticle, 'before_update')
+def render_wiki_article(mapper, connection, target):
+    """Keep the stored HTML in step with the markdown on every save"""
+    if target.needs_render():
+        target.render_content()
+
+@event.listens_for(WikiArticle, 'before_insert')
+@event.listens_for(WikiArticle, 'before_update')
+def derive_wiki_article_text(mapper, connection, target):
+    """Keep the derived text fields in step with the content on every save"""
+    state = inspect(target)
+    if state.pending or state.attrs.content.history.has_changes():
+        target.derive_text_fields()
+    # Rows from before the fields existed fill them in on their next save
+    elif not {'content', 'word_count'} & state.unloaded and target.word_count is None:
+        target.derive_text_fields()
+
 class WikiCategory(db.Model):
     __tablename__ = 'wiki_category'
     
@@ -210,7 +328,10 @@ class WikiCategory(db.Model):
     
     @property
     def article_count(self):
-        return self.articles.count()
+        # Read from the cached category tree rather than a COUNT per category
+        from wiki.category_tree import category_tree
+        node = category_tree.get(self.id)
+        return node.article_count if node else self.articles.count()
     
     def to_dict(self):
         return {
@@ -276,6 +397,10 @@ class DonationProject(db.Model):
         }
 
 class Donation(db.Model):
+    __table_args__ = (
+        db.Index('ix_donation_created_at_id', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('donation_project.id'), nullable=False)
     donor_name = db.Column(db.String(100), nullable=False)
@@ -311,7 +436,31 @@ class Donation(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class DonationStats(db.Model):
+    """
+    Running totals over completed donations, kept in step by donation_stats on flush.
+    
+    Rows are keyed by (scope, stat_key): ('currency', 'USD'), ('project', '<id>:<currency>'),
+    ('supporter', '<email>') and ('summary', 'supporters'), whose completed_count is the
+    number of distinct supporters.
+    """
+    __tablename__ = 'donation_stats'
+    
+    scope = db.Column(db.String(20), primary_key=True)
+    stat_key = db.Column(db.String(160), primary_key=True)
+    completed_count = db.Column(db.Integer, default=0, nullable=False)
+    total_amount = db.Column(db.Float, default=0.0, nullable=False)  # sum of amount
+    verified_amount = db.Column(db.Float, default=0.0, nullable=False)  # sum of verified_amount or amount
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DonationStats {self.scope}:{self.stat_key}>'
+
 class NewsletterSubscriber(db.Model):
+    __table_args__ = (
+        db.Index('ix_newsletter_subscriber_subscribed_at', 'subscribed_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     name = db.Column(db.String(100))
@@ -333,7 +482,106 @@ class NewsletterSubscriber(db.Model):
             'subscribed_at': self.subscribed_at.isoformat() if self.subscribed_at else None
         }
 
+class NewsletterJob(db.Model):
+    """One newsletter send; its recipients are NewsletterDelivery rows"""
+    __tablename__ = 'newsletter_job'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(300), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='queued')  # queued, sending, completed, failed
+    total = db.Column(db.Integer, default=0)
+    sent_count = db.Column(db.Integer, default=0)
+    failed_count = db.Column(db.Integer, default=0)
+    created_by = db.Column(db.String(80))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # bumped by the running sender while it mails
+    
+    deliveries = db.relationship('NewsletterDelivery', backref='job', lazy='dynamic',
+                                 cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<NewsletterJob {self.id} {self.status}>'
+    
+    def to_dict(self):
+        done = (self.sent_count or 0) + (self.failed_count or 0)
+        return {
+            'id': self.id,
+            'subject': self.subject,
+            'status': self.status,
+            'total': self.total,
+            'sent': self.sent_count,
+            'failed': self.failed_count,
+            'pending': max(0, (self.total or 0) - done),
+            'progress_percentage': round(done * 100 / self.total, 1) if self.total else 100,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class NewsletterDelivery(db.Model):
+    """One recipient of a NewsletterJob; claimed before sending so a resumed job never sends twice"""
+    __tablename__ = 'newsletter_delivery'
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'email', name='uq_newsletter_delivery_job_email'),
+        db.Index('ix_newsletter_delivery_job_status', 'job_id', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('newsletter_job.id'), nullable=False)
+    subscriber_id = db.Column(db.Integer, db.ForeignKey('newsletter_subscriber.id'))
+    email = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed
+    claim_token = db.Column(db.String(32))
+    error = db.Column(db.String(500))
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<NewsletterDelivery {self.email} {self.status}>'
+
+class QueuedTask(db.Model):
+    """Background work item run by the task worker (see task_queue.py)"""
+    __tablename__ = 'queued_task'
+    __table_args__ = (
+        db.Index('ix_queued_task_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    status = db.Column(db.String(20), default='pending')  # pending, running, done, dead
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=5)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_by = db.Column(db.String(32))  # claim token of the worker holding the lease
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.String(1000))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<QueuedTask {self.id} {self.name} {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class ContactSubmission(db.Model):
+    __table_args__ = (
+        db.Index('ix_contact_submission_submitted_at', 'submitted_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
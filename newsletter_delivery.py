@@ -0,0 +1,292 @@
+"""
+Newsletter Delivery
+Sends newsletter jobs off the request thread through a bounded worker pool,
+rate limited per SMTP provider, recording each recipient so an interrupted
+send resumes without mailing anyone twice
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+
+from database import db
+from models import NewsletterJob, NewsletterDelivery, NewsletterSubscriber
+
+logger = logging.getLogger(__name__)
+
+# Sends per second for known providers; Gmail allows about 2000 messages a day
+PROVIDER_RATES = {
+    'smtp.gmail.com': 1.0,
+}
+DEFAULT_RATE = 5.0
+
+# Senders refresh the job heartbeat at most this often (seconds) while mailing,
+# before and after each send, not just once per batch: a 50-recipient batch at
+# Gmail's 1/s already takes close to a minute
+HEARTBEAT_INTERVAL = 10
+
+# A 'sending' job whose heartbeat is older than this has lost its sender. It
+# must exceed the longest single send (SMTP timeout of 30 s, retried once on a
+# dropped connection) plus HEARTBEAT_INTERVAL, or a live job looks stalled
+# and a resume would start a second run over its in-flight rows
+STALE_AFTER = timedelta(minutes=2)
+
+
+class RateLimiter:
+    """Token bucket shared by every worker sending through one provider"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Reserve a token even if it is not there yet, then wait for it outside the lock
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class NewsletterDeliveryEngine:
+    """
+    Runs NewsletterJob rows.
+
+    Recipients are claimed in batches (pending -> sending, tagged with the
+    run's claim token) before any mail goes out, and marked sent or failed
+    in one UPDATE per batch. A run that dies leaves at most one batch in
+    'sending'; resuming marks those failed as "interrupted" rather than
+    risking a second copy, and continues with the pending rows.
+    """
+
+    def __init__(self, batch_size=50):
+        self.batch_size = batch_size
+        self._limiters = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def limiter_for(self, smtp_server):
+        with self._lock:
+            limiter = self._limiters.get(smtp_server)
+            if limiter is None:
+                rate = float(os.getenv('NEWSLETTER_SEND_RATE', PROVIDER_RATES.get(smtp_server, DEFAULT_RATE)))
+                limiter = self._limiters[smtp_server] = RateLimiter(rate)
+            return limiter
+
+    # Jobs
+
+    def create_job(self, subject, content, subscribers, created_by=None):
+        """Store a job with one pending delivery per distinct subscriber email"""
+        recipients = {}
+        for subscriber in subscribers:
+            recipients.setdefault(subscriber.email.strip().lower(), subscriber)
+
+        job = NewsletterJob(subject=subject, content=content, total=len(recipients), created_by=created_by)
+        db.session.add(job)
+        db.session.flush()
+        if recipients:
+            db.session.execute(NewsletterDelivery.__table__.insert(), [
+                {'job_id': job.id, 'subscriber_id': subscriber.id, 'email': subscriber.email, 'status': 'pending'}
+                for subscriber in recipients.values()
+            ])
+        db.session.commit()
+        return job
+
+    def start(self, job_id, app=None):
+        """Run a job on a background thread; False if this process is already running it"""
+        app = app or current_app._get_current_object()
+        with self._lock:
+            thread = self._threads.get(job_id)
+            if thread is not None and thread.is_alive():
+                return False
+            thread = threading.Thread(target=self._run_in_app, args=(app, job_id),
+                                      name=f'newsletter-job-{job_id}', daemon=True)
+            self._threads[job_id] = thread
+        thread.start()
+        return True
+
+    def is_running(self, job_id):
+        thread = self._threads.get(job_id)
+        return thread is not None and thread.is_alive()
+
+    def _run_in_app(self, app, job_id):
+        with app.app_context():
+            try:
+                self.run(job_id)
+            except Exception as e:
+                logger.error(f"Newsletter job {job_id} stopped: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    def run(self, job_id, workers=None):
+        """Send every pending recipient of a job; returns the job, or None if it cannot run now"""
+        from email_service import email_service
+
+        job = db.session.get(NewsletterJob, job_id)
+        if job is None or job.status in ('completed', 'failed'):
+            return job
+        now = datetime.utcnow()
+        if job.status == 'sending' and job.heartbeat_at and now - job.heartbeat_at < STALE_AFTER:
+            logger.info(f"Newsletter job {job_id} is already being sent")
+            return None
+
+        interrupted = self._release_interrupted(job)
+        job.status = 'sending'
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        db.session.commit()
+        if interrupted:
+            logger.warning(f"Newsletter job {job_id}: {interrupted} deliveries interrupted by an earlier run")
+
+        # Workers only see plain values; the job instance stays on this thread's session
+        subject = job.subject
+        rendered = email_service.render_newsletter(subject, job.content)
+        limiter = self.limiter_for(email_service.smtp_server)
+        workers = workers or int(os.getenv('NEWSLETTER_WORKERS', email_service.transport.max_connections))
+        claim_token = uuid.uuid4().hex
+        heartbeat = self._heartbeat(job_id, db.engine)
+
+        def deliver(row):
+            limiter.acquire()
+            heartbeat()
+            message = email_service.personalize_newsletter(rendered, row.email)
+            try:
+                ok = email_service.send_email([row.email], subject, message['text'], message['html'])
+                return row, ok, None if ok else 'SMTP send failed'
+            except Exception as e:
+                return row, False, str(e)[:500]
+            finally:
+                heartbeat()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'newsletter-{job_id}') as pool:
+            while True:
+                batch = self._claim(job_id, claim_token)
+                if not batch:
+                    break
+                self._record(job_id, list(pool.map(deliver, batch)))
+
+        db.session.refresh(job)
+        job.status = 'failed' if job.total and not job.sent_count else 'completed'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Newsletter job {job_id}: sent {job.sent_count}/{job.total}, {job.failed_count} failed")
+        return job
+
+    @staticmethod
+    def _heartbeat(job_id, engine):
+        """Callable for the send workers that advances the job's heartbeat, at most every HEARTBEAT_INTERVAL"""
+        lock = threading.Lock()
+        last = [time.monotonic()]
+
+        def beat():
+            with lock:
+                now = time.monotonic()
+                if now - last[0] < HEARTBEAT_INTERVAL:
+                    return
+                last[0] = now
+            try:
+                # Its own short transaction: the workers have no app context or session
+                with engine.begin() as connection:
+                    connection.execute(
+                        update(NewsletterJob.__table__).where(NewsletterJob.__table__.c.id == job_id)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+            except Exception as e:
+                logger.warning(f"Newsletter job {job_id} heartbeat failed: {e}")
+
+        return beat
+
+    def _release_interrupted(self, job):
+        """Deliveries left in 'sending' by a dead run may or may not have gone out; do not resend them"""
+        result = db.session.execute(
+            update(NewsletterDelivery)
+            .where(NewsletterDelivery.job_id == job.id, NewsletterDelivery.status == 'sending')
+            .values(status='failed', error='Interrupted during delivery; not resent')
+        )
+        if result.rowcount:
+            job.failed_count = (job.failed_count or 0) + result.rowcount
+        return result.rowcount
+
+    def _claim(self, job_id, claim_token):
+        ids = [row.id for row in db.session.query(NewsletterDelivery.id).filter_by(job_id=job_id, status='pending')
+               .order_by(NewsletterDelivery.id).limit(self.batch_size)]
+        if not ids:
+            return []
+        # The status guard makes the claim exclusive if another process races us
+        db.session.execute(
+            update(NewsletterDelivery)
+            .where(NewsletterDelivery.id.in_(ids), NewsletterDelivery.status == 'pending')
+            .values(status='sending', claim_token=claim_token)
+        )
+        db.session.commit()
+        return db.session.query(NewsletterDelivery.id, NewsletterDelivery.subscriber_id, NewsletterDelivery.email) \
+            .filter(NewsletterDelivery.id.in_(ids), NewsletterDelivery.claim_token == claim_token,
+                    NewsletterDelivery.status == 'sending').all()
+
+    def _record(self, job_id, results):
+        """Write one batch of outcomes, subscriber timestamps and job counters in one transaction"""
+        now = datetime.utcnow()
+        sent = [row for row, ok, _ in results if ok]
+        failed = [(row, error) for row, ok, error in results if not ok]
+
+        if sent:
+            db.session.execute(update(NewsletterDelivery), [
+                {'id': row.id, 'status': 'sent', 'sent_at': now, 'error': None} for row in sent
+            ])
+            subscriber_ids = [row.subscriber_id for row in sent if row.subscriber_id]
+            if subscriber_ids:
+                db.session.execute(
+                    update(NewsletterSubscriber).where(NewsletterSubscriber.id.in_(subscriber_ids))
+                    .values(last_email_sent=now)
+                )
+        if failed:
+            db.session.execute(update(NewsletterDelivery), [
+                {'id': row.id, 'status': 'failed', 'sent_at': None, 'error': error} for row, error in failed
+            ])
+        db.session.execute(
+            update(NewsletterJob).where(NewsletterJob.id == job_id).values(
+                sent_count=NewsletterJob.sent_count + len(sent),
+                failed_count=NewsletterJob.failed_count + len(failed),
+                heartbeat_at=now,
+            )
+        )
+        db.session.commit()
+
+    # Progress
+
+    def progress(self, job_id):
+        job = db.session.get(NewsletterJob, job_id)
+        if job is None:
+            return None
+        data = job.to_dict()
+        data['running_here'] = self.is_running(job_id)
+        data['stalled'] = (job.status == 'sending' and not data['running_here']
+                           and (job.heartbeat_at is None or datetime.utcnow() - job.heartbeat_at >= STALE_AFTER))
+        return data
+
+    def resumable_jobs(self):
+        """Queued jobs and sending jobs whose sender has stopped"""
+        cutoff = datetime.utcnow() - STALE_AFTER
+        return NewsletterJob.query.filter(db.or_(
+            NewsletterJob.status == 'queued',
+            db.and_(NewsletterJob.status == 'sending',
+                    db.or_(NewsletterJob.heartbeat_at.is_(None), NewsletterJob.heartbeat_at < cutoff)),
+        )).order_by(NewsletterJob.id).all()
+
+
+# Global instance
+newsletter_delivery = NewsletterDeliveryEngine()
@@ -0,0 +1,167 @@
+"""
+Page Render Cache
+Caches fully rendered public pages keyed by a content version that is bumped on CMS writes
+"""
+
+import os
+import tempfile
+import uuid
+from itertools import chain
+
+from flask_caching import Cache
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+VERSION_KEY = 'page_cache:version'
+
+
+class PageCache:
+    def __init__(self):
+        self.cache = None
+        self.watched_models = ()
+        self.timeout = 24 * 3600
+        # Rendered pages for the version this worker last saw, so a hit costs
+        # one small backend read for the version token and no unpickling of HTML
+        self._local_version = None
+        self._local_pages = {}
+        self.stats = {'hits': 0, 'misses': 0, 'bumps': 0}
+
+    def init_app(self, app, watched_models=()):
+        """Initialize the shared store and the write listeners"""
+        try:
+            redis_url = os.getenv('REDIS_URL')
+            if redis_url:
+                cache_config = {
+                    'CACHE_TYPE': 'RedisCache',
+                    'CACHE_REDIS_URL': redis_url,
+                    'CACHE_KEY_PREFIX': 'portfolio_page:',
+                    'CACHE_DEFAULT_TIMEOUT': self.timeout
+                }
+            else:
+                # File store is shared by every worker on the host
+                cache_config = {
+                    'CACHE_TYPE': 'FileSystemCache',
+                    'CACHE_DIR': os.path.join(tempfile.gettempdir(), 'portfolio_page_cache'),
+                    'CACHE_DEFAULT_TIMEOUT': self.timeout
+                }
+
+            self.cache = Cache(config=cache_config)
+            self.cache.init_app(app)
+            print(f"Page Cache: initialized with {cache_config['CACHE_TYPE']}")
+        except Exception as e:
+            print(f"Page cache initialization error: {e}")
+            self.cache = Cache(config={'CACHE_TYPE': 'SimpleCache'})
+            self.cache.init_app(app)
+
+        self.watched_models = tuple(watched_models)
+        if self.watched_models and not event.contains(Session, 'after_flush', self._track_changes):
+            event.listen(Session, 'after_flush', self._track_changes)
+            event.listen(Session, 'after_commit', self._commit_changes)
+            event.listen(Session, 'after_soft_rollback', self._discard_changes)
+
+        app.extensions['page_cache'] = self
+
+    # Versioning
+
+    def get_version(self):
+        """Return the current content version, creating one if the store is empty"""
+        try:
+            version = self.cache.get(VERSION_KEY)
+            if version is None:
+                version = self.bump_version()
+            return version
+        except Exception as e:
+            print(f"Page cache version error: {e}")
+            return None
+
+    def bump_version(self):
+        """Start a new content version; pages rendered for older versions are never served again"""
+        version = uuid.uuid4().hex
+        try:
+            self.cache.set(VERSION_KEY, version, timeout=0)
+            self.stats['bumps'] += 1
+        except Exception as e:
+            print(f"Page cache bump error: {e}")
+        return version
+
+    def _track_changes(self, session, flush_context):
+        if session.info.get('page_cache_dirty'):
+            return
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, self.watched_models):
+                session.info['page_cache_dirty'] = True
+                return
+
+    def _commit_changes(self, session):
+        if session.info.pop('page_cache_dirty', False):
+            self.bump_version()
+
+    def _discard_changes(self, session, previous_transaction):
+        session.info.pop('page_cache_dirty', None)
+
+    # Pages
+
+    def _page_key(self, version, name, variant):
+        return f"page:{name}:{version}:{variant}"
+
+    def get(self, name, variant='', version=None):
+        """Return cached HTML for ``name`` at ``version`` (default: the current one), or None"""
+        if self.cache is None:
+            return None
+        version = version or self.get_version()
+        if version is None:
+            return None
+
+        if version != self._local_version:
+            self._local_version = version
+            self._local_pages = {}
+
+        key = self._page_key(version, name, variant)
+        html = self._local_pages.get(key)
+        if html is None:
+            try:
+                html = self.cache.get(key)
+            except Exception as e:
+                print(f"Page cache read error: {e}")
+                html = None
+            if html is not None:
+                self._local_pages[key] = html
+
+        self.stats['hits' if html is not None else 'misses'] += 1
+        return html
+
+    def set(self, name, html, variant='', *, version):
+        """
+        Store rendered HTML for ``name`` under ``version``, the version read
+        before rendering it. Reading it again here would file a page rendered
+        from pre-commit data under a version bumped during the render, and
+        serve it until the next edit.
+        """
+        if self.cache is None or version is None:
+            return
+        key = self._page_key(version, name, variant)
+        try:
+            self.cache.set(key, html)
+            if version == self._local_version:
+                self._local_pages[key] = html
+        except Exception as e:
+            print(f"Page cache write error: {e}")
+
+    def purge(self):
+        """Drop every cached page by moving to a fresh version"""
+        self._local_version = None
+        self._local_pages = {}
+        return self.bump_version()
+
+    def get_stats(self):
+        """Get cache statistics for the admin dashboard"""
+        return {
+            'backend': type(self.cache.cache).__name__ if self.cache else None,
+            'version': self.get_version() if self.cache else None,
+            'local_pages': len(self._local_pages),
+            **self.stats
+        }
+
+
+# Global instance
+page_cache = PageCache()
@@ -0,0 +1,197 @@
+"""
+Keyset Pagination
+Seek pagination over a fixed sort order ending in the primary key, with
+signed opaque cursors instead of page offsets, so every page costs an index
+seek however deep it is. Total counts are cached per filter combination
+under a per-table version that is bumped when a commit writes that table
+"""
+
+import hashlib
+import json
+import math
+import uuid
+from datetime import datetime
+from itertools import chain
+
+from itsdangerous import BadData, URLSafeSerializer
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.types import DateTime
+
+VERSION_KEY = 'keyset:version:{table}'
+COUNT_TIMEOUT = 3600
+
+
+class Page:
+    """One page of results; iterates over its items like a Flask-SQLAlchemy Pagination"""
+
+    def __init__(self, items, total, per_page, page, has_prev, has_next, prev_cursor, next_cursor):
+        self.items = items
+        self.total = total
+        self.per_page = per_page
+        self.page = page
+        self.pages = max(1, math.ceil(total / per_page)) if total else 1
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class KeysetPagination:
+    def __init__(self):
+        self.cache = None
+        self.serializer = None
+        self.tracked_models = ()
+        self.stats = {'count_hits': 0, 'count_misses': 0, 'bad_cursors': 0}
+
+    def init_app(self, app, cache=None, tracked_models=()):
+        self.cache = cache
+        self.serializer = URLSafeSerializer(app.secret_key or 'keyset-pagination', salt='keyset-cursor')
+        self.tracked_models = tuple(tracked_models)
+        if self.tracked_models and not event.contains(Session, 'after_flush', self._track_changes):
+            event.listen(Session, 'after_flush', self._track_changes)
+            event.listen(Session, 'after_commit', self._commit_changes)
+            event.listen(Session, 'after_soft_rollback', self._discard_changes)
+        app.extensions['keyset_pagination'] = self
+
+    # Count versions
+
+    def _track_changes(self, session, flush_context):
+        tables = session.info.setdefault('keyset_dirty_tables', set())
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, self.tracked_models):
+                tables.add(obj.__tablename__)
+
+    def _commit_changes(self, session):
+        for table in session.info.pop('keyset_dirty_tables', ()):
+            self.bump_version(table)
+
+    @staticmethod
+    def _discard_changes(session, previous_transaction):
+        session.info.pop('keyset_dirty_tables', None)
+
+    def bump_version(self, table):
+        """Retire every cached count for ``table``"""
+        try:
+            if self.cache is not None:
+                self.cache.set(VERSION_KEY.format(table=table), uuid.uuid4().hex, timeout=0)
+        except Exception as e:
+            print(f"Pagination count version error: {e}")
+
+    def count(self, query, table, filters):
+        """Row count of ``query``, cached per filter combination until ``table`` is next written"""
+        if self.cache is None:
+            return query.order_by(None).count()
+        try:
+            version = self.cache.get(VERSION_KEY.format(table=table))
+            if version is None:
+                version = uuid.uuid4().hex
+                self.cache.set(VERSION_KEY.format(table=table), version, timeout=0)
+            key = f'keyset:count:{table}:{version}:{_digest(filters)}'
+            total = self.cache.get(key)
+        except Exception as e:
+            print(f"Pagination count cache error: {e}")
+            return query.order_by(None).count()
+
+        if total is None:
+            self.stats['count_misses'] += 1
+            total = query.order_by(None).count()
+            try:
+                self.cache.set(key, total, timeout=COUNT_TIMEOUT)
+            except Exception as e:
+                print(f"Pagination count cache error: {e}")
+        else:
+            self.stats['count_hits'] += 1
+        return total
+
+    # Cursors
+
+    def _encode(self, binding, key, direction, page):
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in key]
+        return self.serializer.dumps({'b': binding, 'k': values, 'd': direction, 'p': page})
+
+    def _decode(self, cursor, binding, order):
+        """(key, direction, page) from a cursor, or None when it is invalid or for another listing"""
+        try:
+            data = self.serializer.loads(cursor)
+            if data['b'] != binding or data['d'] not in ('next', 'prev') or len(data['k']) != len(order):
+                raise ValueError('cursor does not belong to this listing')
+            key = [datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None
+                   else value for column, value in zip(order, data['k'])]
+            if any(value is None for value in key):
+                raise ValueError('cursor has an empty key')
+            return key, data['d'], max(1, int(data['p']))
+        except (BadData, KeyError, TypeError, ValueError):
+            self.stats['bad_cursors'] += 1
+            return None
+
+    @staticmethod
+    def _seek(order, key, after):
+        """Rows strictly after (or before) ``key`` in the lexicographic order of ``order``"""
+        clauses = []
+        for index, column in enumerate(order):
+            equal = [order[i] == key[i] for i in range(index)]
+            clauses.append(and_(*equal, column > key[index] if after else column < key[index]))
+        # The redundant bound on the leading column is what lets the planner range-scan the index
+        leading = order[0] >= key[0] if after else order[0] <= key[0]
+        return and_(leading, or_(*clauses))
+
+    # Paging
+
+    def paginate(self, query, order, descending=False, cursor=None, per_page=20, filters=None):
+        """
+        Page of ``query`` sorted by the columns in ``order``, which must end
+        with the primary key so the order is total. ``filters`` identifies
+        the filter combination: counts are cached under it and cursors only
+        apply to the listing they came from.
+        """
+        order = tuple(order)
+        filters = filters or {}
+        table = query.column_descriptions[0]['entity'].__tablename__
+        binding = _digest([filters, [str(column) for column in order], descending])
+        total = self.count(query, table, filters)
+
+        decoded = self._decode(cursor, binding, order) if cursor else None
+        key, direction, page = decoded if decoded else (None, 'next', 1)
+        forward = direction == 'next'
+
+        # Walking backwards means reversing the order and the results
+        ascending = forward != descending
+        rows_query = query.add_columns(*order).order_by(
+            None).order_by(*(column.asc() if ascending else column.desc() for column in order))
+        if key is not None:
+            rows_query = rows_query.filter(self._seek(order, key, after=ascending))
+        rows = rows_query.limit(per_page + 1).all()
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if not forward:
+            rows.reverse()
+
+        items = [row[0] for row in rows]
+        keys = [tuple(row[1:]) for row in rows]
+        if forward:
+            has_prev, has_next = key is not None, more
+        else:
+            # Running out of rows going back means this is the first page
+            has_prev, has_next = more, True
+            if not more:
+                page = 1
+        return Page(
+            items, total, per_page, page, has_prev, has_next,
+            prev_cursor=self._encode(binding, keys[0], 'prev', page - 1) if has_prev and keys else None,
+            next_cursor=self._encode(binding, keys[-1], 'next', page + 1) if has_next and keys else None,
+        )
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+# Global instance
+keyset_pagination = KeysetPagination()
@@ -0,0 +1,146 @@
+"""
+Portfolio Snapshot
+Loads the portfolio content shared by the homepage, the git subdomain and the resume
+generator in a fixed number of queries
+"""
+
+from types import MappingProxyType
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import joinedload
+
+from database import db
+from models import (Project, ProjectCategory, SeoSettings, PersonalInfo,
+                    SocialLink, Skill, Experience, Education, Testimonial)
+
+HOMEPAGE_PROJECT_LIMIT = 9
+
+
+class PortfolioSnapshot:
+    """
+    Read-only bundle of portfolio content.
+
+    Collections are tuples and ``category_counts`` is a read-only mapping;
+    sections a loader does not fetch are left as None / empty.
+    """
+
+    __slots__ = (
+        'seo', 'personal', 'projects', 'project_categories', 'category_counts',
+        'social_links', 'skills', 'experience', 'education', 'testimonials',
+    )
+
+    def __init__(self, **sections):
+        unknown = set(sections) - set(self.__slots__)
+        if unknown:
+            raise TypeError(f"Unknown snapshot sections: {', '.join(sorted(unknown))}")
+        for name in self.__slots__:
+            value = sections.get(name)
+            if isinstance(value, list):
+                value = tuple(value)
+            elif isinstance(value, dict):
+                value = MappingProxyType(dict(value))
+            object.__setattr__(self, name, value if value is not None else self._empty(name))
+
+    @staticmethod
+    def _empty(name):
+        if name in ('seo', 'personal'):
+            return None
+        if name == 'category_counts':
+            return MappingProxyType({})
+        return ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PortfolioSnapshot is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('PortfolioSnapshot is immutable')
+
+    def __repr__(self):
+        return f'<PortfolioSnapshot projects={len(self.projects)} skills={len(self.skills)}>'
+
+    # Loaders
+
+    @classmethod
+    def for_homepage(cls, project_limit=HOMEPAGE_PROJECT_LIMIT):
+        """Everything index.html renders: 9 queries regardless of table sizes"""
+        return cls(
+            seo=_load_seo('home'),
+            personal=PersonalInfo.query.first(),
+            projects=_load_homepage_projects(project_limit),
+            project_categories=ProjectCategory.query.all(),
+            social_links=_load_social_links(),
+            skills=Skill.query.filter_by(is_featured=True).order_by(Skill.sort_order).all(),
+            experience=Experience.query.order_by(Experience.start_date.desc()).limit(3).all(),
+            education=Education.query.order_by(Education.start_date.desc()).limit(3).all(),
+            testimonials=Testimonial.query.filter_by(is_featured=True)
+                .order_by(Testimonial.sort_order, Testimonial.created_at.desc()).limit(25).all(),
+        )
+
+    @classmethod
+    def for_git(cls, seo_page='git'):
+        """SEO, profile and project categories with per-category project counts"""
+        counts = dict(
+            db.session.query(Project.category_id, func.count(Project.id))
+            .group_by(Project.category_id)
+            .all()
+        )
+        return cls(
+            seo=_load_seo(seo_page, fallback=False),
+            personal=PersonalInfo.query.first(),
+            project_categories=ProjectCategory.query.all(),
+            category_counts=counts,
+        )
+
+    @classmethod
+    def for_resume(cls):
+        """Full profile content used by the resume generator"""
+        return cls(
+            personal=PersonalInfo.query.first(),
+            social_links=_load_social_links(),
+            skills=Skill.query.order_by(Skill.category, Skill.sort_order).all(),
+            experience=Experience.query.order_by(Experience.is_current.desc(), Experience.start_date.desc()).all(),
+            education=Education.query.order_by(Education.is_current.desc(), Education.start_date.desc()).all(),
+            projects=Project.query.options(joinedload(Project.category))
+                .filter_by(is_featured=True).order_by(Project.created_at.desc()).all(),
+        )
+
+
+def _load_seo(page_name, fallback=True):
+    """SEO row for ``page_name``, optionally falling back to the first row, in one query"""
+    if not fallback:
+        return SeoSettings.query.filter_by(page_name=page_name).first()
+    preferred = case((SeoSettings.page_name == page_name, 0), else_=1)
+    return SeoSettings.query.order_by(preferred, SeoSettings.id).first()
+
+
+def _load_social_links():
+    return SocialLink.query.filter_by(is_active=True).order_by(SocialLink.sort_order).all()
+
+
+def _load_homepage_projects(limit):
+    """
+    Homepage projects, else featured projects, else the newest projects.
+
+    One ranked query with the LIMIT in SQL replaces the three separate
+    queries (one of which loaded every project row); categories are joined
+    in so the template does not lazy-load them per card.
+    """
+    rank = case(
+        (Project.show_on_homepage == True, 2),
+        (Project.is_featured == True, 1),
+        else_=0,
+    )
+    rows = (
+        Project.query.options(joinedload(Project.category))
+        .order_by(rank.desc(), Project.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        return rows
+
+    def rank_of(project):
+        return 2 if project.show_on_homepage else 1 if project.is_featured else 0
+
+    top = rank_of(rows[0])
+    return [project for project in rows if rank_of(project) == top]
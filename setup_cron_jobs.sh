@@ -79,8 +79,9 @@ cat > $TEMP_CRON << 'EOF'
 # SEO audit: Weekly on Monday at 6:00 AM
 0 6 * * 1 cd /home/portfolio/portfolio && source venv/bin/activate && python seo_audit.py >> /home/portfolio/logs/seo_audit.log 2>&1
 
-# GitHub repository sync: Every 2 hours (for git subdomain)
-0 */2 * * * cd /home/portfolio/portfolio && source venv/bin/activate && python setup_github.py >> /home/portfolio/logs/github_sync.log 2>&1
+# GitHub repository sync: Every 2 hours (for git subdomain). Page requests never call GitHub;
+# run `flask update-github-data --daemon` as a service instead for a shorter interval.
+0 */2 * * * cd /home/portfolio/portfolio && source venv/bin/activate && FLASK_APP=app.py flask update-github-data --batch-size 10 >> /home/portfolio/logs/github_sync.log 2>&1
 
 # System resource cleanup: Daily at 4:30 AM
 30 4 * * * find /tmp -name "*.tmp" -mtime +1 -delete && docker system prune -f >> /home/portfolio/logs/cleanup.log 2>&1 || true
@@ -0,0 +1,254 @@
+"""
+Sitemaps
+One sitemap for the main site and its subdomains, streamed from generators
+with lastmod taken from the content tables. Past ``max_urls`` it becomes a
+sitemap index over per-section files. Output is cached under a fingerprint of
+the content (row counts and latest change per section), which also serves as
+the ETag, so any write invalidates it without extra bookkeeping
+"""
+
+import hashlib
+import os
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from flask import Response, request, stream_with_context
+from sqlalchemy import func
+
+from config import SUBDOMAINS
+from database import db
+from models import (WikiArticle, Project, DonationProject, PersonalInfo, SeoSettings)
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+SECTIONS = ('pages', 'wiki', 'git', 'donation')
+# Rows read per query while streaming a section
+CHUNK_SIZE = 1000
+# Entries in the 'pages' section: home, privacy and the three subdomain roots
+PAGE_COUNT = 5
+
+
+def _w3c(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+class SitemapGenerator:
+    def __init__(self, max_urls=50000):
+        # The protocol allows 50,000 URLs per file
+        self.max_urls = max_urls
+        self.cache = None
+        self.privacy_template = None
+        self.timeout = 24 * 3600
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+    def init_app(self, app, cache=None):
+        self.max_urls = int(os.getenv('SITEMAP_MAX_URLS', self.max_urls))
+        self.cache = cache
+        self.privacy_template = os.path.join(app.root_path, 'templates', 'privacy.html')
+        app.extensions['sitemaps'] = self
+
+    # Content state
+
+    @staticmethod
+    def _project_lastmod():
+        return func.coalesce(Project.last_updated, Project.created_at)
+
+    def section_state(self):
+        """{section: (url count, latest change)} from one aggregate query per table"""
+        wiki = db.session.query(func.count(WikiArticle.id), func.max(WikiArticle.updated_at)).one()
+        git = db.session.query(func.count(Project.id), func.max(self._project_lastmod())).one()
+        donation = db.session.query(func.count(DonationProject.id), func.max(DonationProject.updated_at)) \
+            .filter(DonationProject.is_active.is_(True)).one()
+        home = max(filter(None, (
+            db.session.query(func.max(PersonalInfo.updated_at)).scalar(),
+            db.session.query(func.max(SeoSettings.updated_at)).scalar(),
+            git[1],
+        )), default=None)
+        return {
+            'pages': (PAGE_COUNT, home),
+            'wiki': tuple(wiki),
+            'git': tuple(git),
+            'donation': tuple(donation),
+        }
+
+    def fingerprint(self, state, base_url):
+        raw = repr((sorted(state.items()), self._privacy_lastmod(), base_url, self.max_urls)).encode('utf-8')
+        return hashlib.sha1(raw).hexdigest()
+
+    def pages(self, state):
+        """[(section, page)] files needed, or None when one file holds everything"""
+        if sum(count for count, _ in state.values()) <= self.max_urls:
+            return None
+        return [(section, page) for section in SECTIONS
+                for page in range(1, max(1, -(-state[section][0] // self.max_urls)) + 1)
+                if state[section][0]]
+
+    # Entries: (loc, lastmod, changefreq, priority)
+
+    def _privacy_lastmod(self):
+        if self.privacy_template and os.path.exists(self.privacy_template):
+            return datetime.utcfromtimestamp(os.path.getmtime(self.privacy_template))
+        return None
+
+    def _page_entries(self, latest, base_url=''):
+        return [
+            (f'{base_url}/', latest['home'], 'weekly', '1.0'),
+            (f'{base_url}/privacy', self._privacy_lastmod(), 'yearly', '0.3'),
+            (f"{SUBDOMAINS['wiki']['url']}/", latest['wiki'], 'weekly', '0.8'),
+            (f"{SUBDOMAINS['git']['url']}/", latest['git'], 'daily', '0.8'),
+            (f"{SUBDOMAINS['donation']['url']}/", latest['donation'], 'monthly', '0.5'),
+        ]
+
+    def _rows(self, query, id_column, offset, limit):
+        """Stream (id, lastmod) rows in id order, CHUNK_SIZE at a time"""
+        last_id, remaining = None, limit
+        query = query.order_by(id_column)
+        if offset:
+            first = query.with_entities(id_column).offset(offset).limit(1).scalar()
+            if first is None:
+                return
+            query = query.filter(id_column >= first)
+        while remaining is None or remaining > 0:
+            batch_query = query if last_id is None else query.filter(id_column > last_id)
+            size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+            batch = batch_query.limit(size).all()
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1][0]
+            if remaining is not None:
+                remaining -= len(batch)
+
+    def entries(self, section, state, base_url, offset=0, limit=None):
+        if section == 'pages':
+            latest = {'home': state['pages'][1], 'wiki': state['wiki'][1], 'git': state['git'][1],
+                      'donation': state['donation'][1]}
+            yield from self._page_entries(latest, base_url)[offset:None if limit is None else offset + limit]
+        elif section == 'wiki':
+            base = SUBDOMAINS['wiki']['url']
+            query = db.session.query(WikiArticle.id, WikiArticle.updated_at)
+            for article_id, updated_at in self._rows(query, WikiArticle.id, offset, limit):
+                yield f'{base}/article/{article_id}', updated_at, 'monthly', '0.7'
+        elif section == 'git':
+            base = SUBDOMAINS['git']['url']
+            query = db.session.query(Project.id, self._project_lastmod())
+            for project_id, lastmod in self._rows(query, Project.id, offset, limit):
+                yield f'{base}/project/{project_id}', lastmod, 'weekly', '0.6'
+        elif section == 'donation':
+            base = SUBDOMAINS['donation']['url']
+            query = db.session.query(DonationProject.id, DonationProject.updated_at) \
+                .filter(DonationProject.is_active.is_(True))
+            for project_id, updated_at in self._rows(query, DonationProject.id, offset, limit):
+                yield f'{base}/project/{project_id}', updated_at, 'weekly', '0.5'
+
+    # XML
+
+    @staticmethod
+    def _urlset(entries):
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+        for loc, lastmod, changefreq, priority in entries:
+            lastmod_tag = f'<lastmod>{_w3c(lastmod)}</lastmod>' if lastmod else ''
+            yield (f'  <url><loc>{escape(loc)}</loc>{lastmod_tag}'
+                   f'<changefreq>{changefreq}</changefreq><priority>{priority}</priority></url>\n')
+        yield '</urlset>\n'
+
+    @staticmethod
+    def _index(files):
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+        for loc, lastmod in files:
+            lastmod_tag = f'<lastmod>{_w3c(lastmod)}</lastmod>' if lastmod else ''
+            yield f'  <sitemap><loc>{escape(loc)}</loc>{lastmod_tag}</sitemap>\n'
+        yield '</sitemapindex>\n'
+
+    def generate(self, state, base_url, files_url, section=None, page=None):
+        """
+        XML chunks for the root sitemap (section None) or one section file.
+        ``files_url`` is where section files are published, for the index.
+        """
+        layout = self.pages(state)
+        if section is None:
+            if layout is None:
+                return self._urlset(entry for name in SECTIONS for entry in self.entries(name, state, base_url))
+            return self._index((f'{files_url}/sitemap-{name}-{number}.xml', state[name][1])
+                               for name, number in layout)
+        if layout is None or (section, page) not in layout:
+            return None
+        return self._urlset(self.entries(section, state, base_url,
+                                         offset=(page - 1) * self.max_urls, limit=self.max_urls))
+
+    # Serving
+
+    def _cache_get(self, key):
+        try:
+            return self.cache.get(key) if self.cache is not None else None
+        except Exception as e:
+            print(f"Sitemap cache read error: {e}")
+            return None
+
+    def _cache_set(self, key, xml):
+        try:
+            if self.cache is not None:
+                self.cache.set(key, xml, timeout=self.timeout)
+        except Exception as e:
+            print(f"Sitemap cache write error: {e}")
+
+    def response(self, base_url, section=None, page=None):
+        """Cached, conditional response for /sitemap.xml or /sitemap-<section>-<page>.xml"""
+        base_url = base_url.rstrip('/')
+        state = self.section_state()
+        etag = self.fingerprint(state, base_url)
+        last_modified = max((lastmod for _, lastmod in state.values() if lastmod), default=None)
+
+        def finish(resp):
+            resp.set_etag(etag)
+            if last_modified:
+                resp.last_modified = last_modified
+            resp.headers['Cache-Control'] = 'public, max-age=3600'
+            return resp
+
+        if etag in request.if_none_match:
+            self.stats['not_modified'] += 1
+            return finish(Response(status=304))
+
+        key = f'sitemap:{section or "root"}:{page or 0}:{etag}'
+        xml = self._cache_get(key)
+        if xml is not None:
+            self.stats['hits'] += 1
+            return finish(Response(xml, mimetype='application/xml'))
+
+        chunks = self.generate(state, base_url, base_url, section, page)
+        if chunks is None:
+            return None
+        self.stats['misses'] += 1
+
+        def stream():
+            written = []
+            for chunk in chunks:
+                written.append(chunk)
+                yield chunk
+            # Only a complete document is cached
+            self._cache_set(key, ''.join(written))
+
+        return finish(Response(stream_with_context(stream()), mimetype='application/xml'))
+
+    def write_files(self, output_file, base_url, files_url=None):
+        """Write the sitemap (and section files beside it when split); returns the paths written"""
+        base_url = base_url.rstrip('/')
+        directory = os.path.dirname(output_file) or '.'
+        if not files_url:
+            relative = os.path.relpath(directory).replace(os.sep, '/')
+            files_url = base_url if relative == '.' else f'{base_url}/{relative}'
+        files_url = files_url.rstrip('/')
+        os.makedirs(directory, exist_ok=True)
+        state = self.section_state()
+
+        targets = [(output_file, None, None)]
+        for section, page in self.pages(state) or ():
+            targets.append((os.path.join(directory, f'sitemap-{section}-{page}.xml'), section, page))
+        for path, section, page in targets:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(self.generate(state, base_url, files_url, section, page))
+        return [path for path, _, _ in targets]
+
+
+# Global instance
+sitemaps = SitemapGenerator()
@@ -0,0 +1,171 @@
+"""
+SMTP Connection Pool
+Reuses authenticated SMTP connections across sends instead of paying for
+connect, STARTTLS and login on every message
+"""
+
+import atexit
+import os
+import smtplib
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+# Errors after which a connection is not worth keeping. Not OSError as a whole:
+# SMTPException subclasses it, and protocol errors (a refused recipient) leave
+# the session usable once reset
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+
+class _PooledConnection:
+    __slots__ = ('smtp', 'created_at', 'last_used', 'messages')
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.created_at = self.last_used = time.monotonic()
+        self.messages = 0
+
+
+class SMTPPool:
+    """
+    Thread-safe pool of logged-in ``smtplib.SMTP`` connections.
+
+    At most ``max_connections`` are open at once; further senders wait.
+    Idle connections older than ``idle_timeout`` are closed, ones idle for
+    more than ``health_check_after`` are probed with NOOP before reuse, and
+    a send that finds the connection dropped reconnects and retries once.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 max_connections=2, idle_timeout=60, health_check_after=5,
+                 max_messages=100, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        # Providers such as Gmail close sessions after a number of messages
+        self.max_messages = max_messages
+        self.timeout = timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._pid = os.getpid()
+        self.stats = {'sent': 0, 'connects': 0, 'reused': 0, 'reconnects': 0, 'health_check_failures': 0}
+        atexit.register(self.close)
+
+    # Connections
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self._quit(smtp)
+            raise
+        self.stats['connects'] += 1
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _quit(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _healthy(self, conn):
+        now = time.monotonic()
+        if now - conn.last_used > self.idle_timeout or conn.messages >= self.max_messages:
+            return False
+        if now - conn.last_used <= self.health_check_after:
+            return True
+        try:
+            if conn.smtp.noop()[0] == 250:
+                return True
+        except OSError:  # any SMTP or socket failure fails the probe
+            pass
+        self.stats['health_check_failures'] += 1
+        return False
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    # Forked worker: the sockets belong to the parent
+                    self._idle = []
+                    self._pid = os.getpid()
+                if not self._idle:
+                    break
+                candidate = self._idle.pop()  # most recently used first
+            if self._healthy(candidate):
+                self.stats['reused'] += 1
+                return candidate
+            self._quit(candidate.smtp)
+        return self._connect()
+
+    def _checkin(self, conn):
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a logged-in connection; it is discarded if the block raises a connection error"""
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            except CONNECTION_ERRORS:
+                conn.smtp.close()
+                raise
+            except BaseException:
+                self._discard_or_keep(conn)
+                raise
+            else:
+                self._checkin(conn)
+
+    def _discard_or_keep(self, conn):
+        """After a protocol error the session may still be usable once reset"""
+        try:
+            conn.smtp.rset()
+            self._checkin(conn)
+        except Exception:
+            conn.smtp.close()
+
+    # Sending
+
+    def send(self, from_addr, to_addrs, message):
+        """sendmail() through a pooled connection, reconnecting once if the server dropped it"""
+        for attempt in (1, 2):
+            try:
+                with self.connection() as conn:
+                    conn.smtp.sendmail(from_addr, to_addrs, message)
+                    conn.messages += 1
+                self.stats['sent'] += 1
+                return
+            except smtplib.SMTPServerDisconnected:
+                if attempt == 2:
+                    raise
+                self.stats['reconnects'] += 1
+
+    def close(self):
+        """Quit every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._quit(conn.smtp)
+
+    def get_stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return dict(self.stats, idle=idle, max_connections=self.max_connections)
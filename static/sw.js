@@ -1,23 +1,18 @@
 // Service Worker for Lusan Sapkota Portfolio PWA
-// Version 1.1.0 - Fixed POST request caching issue
+// Precache list and version are written by `flask build-assets` from the asset manifest
 
-const CACHE_NAME = 'lusan-portfolio-v1.1.0';
-const STATIC_CACHE = 'lusan-static-v1.1.0';
-const DYNAMIC_CACHE = 'lusan-dynamic-v1.1.0';
-
-// Resources to cache
+// BEGIN GENERATED PRECACHE
+const ASSET_VERSION = 'dev';
 const STATIC_ASSETS = [
     '/',
-    '/static/assets/css/style.css',
-    '/static/assets/css/animate.css',
-    '/static/assets/css/responsive.css',
-    '/static/assets/js/main.js',
-    '/static/assets/logo/logo.png',
-    '/static/assets/images/profile.webp',
-    '/static/assets/images/profile.png',
-    '/static/manifest.json',
-    '/offline.html'
+    '/offline.html',
+    '/static/manifest.json'
 ];
+// END GENERATED PRECACHE
+
+// Cache names follow the asset build, so a new build retires the old caches
+const STATIC_CACHE = `lusan-static-${ASSET_VERSION}`;
+const DYNAMIC_CACHE = `lusan-dynamic-${ASSET_VERSION}`;
 
 // API endpoints that should be cached
 const API_CACHE_ENDPOINTS = [
@@ -0,0 +1,140 @@
+"""
+Subdomain Dispatcher
+Routes wiki., git., donation. and store. hosts through URL maps compiled once at startup
+"""
+
+from flask import Flask
+from werkzeug.routing import Map, Rule
+
+# Subdomain label -> blueprint name. Blueprints are registered under a URL
+# prefix of the same name when SERVER_NAME is not configured.
+SUBDOMAIN_BLUEPRINTS = {
+    'wiki': 'wiki',
+    'git': 'git',
+    'donation': 'donation',
+    'store': 'store',
+}
+
+
+class SubdomainDispatcher:
+    def __init__(self, subdomains=None):
+        self.subdomains = dict(subdomains or SUBDOMAIN_BLUEPRINTS)
+        self.server_name = None
+        self._maps = {}
+
+    def init_app(self, app):
+        """Compile one URL map per subdomain. Call after blueprints are registered."""
+        self.server_name = app.config.get('SERVER_NAME')
+        self._maps = {
+            label: self._compile_map(app, label, blueprint)
+            for label, blueprint in self.subdomains.items()
+        }
+        app.extensions['subdomain_dispatcher'] = self
+        print(f"Subdomain Dispatcher: compiled maps for {', '.join(sorted(self._maps))}")
+
+    def _compile_map(self, app, label, blueprint):
+        """
+        Build the URL map served on ``<label>.<domain>``.
+
+        The blueprint's own routes are mounted at the host root (``/wiki/search``
+        becomes ``/search``). Every other app rule is kept so ``url_for('index')``
+        and ``url_for('static')`` still build from subdomain pages; rules that
+        would shadow a subdomain route, and routes owned by other subdomain
+        blueprints, are kept as build-only.
+        """
+        prefix = '' if self.server_name else f'/{blueprint}'
+        subdomain = label if self.server_name else ''
+        own_prefix = f'{blueprint}.'
+        other_prefixes = tuple(f'{bp}.' for bp in self.subdomains.values() if bp != blueprint)
+
+        rules = []
+        matched_paths = set()
+
+        for rule in app.url_map.iter_rules():
+            if not rule.endpoint.startswith(own_prefix) or rule.endpoint == f'{blueprint}.static':
+                continue
+            path = rule.rule[len(prefix):] if prefix and rule.rule.startswith(prefix) else rule.rule
+            path = path or '/'
+            rules.append(self._copy_rule(rule, path, subdomain=subdomain))
+            matched_paths.add(path)
+
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint.startswith(own_prefix) and rule.endpoint != f'{blueprint}.static':
+                # Keep the prefixed form reachable for links built before the switch
+                if prefix:
+                    rules.append(self._copy_rule(rule, rule.rule, subdomain=subdomain))
+                continue
+            if rule.endpoint.startswith(other_prefixes) and self.server_name:
+                rules.append(self._copy_rule(rule, rule.rule, subdomain=rule.subdomain, build_only=True))
+            elif rule.rule in matched_paths:
+                rules.append(self._copy_rule(rule, rule.rule, subdomain='', build_only=True))
+            else:
+                rules.append(self._copy_rule(rule, rule.rule, subdomain=subdomain))
+                matched_paths.add(rule.rule)
+
+        return Map(
+            rules,
+            strict_slashes=app.url_map.strict_slashes,
+            merge_slashes=app.url_map.merge_slashes,
+            converters=app.url_map.converters,
+        )
+
+    def _copy_rule(self, rule, path, subdomain, build_only=False):
+        """Return an unbound copy of ``rule`` at ``path``"""
+        return Rule(
+            path,
+            endpoint=rule.endpoint,
+            methods=rule.methods,
+            defaults=rule.defaults,
+            subdomain=subdomain,
+            build_only=build_only or rule.build_only,
+            strict_slashes=rule.strict_slashes,
+            merge_slashes=rule.merge_slashes,
+            redirect_to=rule.redirect_to,
+            alias=rule.alias,
+            websocket=rule.websocket,
+        )
+
+    def label_for_host(self, host):
+        """Return the subdomain label for a Host header, or None for the main site"""
+        label, dot, _ = host.partition('.')
+        if not dot:
+            return None
+        label = label.lower()
+        return label if label in self._maps else None
+
+    def bind(self, request):
+        """
+        Return a MapAdapter for the request's host, or None to use the
+        application's own URL map.
+        """
+        label = self.label_for_host(request.host)
+        if label is None:
+            return None
+
+        return self._maps[label].bind_to_environ(
+            request.environ,
+            server_name=self.server_name,
+            subdomain=label if self.server_name else '',
+        )
+
+    def get_stats(self):
+        """Get rule counts per compiled subdomain map"""
+        return {label: len(list(url_map.iter_rules())) for label, url_map in self._maps.items()}
+
+
+class SubdomainFlask(Flask):
+    """Flask application that resolves subdomain hosts through the dispatcher table"""
+
+    def create_url_adapter(self, request):
+        if request is not None:
+            dispatcher = self.extensions.get('subdomain_dispatcher')
+            if dispatcher is not None:
+                adapter = dispatcher.bind(request)
+                if adapter is not None:
+                    return adapter
+        return super().create_url_adapter(request)
+
+
+# Global instance
+subdomain_dispatcher = SubdomainDispatcher()
@@ -0,0 +1,242 @@
+"""
+Task Queue
+Durable background work backed by the queued_task table. Requests enqueue a
+row in their own transaction; a separate worker process (``flask
+run-task-worker``) claims due rows and runs them on a bounded thread pool,
+retrying failures with backoff and dead-lettering tasks that keep failing
+"""
+
+import json
+import logging
+import os
+import random
+import signal
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from database import db
+from models import QueuedTask
+
+logger = logging.getLogger(__name__)
+
+
+class TaskError(Exception):
+    """Raised by a handler to fail the current attempt; the task is retried"""
+
+
+class TaskQueue:
+    """
+    At-least-once task queue.
+
+    A worker claims a task by moving it to 'running' under a lease; if the
+    worker dies the lease expires and another worker claims it again, so a
+    handler may run more than once and should tolerate that. A handler that
+    raises is retried after an exponential, jittered delay until
+    ``max_attempts``, then left in 'dead' for inspection and requeueing.
+    """
+
+    def __init__(self, max_attempts=5, lease_seconds=300, backoff_base=30, backoff_max=3600):
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._handlers = {}
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.max_attempts = int(os.getenv('TASK_MAX_ATTEMPTS', self.max_attempts))
+        self.lease_seconds = int(os.getenv('TASK_LEASE_SECONDS', self.lease_seconds))
+        self.backoff_base = float(os.getenv('TASK_BACKOFF_BASE', self.backoff_base))
+        self.backoff_max = float(os.getenv('TASK_BACKOFF_MAX', self.backoff_max))
+        app.extensions['task_queue'] = self
+
+    # Registration and enqueueing
+
+    def task(self, name):
+        """Register a handler; it is called with the enqueued keyword arguments inside an app context"""
+        def decorator(func):
+            self._handlers[name] = func
+            return func
+        return decorator
+
+    def enqueue(self, name, /, delay=None, max_attempts=None, **payload):
+        """
+        Add a task to the current session. It is not committed here, so it is
+        stored together with whatever the caller commits next.
+        """
+        if name not in self._handlers:
+            raise ValueError(f'Unknown task: {name}')
+        task = QueuedTask(
+            name=name,
+            payload=json.dumps(payload),
+            max_attempts=max_attempts or self.max_attempts,
+            run_at=datetime.utcnow() + timedelta(seconds=delay or 0),
+        )
+        db.session.add(task)
+        return task
+
+    # Worker
+
+    def run_worker(self, app, workers=2, poll_interval=1.0, once=False, log=print):
+        """Claim and run due tasks on ``workers`` threads until stopped (or the queue is empty with ``once``)"""
+        self._stop.clear()
+        if not once:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: self.stop())
+
+        log(f'Task worker started ({workers} threads, handlers: {", ".join(sorted(self._handlers))})')
+        processed = 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='task-worker') as pool:
+            while not self._stop.is_set():
+                free = workers - len(running)
+                claimed = []
+                if free:
+                    try:
+                        claimed = self._claim(free)
+                    except Exception as e:
+                        log(f'Claiming tasks failed: {e}')
+                        db.session.rollback()
+                    finally:
+                        db.session.remove()
+                for task_id, name, payload, token in claimed:
+                    running.add(pool.submit(self._execute, app, task_id, name, payload, token))
+
+                if running:
+                    done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    processed += len(done)
+                    running = set(running)
+                elif once:
+                    break
+                else:
+                    self._stop.wait(poll_interval)
+            # Finish what was claimed; anything cut short is reclaimed after its lease
+            wait(running)
+            processed += len(running)
+        log(f'Task worker stopped after {processed} tasks')
+        return processed
+
+    def stop(self):
+        self._stop.set()
+
+    def _claim(self, limit):
+        """Lease up to ``limit`` due tasks; returns (id, name, payload, token) tuples"""
+        now = datetime.utcnow()
+        table = QueuedTask.__table__
+        due = ((table.c.status == 'pending') & (table.c.run_at <= now)) | \
+              ((table.c.status == 'running') & (table.c.locked_until < now))
+
+        # A lease that expired on the final attempt is not retried again
+        db.session.execute(
+            update(table)
+            .where(table.c.status == 'running', table.c.locked_until < now,
+                   table.c.attempts >= table.c.max_attempts)
+            .values(status='dead', finished_at=now, locked_by=None,
+                    last_error='Worker stopped during the final attempt')
+        )
+
+        ids = [row.id for row in db.session.execute(
+            db.select(table.c.id).where(due).order_by(table.c.run_at).limit(limit))]
+        if not ids:
+            db.session.commit()
+            return []
+        # The due-condition guard makes the claim exclusive if another worker races us
+        token = uuid.uuid4().hex
+        db.session.execute(
+            update(table).where(table.c.id.in_(ids), due).values(
+                status='running', locked_by=token,
+                locked_until=now + timedelta(seconds=self.lease_seconds),
+                attempts=table.c.attempts + 1,
+            )
+        )
+        db.session.commit()
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.name, table.c.payload).where(table.c.locked_by == token)
+        ).all()
+        return [(row.id, row.name, row.payload, token) for row in rows]
+
+    def _execute(self, app, task_id, name, payload, token):
+        with app.app_context():
+            error = None
+            try:
+                handler = self._handlers.get(name)
+                if handler is None:
+                    raise TaskError(f'No handler registered for {name}')
+                handler(**json.loads(payload))
+            except Exception as e:
+                db.session.rollback()
+                error = f'{type(e).__name__}: {e}'[:1000]
+                logger.warning(f'Task {task_id} ({name}) failed: {error}')
+            try:
+                self._finish(task_id, token, error)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Could not record the outcome of task {task_id}: {e}')
+            finally:
+                db.session.remove()
+
+    def _finish(self, task_id, token, error):
+        now = datetime.utcnow()
+        table = QueuedTask.__table__
+        # Only the holder of the lease records the outcome
+        owned = (table.c.id == task_id) & (table.c.locked_by == token)
+        if error is None:
+            db.session.execute(update(table).where(owned).values(
+                status='done', finished_at=now, locked_by=None, locked_until=None, last_error=None))
+        else:
+            attempts, max_attempts = db.session.execute(
+                db.select(table.c.attempts, table.c.max_attempts).where(table.c.id == task_id)).one()
+            if attempts >= max_attempts:
+                values = {'status': 'dead', 'finished_at': now}
+                logger.error(f'Task {task_id} dead after {attempts} attempts: {error}')
+            else:
+                values = {'status': 'pending', 'run_at': now + timedelta(seconds=self.backoff(attempts))}
+            db.session.execute(update(table).where(owned).values(
+                locked_by=None, locked_until=None, last_error=error, **values))
+        db.session.commit()
+
+    def backoff(self, attempts):
+        """Seconds before retrying after the given number of failed attempts (equal jitter)"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    # Inspection
+
+    def get_stats(self):
+        counts = dict(db.session.query(QueuedTask.status, db.func.count(QueuedTask.id))
+                      .group_by(QueuedTask.status).all())
+        oldest = db.session.query(db.func.min(QueuedTask.run_at)).filter(
+            QueuedTask.status == 'pending', QueuedTask.run_at <= datetime.utcnow()).scalar()
+        return {
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'done': counts.get('done', 0),
+            'dead': counts.get('dead', 0),
+            'oldest_due_seconds': round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0,
+            'handlers': sorted(self._handlers),
+        }
+
+    def requeue_dead(self, task_id=None):
+        """Give dead tasks a fresh set of attempts; returns how many were requeued"""
+        query = update(QueuedTask).where(QueuedTask.status == 'dead')
+        if task_id:
+            query = query.where(QueuedTask.id == task_id)
+        result = db.session.execute(query.values(
+            status='pending', attempts=0, run_at=datetime.utcnow(), finished_at=None))
+        db.session.commit()
+        return result.rowcount
+
+    def purge_done(self, older_than=timedelta(days=7)):
+        """Delete finished tasks older than ``older_than``"""
+        result = db.session.execute(db.delete(QueuedTask).where(
+            QueuedTask.status == 'done', QueuedTask.finished_at < datetime.utcnow() - older_than))
+        db.session.commit()
+        return result.rowcount
+
+
+# Global instance
+task_queue = TaskQueue()
@@ -0,0 +1,86 @@
+"""
+Background Tasks
+Email and image work queued by request handlers and run by the task worker.
+Each EmailService call reports failure by returning False; that fails the
+attempt so the queue retries it
+"""
+
+from datetime import datetime
+
+from database import db
+from email_service import email_service
+from images import images
+from models import ContactSubmission, Donation
+from task_queue import task_queue, TaskError
+
+
+def _sent(ok, description):
+    if not ok:
+        raise TaskError(f'Could not send {description}')
+
+
+@task_queue.task('contact_notification')
+def contact_notification(submission_id):
+    """Forward a contact submission to the admin and mark it replied"""
+    submission = db.session.get(ContactSubmission, submission_id)
+    if submission is None or submission.is_replied:
+        return
+    _sent(email_service.send_contact_notification(submission.name, submission.email,
+                                                  submission.subject, submission.message),
+          f'contact notification for submission #{submission_id}')
+    submission.is_replied = True
+    submission.replied_at = datetime.now()
+    db.session.commit()
+
+
+@task_queue.task('contact_auto_reply')
+def contact_auto_reply(name, email, subject):
+    _sent(email_service.send_contact_auto_reply(name, email, subject), f'contact auto-reply to {email}')
+
+
+@task_queue.task('newsletter_welcome')
+def newsletter_welcome(email, name=None):
+    _sent(email_service.send_newsletter_welcome(email, name), f'newsletter welcome to {email}')
+
+
+@task_queue.task('donation_thank_you')
+def donation_thank_you(donation_id):
+    donation = db.session.get(Donation, donation_id)
+    if donation is None:
+        return
+    _sent(email_service.send_donation_thank_you(donation.donor_email, donation.donor_name, donation.amount,
+                                                donation.project.title, donation.currency),
+          f'thank-you for donation #{donation_id}')
+
+
+@task_queue.task('admin_donation_notification')
+def admin_donation_notification(donation_id):
+    donation = db.session.get(Donation, donation_id)
+    if donation is None:
+        return
+    _sent(email_service.send_admin_donation_notification(donation, donation.project.title),
+          f'admin notification for donation #{donation_id}')
+
+
+@task_queue.task('donation_confirmation')
+def donation_confirmation(donation_id, amount=None):
+    donation = db.session.get(Donation, donation_id)
+    if donation is None:
+        return
+    _sent(email_service.send_donation_confirmation(donation, donation.project.title, amount),
+          f'confirmation for donation #{donation_id}')
+
+
+@task_queue.task('admin_login_notification')
+def admin_login_notification(username, ip_address, timestamp):
+    """Login alert to the admin, with the location of the login IP"""
+    _sent(email_service.send_admin_notification(username, ip_address, datetime.fromisoformat(timestamp)),
+          f'admin login notification for {username}')
+
+
+@task_queue.task('image_variants')
+def image_variants(path):
+    """Responsive variants for an image an admin attached to a project"""
+    stats = images.build([path], log=lambda message: None)
+    if stats['failed']:
+        raise TaskError(f'Could not generate image variants for {path}')
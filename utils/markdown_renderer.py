@@ -0,0 +1,68 @@
+"""
+Markdown rendering shared by the `markdown` template filter and wiki articles.
+
+Wiki articles store their rendered HTML, table of contents and a content
+hash at write time; ``content_hash`` includes ``RENDERER_VERSION`` so bumping
+it (after changing extensions or their config) marks every stored render as
+stale.
+"""
+
+import hashlib
+import threading
+
+import markdown
+
+RENDERER_VERSION = '1'
+
+EXTENSIONS = [
+    'codehilite',  # Syntax highlighting for code blocks
+    'fenced_code',  # Support for fenced code blocks
+    'tables',  # Support for tables
+    'toc',  # Table of contents
+    'nl2br',  # Convert newlines to <br>
+]
+
+EXTENSION_CONFIGS = {
+    'codehilite': {
+        'css_class': 'highlight',
+        'use_pygments': True,
+    }
+}
+
+# Markdown instances are reusable after reset() but not thread-safe
+_local = threading.local()
+
+
+def _get_markdown():
+    md = getattr(_local, 'md', None)
+    if md is None:
+        md = markdown.Markdown(extensions=EXTENSIONS, extension_configs=EXTENSION_CONFIGS)
+        _local.md = md
+    return md
+
+
+def render_markdown(text):
+    """Render markdown text. Returns (html, toc_html); toc_html is '' without headings."""
+    if not text:
+        return '', ''
+    md = _get_markdown()
+    try:
+        html = md.convert(text)
+        toc = md.toc if getattr(md, 'toc_tokens', None) else ''
+    finally:
+        md.reset()
+    return html, toc
+
+
+def content_hash(text):
+    """Hash identifying a render of ``text`` with the current renderer"""
+    digest = hashlib.sha256(f'{RENDERER_VERSION}\x00'.encode('utf-8'))
+    digest.update((text or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_for_storage(item):
+    """Render an (id, text) pair; returns (id, html, toc, hash). Safe to run in a worker process."""
+    article_id, text = item
+    html, toc = render_markdown(text)
+    return article_id, html, toc, content_hash(text)
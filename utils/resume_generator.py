@@ -6,7 +6,6 @@ Produces both TXT and HTML formats.
 
 import re
 from datetime import datetime
-from models import PersonalInfo, SocialLink, Skill, Experience, Education, Project
 from database import db
 import os
 
@@ -109,13 +108,16 @@ def _fallback_education():
 
 def get_portfolio_data():
     """Fetch all required data from database for resume generation."""
+    from portfolio_snapshot import PortfolioSnapshot
+
+    snapshot = PortfolioSnapshot.for_resume()
     data = {
-        'personal': PersonalInfo.query.first(),
-        'social_links': SocialLink.query.filter_by(is_active=True).order_by(SocialLink.sort_order).all(),
-        'skills': Skill.query.order_by(Skill.category, Skill.sort_order).all(),
-        'experiences': Experience.query.order_by(Experience.is_current.desc(), Experience.start_date.desc()).all(),
-        'education': Education.query.order_by(Education.is_current.desc(), Education.start_date.desc()).all(),
-        'featured_projects': Project.query.filter_by(is_featured=True).order_by(Project.created_at.desc()).all(),
+        'personal': snapshot.personal,
+        'social_links': snapshot.social_links,
+        'skills': snapshot.skills,
+        'experiences': snapshot.experience,
+        'education': snapshot.education,
+        'featured_projects': snapshot.projects,
     }
     return data
 
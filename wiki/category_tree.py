@@ -0,0 +1,159 @@
+"""
+Category Tree
+The wiki category hierarchy with direct and rolled-up article counts and the
+article links the sidebar lists, built from two queries (categories joined to
+grouped article counts, then article titles) instead of a COUNT and a lazy
+load per category. The tree is immutable and kept per worker under a version
+token in the shared cache, bumped after commits that change categories or
+which article sits where
+"""
+
+import threading
+import uuid
+from collections import namedtuple
+from itertools import chain
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from models import WikiArticle, WikiCategory
+
+VERSION_KEY = 'category_tree:version'
+PENDING_KEY = 'wiki_category_tree_changed'
+
+# ``subcategories`` and ``articles`` mirror the WikiCategory attributes templates used before
+CategoryNode = namedtuple('CategoryNode', 'id name description parent_id article_count total_count '
+                                          'subcategories articles')
+ArticleLink = namedtuple('ArticleLink', 'id title')
+Tree = namedtuple('Tree', 'version roots by_id')
+
+
+class CategoryTree:
+    def __init__(self):
+        self.cache = None
+        self._tree = None
+        self._local_version = 0
+        self._lock = threading.Lock()
+        self.stats = {'builds': 0}
+
+    def init_app(self, app, cache=None):
+        self.cache = cache
+        if not event.contains(Session, 'after_flush', self._after_flush):
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+        app.extensions['category_tree'] = self
+
+    # Invalidation: category writes, and article inserts, deletes, moves and renames
+
+    def _after_flush(self, session, flush_context):
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, WikiCategory) or (isinstance(obj, WikiArticle) and self._moves(obj, session)):
+                session.info[PENDING_KEY] = True
+                return
+
+    @staticmethod
+    def _moves(article, session):
+        if article in session.new or article in session.deleted:
+            return True
+        attrs = inspect(article).attrs
+        return attrs.category_id.history.has_changes() or attrs.title.history.has_changes()
+
+    def _after_commit(self, session):
+        if session.info.pop(PENDING_KEY, False):
+            self.invalidate()
+
+    @staticmethod
+    def _after_rollback(session, previous_transaction):
+        session.info.pop(PENDING_KEY, None)
+
+    def invalidate(self):
+        self._local_version += 1
+        self._tree = None
+        try:
+            if self.cache is not None:
+                self.cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=0)
+        except Exception as e:
+            print(f"Category tree version error: {e}")
+
+    def version(self):
+        """Changes whenever the tree does, in every worker sharing the cache"""
+        try:
+            if self.cache is not None:
+                version = self.cache.get(VERSION_KEY)
+                if version is None:
+                    version = uuid.uuid4().hex
+                    self.cache.set(VERSION_KEY, version, timeout=0)
+                return version
+        except Exception as e:
+            print(f"Category tree version error: {e}")
+        return self._local_version
+
+    # Building
+
+    def _build(self, session, version):
+        count = func.count(WikiArticle.id)
+        rows = session.query(WikiCategory.id, WikiCategory.name, WikiCategory.description,
+                             WikiCategory.parent_id, count) \
+            .outerjoin(WikiArticle, WikiArticle.category_id == WikiCategory.id) \
+            .group_by(WikiCategory.id).order_by(WikiCategory.id).all()
+        links = {}
+        for article_id, title, category_id in session.query(WikiArticle.id, WikiArticle.title,
+                                                            WikiArticle.category_id) \
+                .filter(WikiArticle.category_id.isnot(None)).order_by(WikiArticle.id):
+            links.setdefault(category_id, []).append(ArticleLink(article_id, title))
+
+        categories = {row.id: row for row in rows}
+        children = {}
+        for row in rows:
+            if row.parent_id in categories and row.parent_id != row.id:
+                children.setdefault(row.parent_id, []).append(row.id)
+
+        by_id = {}
+
+        def node(category_id, ancestors):
+            row = categories[category_id]
+            # Skipping ancestors keeps a corrupted parent cycle from recursing forever
+            subcategories = tuple(node(child, ancestors | {category_id})
+                                  for child in children.get(category_id, ()) if child not in ancestors)
+            direct = row[4]
+            by_id[category_id] = CategoryNode(
+                row.id, row.name, row.description, row.parent_id, direct,
+                direct + sum(child.total_count for child in subcategories),
+                subcategories, tuple(links.get(category_id, ())))
+            return by_id[category_id]
+
+        roots = [node(row.id, frozenset()) for row in rows if row.parent_id not in categories]
+        # Categories only reachable through a parent cycle still get nodes
+        for row in rows:
+            if row.id not in by_id:
+                node(row.id, frozenset())
+        self.stats['builds'] += 1
+        return Tree(version, tuple(roots), by_id)
+
+    def tree(self, session=None):
+        """The current tree, rebuilt after a relevant commit here or in another worker"""
+        version = self.version()
+        tree = self._tree
+        if tree is None or tree.version != version:
+            with self._lock:
+                tree = self._tree
+                if tree is None or tree.version != version:
+                    from database import db
+                    tree = self._tree = self._build(session or db.session, version)
+        return tree
+
+    def roots(self):
+        """Top-level categories, each with its subcategories nested"""
+        return self.tree().roots
+
+    def nodes(self):
+        """Every category, in id order"""
+        return tuple(sorted(self.tree().by_id.values(), key=lambda node: node.id))
+
+    def get(self, category_id):
+        return self.tree().by_id.get(category_id)
+
+
+# Global instance
+category_tree = CategoryTree()
@@ -0,0 +1,101 @@
+"""
+Random Articles
+Picks random wiki articles from a cached array of article ids, so a pick
+costs O(k) and loads only the chosen rows. The array is reloaded (one
+``SELECT id`` query) after a commit that inserted or deleted articles, and
+at least every ``ttl`` seconds to pick up writes made by other processes
+"""
+
+import os
+import random
+import threading
+import time
+from array import array
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+PENDING_KEY = 'wiki_article_ids_changed'
+
+
+class RandomArticles:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.model = None
+        self._ids = None
+        self._loaded_at = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {'reloads': 0, 'stale': 0}
+
+    def init_app(self, app, model):
+        self.model = model
+        self.ttl = int(os.getenv('WIKI_RANDOM_IDS_TTL', self.ttl))
+        if not event.contains(Session, 'after_flush', self._after_flush):
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+        app.extensions['random_articles'] = self
+
+    # Invalidation: only committed inserts and deletes change the id set
+
+    def _after_flush(self, session, flush_context):
+        if any(isinstance(obj, self.model) for obj in (*session.new, *session.deleted)):
+            session.info[PENDING_KEY] = True
+
+    def _after_commit(self, session):
+        if session.info.pop(PENDING_KEY, False):
+            self.invalidate()
+
+    @staticmethod
+    def _after_rollback(session, previous_transaction):
+        session.info.pop(PENDING_KEY, None)
+
+    def invalidate(self):
+        self._generation += 1
+        self._ids = None
+
+    # Sampling
+
+    def ids(self, session):
+        """The cached id array, reloaded when invalidated or older than ``ttl``"""
+        ids = self._ids
+        if ids is None or time.monotonic() - self._loaded_at > self.ttl:
+            with self._lock:
+                if self._ids is None or time.monotonic() - self._loaded_at > self.ttl:
+                    generation = self._generation
+                    # Core rows, not ORM ones: this reads every id
+                    ids = array('q', session.connection().execute(select(self.model.__table__.c.id)).scalars())
+                    self.stats['reloads'] += 1
+                    # A commit that landed while loading means these ids may be out of date
+                    if generation == self._generation:
+                        self._ids, self._loaded_at = ids, time.monotonic()
+                else:
+                    ids = self._ids
+        return ids
+
+    def sample(self, session, k):
+        """Up to ``k`` distinct random article ids"""
+        ids = self.ids(session)
+        return random.sample(ids, min(k, len(ids)))
+
+    def choose(self, query, k):
+        """
+        Up to ``k`` random rows of ``query`` (which must select the article
+        ``id``), in random order. Only the chosen rows are loaded; if some
+        were deleted by another process the ids are reloaded and the pick
+        is made again once.
+        """
+        for attempt in range(2):
+            ids = self.sample(query.session, k)
+            rows = query.filter(self.model.id.in_(ids)).all() if ids else []
+            if len(rows) == len(ids) or attempt:
+                break
+            self.stats['stale'] += 1
+            self.invalidate()
+        position = {article_id: index for index, article_id in enumerate(ids)}
+        return sorted(rows, key=lambda row: position[row.id])
+
+
+# Global instance
+random_articles = RandomArticles()
@@ -1,14 +1,29 @@
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify, current_app
-from models import WikiArticle, WikiCategory, SeoSettings
+from models import WikiArticle, SeoSettings
 from database import db
 from sqlalchemy import or_
+from sqlalchemy.orm import joinedload, load_only
+from conditional import conditional_get, table_state
+from pagination import keyset_pagination
+from .search_index import wiki_search
+from .random_articles import random_articles
+from .category_tree import category_tree
+from .view_counter import view_counter
 from . import wiki_bp
 from datetime import datetime
 import random
 
-# Helper function to get all top-level categories
+# Helper function to get all top-level categories, with counts and subcategories, from the cached tree
 def get_categories():
-    return WikiCategory.query.filter_by(parent_id=None).all()
+    return category_tree.roots()
+
+# Columns article cards show: the derived excerpt and reading time, never the body
+CARD_OPTIONS = (
+    load_only(WikiArticle.id, WikiArticle.title, WikiArticle.summary, WikiArticle.excerpt,
+              WikiArticle.word_count, WikiArticle.reading_time, WikiArticle.tags, WikiArticle.views,
+              WikiArticle.created_at, WikiArticle.category_id),
+    joinedload(WikiArticle.category),
+)
 
 # Helper function to get SEO settings
 def get_wiki_seo_settings(page_name='wiki'):
@@ -16,10 +31,23 @@ def get_wiki_seo_settings(page_name='wiki'):
     seo = SeoSettings.query.filter_by(page_name=page_name).first()
     return seo
 
+# Validator for article pages: the article itself, plus the neighbour links,
+# category sidebar and SEO settings every article page shows. The view count
+# is left out on purpose: the view counter rewrites it on every flush, which
+# would turn each revalidation of a read article into a full render, so the
+# count on a revalidated page may be a little stale
+def article_state(article_id):
+    article = db.session.query(WikiArticle.updated_at, WikiArticle.content_hash) \
+        .filter(WikiArticle.id == article_id).first()
+    if article is None:
+        return None
+    return (tuple(article), table_state(WikiArticle.updated_at), category_tree.version(),
+            table_state(SeoSettings.updated_at))
+
 @wiki_bp.route('/')
 def index():
     print(f"DEBUG: Accessing wiki blueprint index route.")
-    articles = WikiArticle.query.order_by(WikiArticle.title).all()
+    articles = WikiArticle.query.options(*CARD_OPTIONS).order_by(WikiArticle.title).all()
     categories = get_categories()
     seo = get_wiki_seo_settings('wiki')
     
@@ -37,70 +65,52 @@ def index():
 def search():
     query = request.args.get('q', '')
     sort_by = request.args.get('sort', 'relevance')  # Default to relevance
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = 20  # Results per page
     articles_list = []
     categories = get_categories()
 
+    total_results = 0
+    total_pages = 0
+
     if query:
-        # Base query for searching
-        base_query = WikiArticle.query.filter(
-            or_(
-                WikiArticle.title.ilike(f'%{query}%'),
-                WikiArticle.content.ilike(f'%{query}%'),
-                WikiArticle.summary.ilike(f'%{query}%'),
-                WikiArticle.tags.ilike(f'%{query}%')
-            )
-        )
+        # Ranked ids and snippets come from the search index, for this page only; bodies are never loaded
+        results = wiki_search.search(db.session, query, sort=sort_by,
+                                     limit=per_page, offset=(page - 1) * per_page)
+        total_results = results.total
+        total_pages = (total_results + per_page - 1) // per_page
         
-        # Apply sorting
-        if sort_by == 'date':
-            articles_query = base_query.order_by(WikiArticle.created_at.desc()).all()
-        elif sort_by == 'title':
-            articles_query = base_query.order_by(WikiArticle.title.asc()).all()
-        elif sort_by == 'views':
-            articles_query = base_query.order_by(WikiArticle.views.desc()).all()
-        else:  # relevance (default)
-            # Simple relevance scoring based on where the match occurs
-            articles_query = base_query.all()
-            
-            # Score articles based on where the query appears
-            scored_articles = []
-            for article in articles_query:
-                score = 0
-                query_lower = query.lower()
-                
-                # Title matches get highest score
-                if query_lower in article.title.lower():
-                    score += 10
-                    # Exact title match gets even higher score
-                    if query_lower == article.title.lower():
-                        score += 20
-                
-                # Summary matches get medium score
-                if article.summary and query_lower in article.summary.lower():
-                    score += 5
-                
-                # Tag matches get medium-high score
-                if article.tags and query_lower in article.tags.lower():
-                    score += 7
-                
-                # Content matches get lower score
-                if article.content and query_lower in article.content.lower():
-                    score += 2
-                
-                # View count boost (popular articles)
-                if article.views:
-                    score += min(article.views / 100, 5)  # Max 5 point boost
-                
-                scored_articles.append((article, score))
-            
-            # Sort by score (relevance) in descending order
-            scored_articles.sort(key=lambda x: x[1], reverse=True)
-            articles_query = [article for article, score in scored_articles]
+        articles_by_id = {
+            article.id: article
+            for article in WikiArticle.query.options(
+                load_only(WikiArticle.id, WikiArticle.title, WikiArticle.summary, WikiArticle.excerpt,
+                          WikiArticle.category_id, WikiArticle.tags, WikiArticle.views, WikiArticle.created_at,
+                          WikiArticle.updated_at),
+                joinedload(WikiArticle.category)
+            ).filter(WikiArticle.id.in_(results.ids))
+        } if results.ids else {}
         
         # Convert to dictionaries for template use
         articles_list = []
-        for article in articles_query:
-            article_dict = article.to_dict()
+        for article_id in results.ids:
+            article = articles_by_id.get(article_id)
+            if article is None:
+                continue
+            excerpt_source = article.summary or results.snippets.get(article_id) or article.excerpt or ''
+            excerpt = article.strip_html(excerpt_source)
+            if not article.summary and len(excerpt) > 200:
+                excerpt = excerpt[:200] + '...'
+            article_dict = {
+                'id': article.id,
+                'title': article.title,
+                'summary': article.summary,
+                'excerpt': excerpt or None,
+                'category_id': article.category_id,
+                'tags': article.tags,
+                'views': article.views,
+                'created_at': article.created_at.isoformat() if article.created_at else None,
+                'updated_at': article.updated_at.isoformat() if article.updated_at else None,
+            }
             # Ensure proper date handling
             if article.created_at:
                 article_dict['created_at_formatted'] = article.created_at.strftime('%B %d, %Y')
@@ -118,10 +128,14 @@ def search():
 
     if request.accept_mimetypes.accept_json and \
        not request.accept_mimetypes.accept_html:
-        return jsonify(articles=articles_list, sort=sort_by)
+        return jsonify(articles=articles_list, total=total_results, sort=sort_by,
+                       page=page, pages=total_pages)
 
     return render_template('wiki/search.html', 
                           articles=articles_list, 
+                          total_results=total_results,
+                          page=page,
+                          total_pages=total_pages,
                           query=query,
                           sort_by=sort_by,
                           categories=categories,
@@ -132,10 +146,23 @@ def search():
 
 
 @wiki_bp.route('/article/<int:article_id>')
+@view_counter.counted()
+@conditional_get.validate(article_state)
 def article(article_id):
     article = WikiArticle.query.get_or_404(article_id)
     categories = get_categories()  # Get all top-level categories
     
+    # Rows saved before pre-rendering (or under an older renderer) are rendered once here
+    if article.needs_render():
+        try:
+            article.backfill_rendered_content()
+            db.session.commit()
+        except Exception as e:
+            print(f"Error storing rendered article {article_id}: {e}")
+            db.session.rollback()
+            article = WikiArticle.query.get_or_404(article_id)
+            article.render_content()
+    
     # Get next and previous articles
     prev_article = WikiArticle.query.filter(WikiArticle.id < article_id).order_by(WikiArticle.id.desc()).first()
     next_article = WikiArticle.query.filter(WikiArticle.id > article_id).order_by(WikiArticle.id.asc()).first()
@@ -144,7 +171,7 @@ def article(article_id):
     active_category = None
     active_subcategory = None
     if article.category_id:
-        category = WikiCategory.query.get(article.category_id)
+        category = category_tree.get(article.category_id)
         if category:
             if category.parent_id:
                 active_subcategory = category.id
@@ -170,21 +197,18 @@ def article(article_id):
 @wiki_bp.route('/random')
 def random():
     """Display random articles from the wiki."""
-    all_articles = WikiArticle.query.all()
     categories = get_categories()
+    # Only the chosen rows are loaded, with the columns the cards show
+    random_articles_list = random_articles.choose(WikiArticle.query.options(*CARD_OPTIONS), 6)
     
-    if not all_articles:
+    if not random_articles_list:
         return render_template('wiki/not_found.html', 
                               message="No articles available yet.",
                               categories=categories,
                               current_year=datetime.now().year)
     
-    # Get 6 random articles for the random page
-    import random as py_random
-    random_articles = py_random.sample(all_articles, min(len(all_articles), 6))
-    
     return render_template('wiki/random_page.html', 
-                          articles=random_articles,
+                          articles=random_articles_list,
                           categories=categories,
                           current_year=datetime.now().year,
                           seo=get_wiki_seo_settings('wiki'),
@@ -194,13 +218,11 @@ def random():
 @wiki_bp.route('/random-article')
 def random_article():
     """Redirect to a single random article (for direct access)."""
-    all_articles = WikiArticle.query.all()
-    if not all_articles:
+    chosen = random_articles.choose(db.session.query(WikiArticle.id), 1)
+    if not chosen:
         return redirect(url_for('wiki.index'))
     
-    import random as py_random
-    random_article = py_random.choice(all_articles)
-    return redirect(url_for('wiki.article', article_id=random_article.id))
+    return redirect(url_for('wiki.article', article_id=chosen[0].id))
 
 @wiki_bp.route('/explore')
 def explore():
@@ -211,11 +233,11 @@ def explore():
     sort_by = request.args.get('sort', 'title')  # title, date, views
     category_filter = request.args.get('category', '')
     search_query = request.args.get('search', '')
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 12  # Articles per page
     
-    # Build base query
-    query = WikiArticle.query
+    # Build base query with just the columns the cards show
+    query = WikiArticle.query.options(*CARD_OPTIONS)
     
     # Apply category filter
     if category_filter and category_filter.isdigit():
@@ -231,21 +253,24 @@ def explore():
             )
         )
     
-    # Apply sorting
+    # Apply sorting; the id tiebreaker makes each order total, as keyset paging needs
     if sort_by == 'date':
-        query = query.order_by(WikiArticle.created_at.desc())
+        order, descending = (WikiArticle.created_at, WikiArticle.id), True
     elif sort_by == 'views':
-        query = query.order_by(WikiArticle.views.desc())
+        order, descending = (WikiArticle.views, WikiArticle.id), True
     else:  # title (default)
-        query = query.order_by(WikiArticle.title.asc())
+        sort_by = 'title'
+        order, descending = (WikiArticle.title, WikiArticle.id), False
     
-    # Paginate results
-    articles_pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
+    # Paginate results by seeking past the cursor's row instead of an OFFSET
+    articles_pagination = keyset_pagination.paginate(
+        query, order, descending=descending, cursor=cursor, per_page=per_page,
+        filters={'category': category_filter if category_filter.isdigit() else '',
+                 'search': search_query}
     )
     
     # Get all categories for filter dropdown
-    all_categories = WikiCategory.query.all()
+    all_categories = category_tree.nodes()
     
     return render_template('wiki/explore.html',
                           articles=articles_pagination.items,
@@ -0,0 +1,335 @@
+"""
+Wiki Search Index
+Full-text index over wiki articles: SQLite FTS5 (BM25) or Postgres tsvector,
+with an ILIKE scoring fallback for other engines
+"""
+
+import re
+from collections import namedtuple
+
+from sqlalchemy import bindparam, event, text
+
+# Field boosts, highest first. They mirror the old substring scoring
+# (title 10, tags 7, summary 5, content 2).
+FIELD_WEIGHTS = (('title', 10.0), ('tags', 7.0), ('summary', 5.0), ('content', 2.0))
+
+SORT_ORDERS = {
+    'date': 'a.created_at DESC',
+    'title': 'a.title ASC',
+    'views': 'a.views DESC',
+}
+
+SNIPPET_WORDS = 40
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+_TAG_RE = re.compile(r'<.*?>')
+
+# kind is 'term', 'prefix' or 'phrase'; words is a tuple of lowercase words
+Clause = namedtuple('Clause', 'kind words')
+SearchResults = namedtuple('SearchResults', 'ids total snippets')
+
+
+def parse_query(query):
+    """
+    Parse user input into clauses.
+
+    ``"exact phrase"`` is a phrase, ``word*`` a prefix term, and the last
+    bare word is treated as a prefix so partial words still match as they
+    did with substring search.
+    """
+    clauses = []
+    for phrase, bare in _TOKEN_RE.findall(query or ''):
+        if phrase:
+            words = tuple(w.lower() for w in _WORD_RE.findall(phrase))
+            if len(words) > 1:
+                clauses.append(Clause('phrase', words))
+            elif words:
+                clauses.append(Clause('term', words))
+            continue
+        words = [w.lower() for w in _WORD_RE.findall(bare)]
+        if not words:
+            continue
+        for word in words[:-1]:
+            clauses.append(Clause('term', (word,)))
+        kind = 'prefix' if bare.endswith('*') else 'term'
+        clauses.append(Clause(kind, (words[-1],)))
+
+    # Implicit prefix on the trailing bare word
+    if clauses and clauses[-1].kind == 'term' and not (query or '').rstrip().endswith('"'):
+        clauses[-1] = Clause('prefix', clauses[-1].words)
+    return clauses
+
+
+def to_fts5(clauses):
+    """Render clauses as an FTS5 MATCH expression (implicit AND)"""
+    parts = []
+    for clause in clauses:
+        quoted = '"' + ' '.join(clause.words) + '"'
+        parts.append(quoted + '*' if clause.kind == 'prefix' else quoted)
+    return ' '.join(parts)
+
+
+def to_tsquery(clauses):
+    """Render clauses as a Postgres to_tsquery expression"""
+    parts = []
+    for clause in clauses:
+        if clause.kind == 'phrase':
+            parts.append('(' + ' <-> '.join(clause.words) + ')')
+        elif clause.kind == 'prefix':
+            parts.append(f'{clause.words[0]}:*')
+        else:
+            parts.append(clause.words[0])
+    return ' & '.join(parts)
+
+
+def strip_html(value):
+    return _TAG_RE.sub('', value or '')
+
+
+class WikiSearchIndex:
+    """
+    Keeps a search table in step with ``wiki_article`` and answers ranked
+    queries with article ids only, so bodies are never loaded to search.
+
+    The index is written from mapper events on the flushing connection, so
+    it commits or rolls back with the article itself.
+    """
+
+    SQLITE_TABLE = 'wiki_search'
+    POSTGRES_TABLE = 'wiki_search_index'
+
+    def __init__(self):
+        self.model = None
+        self._ready = {}
+
+    def init_app(self, app, model):
+        self.model = model
+        if not event.contains(model, 'after_insert', self._after_save):
+            event.listen(model, 'after_insert', self._after_save)
+            event.listen(model, 'after_update', self._after_save)
+            event.listen(model, 'after_delete', self._after_delete)
+        app.extensions['wiki_search'] = self
+
+    # Backends
+
+    def backend_for(self, connection):
+        """'fts5', 'tsvector' or 'like' for the connection's engine"""
+        dialect = connection.dialect.name
+        if dialect == 'sqlite':
+            return 'fts5' if self._ensure_table(connection) else 'like'
+        if dialect == 'postgresql':
+            return 'tsvector' if self._ensure_table(connection) else 'like'
+        return 'like'
+
+    def _ensure_table(self, connection):
+        """
+        Create the index table on first use and fill it if it is new. Both
+        happen in one savepoint, so a failed fill leaves no empty table that
+        later processes would take for a built index.
+        """
+        key = str(connection.engine.url)
+        if key in self._ready:
+            return self._ready[key]
+
+        dialect = connection.dialect.name
+        try:
+            with connection.begin_nested():
+                if dialect == 'sqlite':
+                    exists = connection.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE name = :name"
+                    ), {'name': self.SQLITE_TABLE}).first()
+                    if not exists:
+                        connection.execute(text(
+                            f"CREATE VIRTUAL TABLE {self.SQLITE_TABLE} USING fts5("
+                            "title, tags, summary, content, "
+                            "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+                        ))
+                else:
+                    exists = connection.execute(text(
+                        "SELECT to_regclass(:name)"
+                    ), {'name': self.POSTGRES_TABLE}).scalar()
+                    if not exists:
+                        connection.execute(text(
+                            f"CREATE TABLE {self.POSTGRES_TABLE} ("
+                            "article_id INTEGER PRIMARY KEY REFERENCES wiki_article(id) ON DELETE CASCADE, "
+                            "document TSVECTOR NOT NULL)"
+                        ))
+                        connection.execute(text(
+                            f"CREATE INDEX ix_{self.POSTGRES_TABLE}_document "
+                            f"ON {self.POSTGRES_TABLE} USING GIN (document)"
+                        ))
+                if not exists:
+                    self._populate(connection)
+            if not exists:
+                print(f"Wiki Search: built {dialect} index")
+            self._ready[key] = True
+        except Exception as e:
+            print(f"Wiki search index unavailable, using LIKE search: {e}")
+            self._ready[key] = False
+        return self._ready[key]
+
+    def _populate(self, connection, batch_size=500):
+        last_id = 0
+        while True:
+            rows = connection.execute(text(
+                "SELECT id, title, tags, summary, content FROM wiki_article "
+                "WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ), {'last_id': last_id, 'limit': batch_size}).all()
+            if not rows:
+                break
+            for row in rows:
+                self._write(connection, row.id, row.title, row.tags, row.summary, row.content)
+            last_id = rows[-1].id
+
+    def _write(self, connection, article_id, title, tags, summary, content):
+        params = {
+            'id': article_id,
+            'title': title or '',
+            'tags': (tags or '').replace(',', ' '),
+            'summary': strip_html(summary),
+            'content': strip_html(content),
+        }
+        if connection.dialect.name == 'sqlite':
+            connection.execute(text(f"DELETE FROM {self.SQLITE_TABLE} WHERE rowid = :id"), params)
+            connection.execute(text(
+                f"INSERT INTO {self.SQLITE_TABLE} (rowid, title, tags, summary, content) "
+                "VALUES (:id, :title, :tags, :summary, :content)"
+            ), params)
+        else:
+            connection.execute(text(
+                f"INSERT INTO {self.POSTGRES_TABLE} (article_id, document) VALUES (:id, "
+                "setweight(to_tsvector('english', :title), 'A') || "
+                "setweight(to_tsvector('english', :tags), 'B') || "
+                "setweight(to_tsvector('english', :summary), 'C') || "
+                "setweight(to_tsvector('english', :content), 'D')) "
+                "ON CONFLICT (article_id) DO UPDATE SET document = EXCLUDED.document"
+            ), params)
+
+    # Incremental updates
+
+    def _after_save(self, mapper, connection, target):
+        if self.backend_for(connection) == 'like':
+            return
+        self._write(connection, target.id, target.title, target.tags, target.summary, target.content)
+
+    def _after_delete(self, mapper, connection, target):
+        backend = self.backend_for(connection)
+        if backend == 'fts5':
+            connection.execute(text(f"DELETE FROM {self.SQLITE_TABLE} WHERE rowid = :id"), {'id': target.id})
+        elif backend == 'tsvector':
+            connection.execute(text(f"DELETE FROM {self.POSTGRES_TABLE} WHERE article_id = :id"), {'id': target.id})
+
+    def rebuild(self, session):
+        """Drop and rebuild the index from wiki_article; returns the row count"""
+        connection = session.connection()
+        dialect = connection.dialect.name
+        self._ready.pop(str(connection.engine.url), None)
+        if dialect == 'sqlite':
+            connection.execute(text(f"DROP TABLE IF EXISTS {self.SQLITE_TABLE}"))
+        elif dialect == 'postgresql':
+            connection.execute(text(f"DROP TABLE IF EXISTS {self.POSTGRES_TABLE}"))
+        else:
+            return 0
+        if not self._ensure_table(connection):
+            return 0
+        session.commit()
+        return session.execute(text("SELECT COUNT(*) FROM wiki_article")).scalar()
+
+    # Queries
+
+    def search(self, session, query, sort='relevance', limit=None, offset=0):
+        """
+        Return SearchResults(ids, total, snippets) for ``query``.
+
+        ``snippets`` maps article id to a short plain-text passage around the
+        match for rows without a summary. Only the returned page gets one:
+        ranking reads ids alone.
+        """
+        clauses = parse_query(query)
+        if not clauses:
+            return SearchResults([], 0, {})
+
+        connection = session.connection()
+        backend = self.backend_for(connection)
+        if backend == 'fts5':
+            weights = ', '.join(str(weight) for _, weight in FIELD_WEIGHTS)
+            source = (
+                f"FROM {self.SQLITE_TABLE} s JOIN wiki_article a ON a.id = s.rowid "
+                f"WHERE {self.SQLITE_TABLE} MATCH :q"
+            )
+            rank = f"bm25({self.SQLITE_TABLE}, {weights}), a.views DESC"
+            params = {'q': to_fts5(clauses)}
+        elif backend == 'tsvector':
+            source = (
+                f"FROM {self.POSTGRES_TABLE} s JOIN wiki_article a ON a.id = s.article_id "
+                "WHERE s.document @@ to_tsquery('english', :q)"
+            )
+            # ts_rank weights are ordered {D, C, B, A}
+            weights = ', '.join(str(weight / FIELD_WEIGHTS[0][1]) for _, weight in reversed(FIELD_WEIGHTS))
+            rank = f"ts_rank('{{{weights}}}', s.document, to_tsquery('english', :q), 1) DESC, a.views DESC"
+            params = {'q': to_tsquery(clauses)}
+        else:
+            return self._like_search(session, query, sort, limit, offset)
+
+        order = SORT_ORDERS.get(sort, rank)
+        page = ''
+        if limit is not None:
+            page = ' LIMIT :limit OFFSET :offset'
+            params.update(limit=limit, offset=offset)
+
+        ids = connection.execute(text(f"SELECT a.id {source} ORDER BY {order}{page}"), params).scalars().all()
+        if limit is None:
+            total = len(ids)
+        else:
+            total = connection.execute(text(f"SELECT COUNT(*) {source}"), params).scalar()
+        return SearchResults(ids, total, self._snippets(connection, backend, params['q'], ids))
+
+    def _snippets(self, connection, backend, match, ids):
+        """Passages around the match for the articles in ``ids`` that have no summary"""
+        if not ids:
+            return {}
+        no_summary = "(a.summary IS NULL OR a.summary = '')"
+        if backend == 'fts5':
+            # From the index's own copy of the plain text
+            statement = text(
+                f"SELECT s.rowid AS id, snippet({self.SQLITE_TABLE}, 3, '', '', '...', {SNIPPET_WORDS}) AS snippet "
+                f"FROM {self.SQLITE_TABLE} s JOIN wiki_article a ON a.id = s.rowid "
+                f"WHERE {self.SQLITE_TABLE} MATCH :q AND s.rowid IN :ids AND {no_summary}"
+            )
+        else:
+            # From the plain text stored at write time, never the markdown body
+            statement = text(
+                "SELECT a.id, ts_headline('english', coalesce(a.plain_text, a.excerpt, ''), "
+                f"to_tsquery('english', :q), 'MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}') AS snippet "
+                f"FROM wiki_article a WHERE a.id IN :ids AND {no_summary}"
+            )
+        statement = statement.bindparams(bindparam('ids', expanding=True))
+        rows = connection.execute(statement, {'q': match, 'ids': list(ids)})
+        # ts_headline marks matches with <b> tags
+        return {row.id: strip_html(row.snippet) for row in rows if row.snippet}
+
+    def _like_search(self, session, query, sort, limit, offset):
+        """Substring search scored in SQL, for engines without a full-text backend"""
+        from sqlalchemy import case, func, or_
+
+        model = self.model
+        pattern = f'%{query}%'
+        fields = [(getattr(model, name), weight) for name, weight in FIELD_WEIGHTS]
+        score = sum(case((column.ilike(pattern), weight), else_=0) for column, weight in fields)
+        orders = {
+            'date': [model.created_at.desc()],
+            'title': [model.title.asc()],
+            'views': [model.views.desc()],
+        }
+        matches = session.query(model.id).filter(or_(*[column.ilike(pattern) for column, _ in fields]))
+        ids_query = matches.order_by(*orders.get(sort, [score.desc(), model.views.desc()]))
+        if limit is not None:
+            ids_query = ids_query.limit(limit).offset(offset)
+        ids = [row.id for row in ids_query]
+        total = len(ids) if limit is None else matches.with_entities(func.count(model.id)).scalar()
+        return SearchResults(ids, total, {})
+
+
+# Global instance
+wiki_search = WikiSearchIndex()
@@ -0,0 +1,314 @@
+"""
+Wiki View Counter
+Counts article views without a database write on the request path. Views
+go to counters in Redis (with REDIS_URL) or in this process, and are written
+to ``WikiArticle.views`` as one batched UPDATE every ``interval`` seconds by
+a background thread in each worker, when a worker exits and by
+``flask flush-wiki-views``. Known bots and prefetches are ignored, and repeat
+views of an article by the same visitor within the dedup window count once
+"""
+
+import atexit
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import wraps
+
+from flask import make_response, request
+from flask_limiter.util import get_remote_address
+from sqlalchemy import case, func, update
+
+from database import db
+
+PENDING_KEY = 'wiki_views:pending'
+FLUSHING_KEY = 'wiki_views:flushing'
+FLUSH_LOCK_KEY = 'wiki_views:flush_lock'
+SEEN_KEY = 'wiki_views:seen:{window}'
+
+# 2**20 bits (128 KiB) per window and 4 probes stay under 0.1% false
+# positives up to about 50,000 distinct visitor/article pairs per window
+BLOOM_BITS = 1 << 20
+BLOOM_HASHES = 4
+# Articles per UPDATE statement
+FLUSH_BATCH = 500
+
+BOT_USER_AGENT = re.compile(
+    r'bot|crawl|spider|slurp|archiver|preview|monitor|lighthouse|headless|phantom|'
+    r'curl|wget|python-|httpx|aiohttp|go-http|java/|okhttp|libwww|scrapy', re.IGNORECASE)
+
+
+def bloom_positions(key, bits=BLOOM_BITS, hashes=BLOOM_HASHES):
+    """Bit positions of ``key`` in a Bloom filter of ``bits`` bits"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * hashes).digest()
+    return [int.from_bytes(digest[i:i + 4], 'big') % bits for i in range(0, 4 * hashes, 4)]
+
+
+class WindowedBloomFilter:
+    """
+    Approximate set of keys seen recently: one Bloom filter per time window,
+    checked together with the previous window's, so a key counts as seen for
+    between one and two windows after it was added
+    """
+
+    def __init__(self, window, bits=BLOOM_BITS, hashes=BLOOM_HASHES):
+        self.window = window
+        self.bits = bits
+        self.hashes = hashes
+        self._filters = {}
+        self._lock = threading.Lock()
+
+    def check_and_add(self, key, now=None):
+        """True when ``key`` was already seen; adds it either way"""
+        window = int((now if now is not None else time.time()) // self.window)
+        positions = bloom_positions(key, self.bits, self.hashes)
+        with self._lock:
+            for old in [w for w in self._filters if w < window - 1]:
+                del self._filters[old]
+            current = self._filters.setdefault(window, bytearray(self.bits // 8))
+            previous = self._filters.get(window - 1)
+            seen = all(current[p >> 3] & (1 << (p & 7)) for p in positions) or \
+                (previous is not None and all(previous[p >> 3] & (1 << (p & 7)) for p in positions))
+            for p in positions:
+                current[p >> 3] |= 1 << (p & 7)
+        return seen
+
+
+class ViewCounter:
+    def __init__(self, interval=30, dedup_window=1800):
+        self.interval = interval
+        self.dedup_window = dedup_window
+        self.filter_bots = True
+        self.model = None
+        self.app = None
+        self.redis = None
+        self.seen = None
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher_pid = None
+        self.stats = {'recorded': 0, 'duplicates': 0, 'bots': 0, 'flushes': 0, 'flushed': 0, 'errors': 0}
+
+    def init_app(self, app, model):
+        self.app = app
+        self.model = model
+        self.interval = int(os.getenv('WIKI_VIEWS_FLUSH_INTERVAL', self.interval))
+        self.dedup_window = int(os.getenv('WIKI_VIEWS_DEDUP_WINDOW', self.dedup_window))
+        self.filter_bots = os.getenv('WIKI_VIEWS_FILTER_BOTS', 'true').lower() == 'true'
+        self.seen = WindowedBloomFilter(self.dedup_window) if self.dedup_window > 0 else None
+
+        redis_url = os.getenv('REDIS_URL')
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url)
+                print("Wiki View Counter: counting in Redis")
+            except Exception as e:
+                print(f"Wiki view counter Redis error, counting in process: {e}")
+                self.redis = None
+
+        # Whatever this worker still holds is written when it exits or is recycled
+        atexit.register(self.flush_at_exit)
+        app.extensions['view_counter'] = self
+
+    # Recording
+
+    def is_bot(self):
+        user_agent = request.headers.get('User-Agent', '')
+        return not user_agent or bool(BOT_USER_AGENT.search(user_agent))
+
+    @staticmethod
+    def is_prefetch():
+        purpose = request.headers.get('Sec-Purpose') or request.headers.get('Purpose') or ''
+        return 'prefetch' in purpose.lower()
+
+    def _seen_before(self, key):
+        if self.redis is not None:
+            window = int(time.time() // self.dedup_window)
+            positions = bloom_positions(key)
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                # SETBIT answers with the previous bit, so checking and adding is one round trip
+                for p in positions:
+                    pipe.setbit(SEEN_KEY.format(window=window), p, 1)
+                for p in positions:
+                    pipe.getbit(SEEN_KEY.format(window=window - 1), p)
+                pipe.expire(SEEN_KEY.format(window=window), 2 * self.dedup_window)
+                bits = pipe.execute()
+                return all(bits[:len(positions)]) or all(bits[len(positions):2 * len(positions)])
+            except Exception as e:
+                print(f"Wiki view dedup error: {e}")
+        return self.seen.check_and_add(key)
+
+    def record(self, article_id):
+        """Count a view of ``article_id`` by the current request; True when it was counted"""
+        if request.method != 'GET' or self.is_prefetch():
+            return False
+        if self.filter_bots and self.is_bot():
+            self.stats['bots'] += 1
+            return False
+        if self.seen is not None:
+            visitor = f"{get_remote_address()}|{request.headers.get('User-Agent', '')}"
+            if self._seen_before(f'{visitor}|{article_id}'):
+                self.stats['duplicates'] += 1
+                return False
+
+        counted = False
+        if self.redis is not None:
+            try:
+                self.redis.hincrby(PENDING_KEY, article_id, 1)
+                counted = True
+            except Exception as e:
+                print(f"Wiki view counter Redis error: {e}")
+        if not counted:
+            with self._lock:
+                self._pending[article_id] += 1
+        self.stats['recorded'] += 1
+        self._ensure_flusher()
+        return True
+
+    def counted(self, argument='article_id'):
+        """
+        Decorator recording a view for responses of 200 or 304, so revisits
+        answered by a conditional GET count too. Place it above
+        ``conditional_get.validate``.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                response = make_response(view(**kwargs))
+                if response.status_code in (200, 304):
+                    self.record(kwargs[argument])
+                return response
+            return wrapper
+        return decorator
+
+    # Flushing
+
+    def _ensure_flusher(self):
+        # One flusher thread per worker process, started on its first view
+        if self._flusher_pid != os.getpid():
+            with self._lock:
+                if self._flusher_pid != os.getpid():
+                    self._flusher_pid = os.getpid()
+                    threading.Thread(target=self._run_flusher, name='wiki-view-flusher', daemon=True).start()
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                self.flush()
+
+    def _take_local(self):
+        with self._lock:
+            deltas, self._pending = self._pending, Counter()
+        return deltas
+
+    def _claim_redis(self):
+        """(deltas, lock token) of the batch this flush owns in Redis, or ({}, None)"""
+        token = uuid.uuid4().hex
+        if not self.redis.set(FLUSH_LOCK_KEY, token, nx=True, ex=max(60, 4 * self.interval)):
+            return {}, None
+        # A batch claimed by a flush that died before finishing goes first
+        if not self.redis.exists(FLUSHING_KEY):
+            if not self.redis.exists(PENDING_KEY):
+                return {}, token
+            self.redis.rename(PENDING_KEY, FLUSHING_KEY)
+        deltas = {int(key): int(value) for key, value in self.redis.hgetall(FLUSHING_KEY).items()}
+        return deltas, token
+
+    def _release_redis(self, token, written):
+        if written:
+            self.redis.delete(FLUSHING_KEY)
+        if self.redis.get(FLUSH_LOCK_KEY) == token.encode():
+            self.redis.delete(FLUSH_LOCK_KEY)
+
+    def _write(self, deltas):
+        """Add ``deltas`` ({article id: views}) to the stored counts, in as few UPDATEs as possible"""
+        table = self.model.__table__
+        items = sorted(deltas.items())
+        with db.engine.begin() as connection:
+            for start in range(0, len(items), FLUSH_BATCH):
+                batch = dict(items[start:start + FLUSH_BATCH])
+                # updated_at is pinned so a view is not an edit for validators or sitemaps
+                connection.execute(
+                    update(table)
+                    .where(table.c.id.in_(batch))
+                    .values(views=func.coalesce(table.c.views, 0) + case(batch, value=table.c.id, else_=0),
+                            updated_at=table.c.updated_at)
+                )
+
+    def flush(self):
+        """Write pending views to the database; returns how many were written"""
+        local = self._take_local()
+        claimed, token = {}, None
+        if self.redis is not None:
+            try:
+                claimed, token = self._claim_redis()
+            except Exception as e:
+                print(f"Wiki view counter Redis error: {e}")
+        deltas = Counter(local)
+        deltas.update(claimed)
+        deltas = {article_id: count for article_id, count in deltas.items() if count}
+
+        written = False
+        try:
+            if deltas:
+                self._write(deltas)
+            written = True
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Wiki view flush error: {e}")
+            # Local counts go back for the next flush; a claimed Redis batch stays claimed for it
+            with self._lock:
+                self._pending.update(local)
+        finally:
+            if token is not None:
+                try:
+                    self._release_redis(token, written)
+                except Exception as e:
+                    print(f"Wiki view counter Redis error: {e}")
+
+        if not written or not deltas:
+            return 0
+        total = sum(deltas.values())
+        self.stats['flushes'] += 1
+        self.stats['flushed'] += total
+        return total
+
+    def flush_at_exit(self):
+        self._stop.set()
+        if self.app is None or not self._pending:
+            return
+        try:
+            with self.app.app_context():
+                if self._database_gone():
+                    return
+                self.flush()
+        except Exception as e:
+            print(f"Wiki view flush error at exit: {e}")
+
+    @staticmethod
+    def _database_gone():
+        """True when the SQLite file behind the engine was removed, e.g. a throwaway benchmark database"""
+        url = db.engine.url
+        return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:') \
+            and not os.path.exists(url.database)
+
+    def pending(self):
+        """Views counted but not yet written, in this process plus Redis"""
+        with self._lock:
+            total = sum(self._pending.values())
+        if self.redis is not None:
+            try:
+                for key in (PENDING_KEY, FLUSHING_KEY):
+                    total += sum(int(value) for value in self.redis.hvals(key))
+            except Exception as e:
+                print(f"Wiki view counter Redis error: {e}")
+        return total
+
+
+# Global instance
+view_counter = ViewCounter()